@@ -0,0 +1,110 @@
+# api/compression.py
+
+import zlib
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import brotli  # en requirements.txt; sin él se usa gzip
+except ImportError:
+    brotli = None
+
+
+# -------------------------------------------------------------------------
+# Middleware de compresión (brotli si está disponible, si no gzip)
+# -------------------------------------------------------------------------
+
+class CompressionMiddleware:
+    """
+    Comprime las respuestas de más de `minimum_size` bytes según el
+    Accept-Encoding del cliente: br > gzip > sin comprimir.
+
+    Las respuestas en streaming se comprimen lote a lote: tras cada lote
+    se vacía el compresor (flush de sincronización), así que el cliente
+    puede descomprimir y pintar cada lote en cuanto llega. text/event-stream
+    no se comprime (lo excluye IdentityResponder).
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 5,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accepted = _accepted_encodings(Headers(scope=scope).get("Accept-Encoding", ""))
+
+        if brotli is not None and "br" in accepted:
+            responder = BrotliResponder(self.app, self.minimum_size, self.brotli_quality)
+        elif "gzip" in accepted:
+            responder = FlushingGZipResponder(self.app, self.minimum_size, self.gzip_level)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+
+        await responder(scope, receive, send)
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = 5) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        data = self.compressor.process(body)
+
+        if more_body:
+            return data + self.compressor.flush()
+
+        return data + self.compressor.finish()
+
+
+class FlushingGZipResponder(IdentityResponder):
+    """
+    gzip con Z_SYNC_FLUSH tras cada lote de un streaming. El GZipResponder
+    de Starlette no vacía el GzipFile: los lotes se quedaban en su buffer
+    hasta llenarlo y el NDJSON dejaba de llegar por partes.
+    """
+    content_encoding = "gzip"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, compresslevel: int = 6) -> None:
+        super().__init__(app, minimum_size)
+        # wbits 16 + MAX_WBITS: cabecera y cola gzip (no zlib crudo)
+        self.compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        data = self.compressor.compress(body)
+
+        if more_body:
+            return data + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        return data + self.compressor.flush()
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    """
+    "gzip, br;q=0.9, deflate;q=0" -> {"gzip", "br", "deflate"} sin q=0
+    """
+    accepted = set()
+
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+
+    return accepted
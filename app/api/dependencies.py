@@ -1,14 +1,66 @@
 # api/dependencies.py
 
-from services.queries_service import QueryService
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Dict
 
-_query_service: QueryService | None = None
+from state.boot import BOOT
 
+if TYPE_CHECKING:
+    from services.queries_service import QueryService
 
-def get_query_service() -> QueryService:
+_config: Dict[str, Any] | None = None
+_query_service: "QueryService | None" = None
+_lock = Lock()
+
+
+def get_config() -> Dict[str, Any]:
+    """
+    Configuración compartida por la app y el servicio (se carga una vez).
+    """
+    global _config
+
+    if _config is None:
+        from core._1_config_loader import load_config
+
+        _config = load_config()
+        BOOT.mark("config_loaded")
+
+    return _config
+
+
+def get_query_service() -> "QueryService":
     global _query_service
 
     if _query_service is None:
-        _query_service = QueryService()
+        with _lock:
+            if _query_service is None:
+                # pandas / pyarrow / core se importan aquí, no al arrancar
+                from services.queries_service import QueryService
+
+                _query_service = QueryService(get_config())
+                BOOT.mark("service_ready")
 
     return _query_service
+
+
+def query_service_ready() -> bool:
+    return _query_service is not None
+
+
+def warm_up(preload_dataset: bool = False) -> None:
+    """
+    Se ejecuta en segundo plano tras arrancar: crea el servicio (imports
+    pesados + bootstrap del registro) y, opcionalmente, carga el dataset
+    por defecto, sin retrasar la primera respuesta de /health.
+    """
+    try:
+        service = get_query_service()
+
+        print(f"🚀 Servicio listo en {BOOT.phases['service_ready']:.0f} ms desde el arranque")
+
+        if preload_dataset:
+            service.datasets.get()
+            print(f"📦 Dataset listo en {BOOT.mark('dataset_ready'):.0f} ms desde el arranque")
+
+    except Exception as e:
+        print(f"[WARN] Calentamiento del servicio fallido: {e}")
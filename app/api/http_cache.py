@@ -0,0 +1,110 @@
+# api/http_cache.py
+
+import hashlib
+import json
+from pathlib import Path
+from urllib.parse import quote
+
+from fastapi import Request
+from fastapi.staticfiles import StaticFiles
+from starlette.responses import Response
+from starlette.types import Scope
+
+
+# -------------------------------------------------------------------------
+# ETags de endpoints
+# -------------------------------------------------------------------------
+
+def make_etag(*parts) -> str:
+    """
+    ETag débil a partir de lo que determina el contenido de la respuesta
+    (rutas, mtime, tamaño, parámetros...), sin tener que generarla.
+    """
+    digest = hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()[:16]
+    return f'W/"{digest}"'
+
+
+def file_fingerprint(path: Path) -> str:
+    stat = Path(path).stat()
+    return f"{path}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def not_modified(request: Request, etag: str) -> Response | None:
+    """
+    304 si el cliente ya tiene esta versión (If-None-Match), si no None.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+
+    tags = [tag.strip() for tag in header.split(",")]
+    if "*" in tags or etag in tags or etag.removeprefix("W/") in tags:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return None
+
+
+# -------------------------------------------------------------------------
+# Estáticos con URL versionada por contenido
+# -------------------------------------------------------------------------
+
+class CachedStaticFiles(StaticFiles):
+    """
+    /static/...?v=<hash> -> cacheable un año (immutable): si el fichero
+    cambia, cambia el hash y por tanto la URL.
+    Sin ?v= -> no-cache (se revalida con el ETag de StaticFiles).
+    """
+
+    def __init__(self, *args, max_age: int = 31536000, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_age = max_age
+
+    def file_response(self, full_path, stat_result, scope: Scope, status_code: int = 200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+
+        if b"v=" in scope.get("query_string", b""):
+            response.headers["Cache-Control"] = f"public, max-age={self.max_age}, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+
+        return response
+
+
+class AssetVersions:
+    """
+    Hash de contenido de cada estático (recalculado solo si cambia su
+    mtime) para construir URLs versionadas desde las plantillas.
+    """
+
+    def __init__(self, directory: str, url_prefix: str = "/static"):
+        self.directory = Path(directory)
+        self.url_prefix = url_prefix.rstrip("/")
+        self._cache: dict[str, tuple[int, str]] = {}
+
+    def version(self, path: str) -> str:
+        full_path = self.directory / path
+        mtime = full_path.stat().st_mtime_ns
+
+        cached = self._cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        digest = hashlib.sha256(full_path.read_bytes()).hexdigest()[:12]
+        self._cache[path] = (mtime, digest)
+        return digest
+
+    def url(self, path: str) -> str:
+        return f"{self.url_prefix}/{quote(path)}?v={self.version(path)}"
+
+    def import_map(self, subdir: str = "js") -> str:
+        """
+        Import map para módulos ES: los imports relativos ("./api.js")
+        se resuelven a /static/js/api.js y el mapa los redirige a la URL
+        versionada, así ningún módulo tiene que conocer los hashes.
+        """
+        paths = [
+            p.relative_to(self.directory).as_posix()
+            for p in sorted((self.directory / subdir).glob("*.js"))
+        ]
+        imports = {f"{self.url_prefix}/{quote(p)}": self.url(p) for p in paths}
+        return json.dumps({"imports": imports}, indent=2)
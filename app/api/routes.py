@@ -1,39 +1,197 @@
 # api/routes.py
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-
-import pandas as pd
-import numpy as np
-
+# Arranque rápido: pandas, numpy y el core solo se importan dentro de las
+# rutas que los usan (y QueryService solo para anotaciones de tipo)
+#
+# Handlers async: el trabajo bloqueante (consultas, parquet, pandas,
+# serialización) va a un pool acotado (state/executors.py), "interactive"
+# para lecturas y paginación y "heavy" para ejecutar consultas. El event
+# loop queda libre (/health no espera a nadie) y, con el pool lleno, la
+# petición se rechaza con 429 (ExecutorBusy, ver main.py)
+#
+# Progreso (SSE): las consultas y la carga de datasets publican sus
+# etapas y contadores en state/progress.py; /query/{id}/progress y
+# /datasets/{name}/progress los reenvían como text/event-stream
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+
+import asyncio
 import json
+from datetime import date, datetime
 from pathlib import Path
 
 from api.schemas import (
+    CombineRequest,
     QueryRequest,
     QueryResponse,
     QueryListResponse,
 )
 from api.dependencies import get_query_service
-from services.queries_service import QueryService
+from api.http_cache import file_fingerprint, make_etag, not_modified
+from state.executors import EXECUTORS, ExecutorBusy
+from state.metrics import METRICS
+from state.progress import PROGRESS, TERMINAL_STAGES
 
+if TYPE_CHECKING:
+    import pandas as pd
 
-from core._6_event_dictionary import build_event_dictionary
+    from services.queries_service import QueryService
 
 router = APIRouter()
 
+# Diccionario de eventos ya construido (y su ETag)
+_EVENT_DICTIONARY: dict = {}
+
 
 @router.post("/query", response_model=QueryResponse)
-def run_query(
+async def run_query(
     payload: QueryRequest,
+    x_profile: str | None = Header(None),
     service: QueryService = Depends(get_query_service),
 ):
-    if not payload.src and not payload.dst:
+    from core._3_input_controller import utc_naive
+
+    has_time = payload.time_from is not None or payload.time_to is not None
+
+    if not payload.src and not payload.dst and not has_time:
         raise HTTPException(
             status_code=400,
-            detail="Debe especificarse al menos src o dst",
+            detail="Debe especificarse al menos src, dst o un rango temporal",
         )
 
-    return service.run(payload.src, payload.dst)
+    if has_time and payload.time_from and payload.time_to \
+            and utc_naive(payload.time_from) >= utc_naive(payload.time_to):
+        raise HTTPException(
+            status_code=400,
+            detail="time_from debe ser anterior a time_to",
+        )
+
+    if payload.dataset and payload.dataset not in service.datasets.names():
+        raise HTTPException(
+            status_code=404,
+            detail=f"Dataset desconocido: {payload.dataset}",
+        )
+
+    if payload.background and payload.preview:
+        raise HTTPException(status_code=400, detail="background no aplica a preview")
+
+    try:
+        if payload.background:
+            return await _submit_query(payload, x_profile, service)
+
+        return await EXECUTORS.heavy.run(_run_or_preview, payload, x_profile, service)
+    except ValueError as e:
+        # Patrón no válido (p. ej. componente o percentil desconocido)
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _submit_query(payload: QueryRequest, x_profile: str | None, service: QueryService):
+    """
+    Admite la consulta en el pool pesado y responde 202 sin esperarla:
+    el cliente sigue su avance por SSE y lee el resultado al terminar.
+    """
+    query_id = await EXECUTORS.interactive.run(
+        service.query_id,
+        payload.src,
+        payload.dst,
+        time_from=payload.time_from,
+        time_to=payload.time_to,
+        time_field=payload.time_field,
+        dataset=payload.dataset,
+        view=payload.view,
+    )
+    channel = f"query:{query_id}"
+
+    # Si ya se está ejecutando (otra petición), se sigue esa ejecución
+    current = PROGRESS.current(channel)
+    queued = current is None or current.get("stage") in TERMINAL_STAGES
+    if queued:
+        PROGRESS.publish(channel, stage="queued")
+
+    try:
+        EXECUTORS.heavy.submit(_run_in_background, payload, x_profile, service, channel)
+    except ExecutorBusy as e:
+        # Solo el "queued" propio: la ejecución en curso no ha fallado
+        if queued:
+            PROGRESS.publish(channel, stage="error", error=str(e))
+        raise
+
+    return JSONResponse(
+        status_code=202,
+        content={
+            "query_id": query_id,
+            "status": "queued",
+            "progress": f"/query/{query_id}/progress",
+        },
+        headers={"Location": f"/query/{query_id}"},
+    )
+
+
+def _run_in_background(payload: QueryRequest, x_profile: str | None, service: QueryService, channel: str):
+    try:
+        _run_or_preview(payload, x_profile, service)
+    except Exception as e:
+        # service.run ya publica los errores de ejecución; esto cubre los
+        # anteriores a registrarla
+        current = PROGRESS.current(channel)
+        if current is None or current.get("stage") not in TERMINAL_STAGES:
+            PROGRESS.publish(channel, stage="error", error=str(e))
+        print(f"[WARN] Query en segundo plano ({channel}): {e}")
+
+
+def _run_or_preview(payload: QueryRequest, x_profile: str | None, service: QueryService):
+    if payload.preview:
+        response = service.preview(
+            payload.src,
+            payload.dst,
+            estimate=payload.estimate,
+            rows=payload.preview_rows,
+            time_from=payload.time_from,
+            time_to=payload.time_to,
+            time_field=payload.time_field,
+            dataset=payload.dataset,
+            view=payload.view,
+        )
+        response["data"] = _to_records(response["data"])
+        if not payload.explain:
+            response.pop("plan")
+        return response
+
+    return service.run(
+        payload.src,
+        payload.dst,
+        explain=payload.explain,
+        time_from=payload.time_from,
+        time_to=payload.time_to,
+        time_field=payload.time_field,
+        dataset=payload.dataset,
+        profile=x_profile,
+        view=payload.view,
+    )
+
+
+@router.get("/datasets")
+async def list_datasets(service: QueryService = Depends(get_query_service)):
+    """
+    Datasets configurados y su estado (cargado, memoria, último uso)
+    """
+    return await EXECUTORS.interactive.run(service.list_datasets)
+
+
+@router.get("/views")
+async def list_views(service: QueryService = Depends(get_query_service)):
+    """
+    Vistas agregadas consultables (view en POST /query) y qué significa
+    cada id: componente o percentil destino
+    """
+    try:
+        return await EXECUTORS.interactive.run(service.describe_views)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
 
 # @router.get("/queries", response_model=QueryListResponse)
@@ -51,64 +209,382 @@ def run_query(
 #     }
 
 @router.get("/queries")
-def list_queries(service: QueryService = Depends(get_query_service)):
-    return service.list_queries()
+async def list_queries(service: QueryService = Depends(get_query_service)):
+    return await EXECUTORS.interactive.run(service.list_queries)
+
+
+@router.post("/queries/combine")
+async def combine_queries(
+    payload: CombineRequest,
+    service: QueryService = Depends(get_query_service),
+):
+    """
+    Intersección, diferencia o unión de resultados guardados (se registra
+    como una query nueva) u overlap (solo recuentos)
+    """
+    try:
+        return await EXECUTORS.heavy.run(service.combine, payload.op, payload.queries)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/query/{query_id}")
-def get_query(query_id: str, service: QueryService = Depends(get_query_service)):
-    queries_dir = Path(service.config["paths"]["output_dir"])
-    meta_path = queries_dir / f"{query_id}.json"
+async def get_query(query_id: str, service: QueryService = Depends(get_query_service)):
+    metadata = await EXECUTORS.interactive.run(_query_metadata, query_id, service)
 
-    if not meta_path.exists():
+    if metadata is None:
         raise HTTPException(status_code=404, detail="Query no encontrada")
 
-    with meta_path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+    return metadata
 
 
-@router.get("/query/{query_id}/data")
-def get_query_data(
+def _query_metadata(query_id: str, service: QueryService) -> dict | None:
+    from core._5_output_writer import result_paths
+
+    # Ruta calculada a partir del id; las queries antiguas (metadata con
+    # nombre de patrón) se sirven desde el registro
+    meta_path = result_paths(service.config, query_id)["metadata"]
+
+    if meta_path.exists():
+        with meta_path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    entry = service.registry.get(query_id)
+    return entry.to_dict() if entry is not None else None
+
+
+@router.get("/query/{query_id}/progress")
+async def get_query_progress(
     query_id: str,
-    offset: int = Query(0, ge=0),
-    limit: int = Query(500, ge=1, le=2000),
+    last_event_id: str | None = Header(None),
     service: QueryService = Depends(get_query_service),
 ):
-    # --------------------------------------------------
-    # 1️⃣ Obtener metadata de la query
-    # --------------------------------------------------
-    entry = service.registry.get(query_id)
+    """
+    Avance de la query en Server-Sent Events: etapa (queued, load_dataset,
+    plan, match, save_results... y done / error), filas recorridas y
+    seleccionadas, bytes escritos. El stream se cierra al terminar.
+    """
+    channel = f"query:{query_id}"
+
+    if PROGRESS.current(channel) is None:
+        # Sin ejecución en este proceso: el estado sale del registro
+        entry = await EXECUTORS.interactive.run(service.registry.get, query_id)
+
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Query no encontrada")
+
+        _publish_entry(channel, entry)
+
+    # pending / running solo los publica _publish_entry: la ejecuta otro
+    # worker y aquí nadie publicará su final, se sigue su metadata en disco
+    stage = (PROGRESS.current(channel) or {}).get("stage")
+    if stage in REGISTRY_STAGES and channel not in _FOLLOWED:
+        _FOLLOWED.add(channel)
+        asyncio.create_task(_follow_from_disk(channel, query_id, service))
+
+    return _event_stream(channel, last_event_id)
+
+
+# Etapas sintéticas (estado del registro) de una query sin ejecución en
+# este worker, y los canales que se están siguiendo desde disco
+REGISTRY_STAGES = ("pending", "running")
+_FOLLOWED: set[str] = set()
+
+
+def _publish_entry(channel: str, entry) -> str:
+    status = entry.status.value
+    stage = "done" if status in ("done", "evicted") else status
+    PROGRESS.publish(channel, stage=stage, status=status, rows=entry.rows, error=entry.error)
+    return stage
+
+
+async def _follow_from_disk(channel: str, query_id: str, service: QueryService) -> None:
+    """
+    Relee la metadata cada poll_s hasta que la query termina (o se queda
+    sin suscriptores, o este worker publica ya su propio final).
+    """
+    try:
+        while True:
+            await asyncio.sleep(PROGRESS.poll_s)
+
+            # Terminada o ejecutándose ya en este worker; o nadie escucha
+            # (el siguiente suscriptor vuelve a lanzar el seguimiento)
+            current = PROGRESS.current(channel)
+            if current is None or current.get("stage") not in REGISTRY_STAGES:
+                return
+            if not PROGRESS.subscribers(channel):
+                return
+
+            entry = await EXECUTORS.interactive.run(service.reload_entry, query_id, admit=False)
+
+            if entry is None:
+                # Expulsada por la retención (p. ej. el otro worker murió)
+                PROGRESS.publish(channel, stage="error", error="Query no encontrada")
+                return
+
+            if _publish_entry(channel, entry) in TERMINAL_STAGES:
+                return
+    finally:
+        _FOLLOWED.discard(channel)
+
+
+@router.get("/datasets/{name}/progress")
+async def get_dataset_progress(
+    name: str,
+    load: bool = False,
+    last_event_id: str | None = Header(None),
+    service: QueryService = Depends(get_query_service),
+):
+    """
+    Avance de la carga (o preprocesado) del dataset en Server-Sent Events.
+    load=true la lanza en segundo plano si aún no está cargado.
+    """
+    if name not in service.datasets.names():
+        raise HTTPException(status_code=404, detail=f"Dataset desconocido: {name}")
+
+    channel = f"dataset:{name}"
+    described = next(d for d in service.datasets.describe() if d["name"] == name)
+
+    if described["loaded"]:
+        if PROGRESS.current(channel) is None:
+            PROGRESS.publish(channel, stage="done", **described)
+    elif load:
+        EXECUTORS.heavy.submit(service.datasets.get, name)
+
+    return _event_stream(channel, last_event_id)
+
+
+def _event_stream(channel: str, last_event_id: str | None) -> StreamingResponse:
+    """
+    Un evento por actualización (id = seq del canal, para reanudar con
+    Last-Event-ID) y un comentario de keepalive si no hay novedades.
+    """
+    last_seq = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+    async def generate():
+        yield b"retry: 3000\n\n"
+
+        async for event in PROGRESS.subscribe(channel, last_seq):
+            if event is None:
+                yield b": keepalive\n\n"
+                continue
+
+            data = json.dumps(event, default=_json_default)
+            yield f"id: {event['seq']}\ndata: {data}\n\n".encode("utf-8")
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # nginx: no acumular el stream
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@router.get("/query/{query_id}/profile")
+async def get_query_profile(
+    query_id: str,
+    raw: bool = False,
+    limit: int = Query(50, ge=1, le=1000),
+    service: QueryService = Depends(get_query_service),
+):
+    """
+    Perfil de la última ejecución de la query: informe de texto o, con
+    raw=true, el fichero tal cual (.prof para pstats/snakeviz, folded
+    stacks para flamegraph/speedscope)
+    """
+    entry = await EXECUTORS.interactive.run(service.registry.get, query_id)
 
     if not entry:
         raise HTTPException(status_code=404, detail="Query no encontrada")
 
-    if not entry.output:
-        raise HTTPException(status_code=404, detail="Query sin output")
+    if not entry.profile or not Path(entry.profile).exists():
+        raise HTTPException(status_code=404, detail="Query sin perfil")
+
+    if raw:
+        return FileResponse(entry.profile, filename=Path(entry.profile).name)
 
-    parquet_path = Path(entry.output)
+    from services.profiling import render_profile
 
-    if not parquet_path.exists():
-        raise HTTPException(status_code=404, detail="Parquet no encontrado")
+    report = await EXECUTORS.interactive.run(render_profile, Path(entry.profile), limit)
+    return PlainTextResponse(report)
+
+
+@router.get("/query/{query_id}/data")
+async def get_query_data(
+    query_id: str,
+    request: Request,
+    response: Response,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=100_000),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    batch: int | None = Query(None, ge=1),
+    render_ms: float | None = Query(None, ge=0),
+    service: QueryService = Depends(get_query_service),
+):
+    """
+    format=json   -> página de como mucho 2000 filas en un único JSON
+    format=ndjson -> [offset, offset + limit) en streaming, una fila por
+                     línea, enviada en lotes. El cliente informa del
+                     tiempo que tardó en pintar su último lote (render_ms)
+                     y el servidor ajusta el tamaño del siguiente.
+    """
+    if format == "json" and limit > 2000:
+        raise HTTPException(status_code=400, detail="limit máximo en formato json: 2000")
+
+    # Si la retención borra el resultado entre resolverlo y abrirlo, se
+    # recalcula (una vez) en lugar de fallar
+    for attempt in range(2):
+        # --------------------------------------------------
+        # 1️⃣ Obtener metadata de la query (recalculándola si la retención
+        #    borró su resultado o cambió el dataset: eso ya es una ejecución)
+        # --------------------------------------------------
+        recompute = attempt > 0 or await EXECUTORS.interactive.run(service.needs_recompute, query_id)
+        pool = EXECUTORS.heavy if recompute else EXECUTORS.interactive
+
+        entry = await pool.run(service.result_entry, query_id)
+
+        if not entry:
+            raise HTTPException(status_code=404, detail="Query no encontrada")
+
+        if not entry.output:
+            raise HTTPException(status_code=404, detail="Query sin output")
+
+        parquet_path = Path(entry.output)
+
+        try:
+            # El contenido solo depende del fichero y del rango pedido
+            etag = make_etag(file_fingerprint(parquet_path), format, offset, limit)
+            cached = not_modified(request, etag)
+            if cached is not None:
+                return cached
+
+            if format == "ndjson":
+                stream = await _stream_ndjson(
+                    parquet_path,
+                    offset,
+                    limit,
+                    _adapt_batch_size(batch, render_ms, service.config.get("streaming", {})),
+                )
+                stream.headers["ETag"] = etag
+                return stream
+
+            # --------------------------------------------------
+            # 2️⃣ Lectura, paginación y conversión (fuera del event loop)
+            # --------------------------------------------------
+            total, records = await EXECUTORS.interactive.run(_read_page, parquet_path, offset, limit)
+            break
+
+        except FileNotFoundError:
+            if attempt:
+                raise HTTPException(status_code=404, detail="Parquet no encontrado")
 
     # --------------------------------------------------
-    # 2️⃣ Cargar dataset
+    # 3️⃣ Respuesta estructurada
     # --------------------------------------------------
+    response.headers["ETag"] = etag
+
+    return {
+        "query_id": query_id,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "rows": records,
+    }
+
+
+def _read_page(parquet_path: Path, offset: int, limit: int) -> tuple[int, list[dict]]:
+    import pandas as pd
+
     df = pd.read_parquet(parquet_path)
 
-    total = len(df)
+    # Paginación + conversión segura a JSON
+    return len(df), _to_records(df.iloc[offset : offset + limit])
 
-    # --------------------------------------------------
-    # 3️⃣ Aplicar paginación
-    # --------------------------------------------------
-    df_slice = df.iloc[offset : offset + limit]
 
-    # --------------------------------------------------
-    # 4️⃣ Conversión segura a JSON
-    # --------------------------------------------------
+async def _stream_ndjson(parquet_path: Path, offset: int, limit: int, batch_size: int):
+    """
+    Lee el parquet lote a lote: ni el servidor carga el resultado entero
+    ni el cliente espera a recibirlo para empezar a pintar.
+
+    Cada lote se lee y serializa en el pool interactivo; la petición se
+    admite (o se rechaza con 429) al principio y sus lotes ya no.
+    """
+    # Se abre ya (FileNotFoundError antes de responder): un borrado
+    # posterior no corta el stream
+    total, batches = await EXECUTORS.interactive.run(_open_batches, parquet_path, offset, limit, batch_size)
+
+    async def generate():
+        while True:
+            chunk = await EXECUTORS.interactive.run(_next_ndjson_chunk, batches, admit=False)
+            if chunk is None:
+                break
+            yield chunk
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={
+            "X-Total-Count": str(total),
+            "X-Batch-Size": str(batch_size),
+        },
+    )
+
+
+def _open_batches(parquet_path: Path, offset: int, limit: int, batch_size: int):
+    from core._5_output_writer import iter_result_batches, result_rows
+
+    batches = iter_result_batches(parquet_path, offset, limit, batch_size)
+    return result_rows(parquet_path), batches
+
+
+def _next_ndjson_chunk(batches) -> bytes | None:
+    batch = next(batches, None)
+    if batch is None:
+        return None
+
+    return "".join(
+        json.dumps(row, default=_json_default) + "\n"
+        for row in batch.to_pylist()
+    ).encode("utf-8")
+
+
+def _adapt_batch_size(batch: int | None, render_ms: float | None, cfg: dict) -> int:
+    """
+    Lote siguiente = lote actual escalado para que pintarlo cueste
+    target_render_ms (como mucho x2 / /2 por paso).
+    """
+    lo = int(cfg.get("min_batch_size", 100))
+    hi = int(cfg.get("max_batch_size", 20000))
+    size = batch or int(cfg.get("batch_size", 500))
+
+    if render_ms:
+        factor = float(cfg.get("target_render_ms", 50)) / render_ms
+        size = int(size * min(max(factor, 0.5), 2.0))
+
+    return min(max(size, lo), hi)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _to_records(df: pd.DataFrame) -> list[dict]:
+    """
+    Filas -> dicts con tipos nativos (numpy no es serializable)
+    """
+    import numpy as np
+
     records = []
-    columns = df_slice.reset_index().columns
+    columns = df.reset_index().columns
 
-    for row in df_slice.reset_index().itertuples(index=False):
+    for row in df.reset_index().itertuples(index=False):
         record = {}
 
         for field, value in zip(columns, row):
@@ -126,25 +602,108 @@ def get_query_data(
 
         records.append(record)
 
-    # --------------------------------------------------
-    # 5️⃣ Respuesta estructurada
-    # --------------------------------------------------
-    return {
-        "query_id": query_id,
-        "total": total,
-        "offset": offset,
-        "limit": limit,
-        "rows": records,
-    }
+    return records
+
+
+@router.get("/patterns/top")
+async def get_top_patterns(
+    side: str = Query("observation", pattern="^(observation|prediction)$"),
+    length: int = Query(2, ge=1),
+    limit: int = Query(20, ge=1, le=500),
+    given: str | None = None,
+    dataset: str | None = None,
+    service: QueryService = Depends(get_query_service),
+):
+    """
+    Prefijos más frecuentes de un lado (opcionalmente condicionados
+    al patrón `given` del otro lado)
+    """
+    try:
+        return await EXECUTORS.heavy.run(service.top_patterns, side, length, limit, given, dataset)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/stats/cooccurrence")
+async def get_cooccurrence(
+    event: int = Query(..., ge=0),
+    direction: str = Query("obs_to_pred", pattern="^(obs_to_pred|pred_to_obs)$"),
+    k: int = Query(10, ge=1, le=500),
+    dataset: str | None = None,
+    service: QueryService = Depends(get_query_service),
+):
+    """
+    Eventos que más co-ocurren con `event` en el otro lado de la ventana
+    """
+    return await _top_k_or_404(service, direction, event, k, dataset)
+
+
+@router.get("/stats/transitions")
+async def get_transitions(
+    event: int = Query(..., ge=0),
+    side: str = Query("observation", pattern="^(observation|prediction)$"),
+    k: int = Query(10, ge=1, le=500),
+    dataset: str | None = None,
+    service: QueryService = Depends(get_query_service),
+):
+    """
+    Eventos que más siguen a `event` dentro de una misma secuencia
+    """
+    matrix = "obs_transitions" if side == "observation" else "pred_transitions"
+    return await _top_k_or_404(service, matrix, event, k, dataset)
 
 
+async def _top_k_or_404(service: QueryService, matrix: str, event: int, k: int, dataset):
+    # Puede cargar el dataset (y sus matrices) la primera vez: pool pesado
+    try:
+        return await EXECUTORS.heavy.run(service.cooccurrence_top_k, matrix, event, k, dataset)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 
 @router.get("/events")
-def get_event_dictionary(
+async def get_event_dictionary(
+    request: Request,
+    response: Response,
     service: QueryService = Depends(get_query_service),
 ):
     """
     Devuelve el diccionario enriquecido de eventos
     """
-    event_dict = build_event_dictionary(service.config)
-    return event_dict
+    paths = service.config["paths"]
+    etag = make_etag(
+        file_fingerprint(Path(paths["dataset_dicctionary"])),
+        file_fingerprint(Path(paths["components_config"])),
+        service.config["percentiles"],
+    )
+
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    response.headers["ETag"] = etag
+
+    # El diccionario se construye la primera vez que se pide (no al
+    # arrancar) y se reutiliza mientras no cambien sus ficheros
+    if _EVENT_DICTIONARY.get("etag") != etag:
+        from core._6_event_dictionary import build_event_dictionary
+
+        value = await EXECUTORS.interactive.run(build_event_dictionary, service.config)
+        _EVENT_DICTIONARY.update(etag=etag, value=value)
+
+    return _EVENT_DICTIONARY["value"]
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(service: QueryService = Depends(get_query_service)):
+    """
+    Métricas en formato de texto de Prometheus
+    """
+    return PlainTextResponse(
+        METRICS.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
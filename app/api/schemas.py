@@ -1,17 +1,57 @@
 # api/schemas.py
 
-from typing import Optional
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Literal, Optional
+from pydantic import BaseModel, Field
 
 
 class QueryRequest(BaseModel):
     src: Optional[str] = None
     dst: Optional[str] = None
+    explain: bool = False
+
+    # Rango temporal [time_from, time_to) sobre el inicio de la ventana
+    time_from: Optional[datetime] = None
+    time_to: Optional[datetime] = None
+    time_field: Literal["observation", "prediction"] = "observation"
+
+    # Nombre del dataset (None -> dataset por defecto)
+    dataset: Optional[str] = None
+
+    # Vista agregada sobre la que se evalúan src/dst (ids de componente o
+    # de percentil en lugar de eventos). None -> secuencias de eventos
+    view: Optional[Literal["component", "percentile"]] = None
+
+    # Preview: recuento + primeras filas sin materializar la consulta.
+    # Con estimate=True el recuento se estima sobre una muestra
+    preview: bool = False
+    estimate: bool = False
+    preview_rows: Optional[int] = Field(None, ge=0, le=1000)
+
+    # Ejecución en segundo plano: 202 con el query_id al admitirla y el
+    # avance por GET /query/{query_id}/progress (SSE)
+    background: bool = False
 
 
 class QueryResponse(BaseModel):
+    query_id: Optional[str] = None
     rows: int
-    output: str
+    output: Optional[str] = None
+    cached: Optional[bool] = None
+    plan: Optional[dict] = None
+    timings: Optional[dict] = None
+
+    # Solo en modo preview
+    preview: Optional[bool] = None
+    exact: Optional[bool] = None
+    estimate: Optional[dict] = None
+    data: Optional[list[dict]] = None
+
+
+class CombineRequest(BaseModel):
+    # difference = la primera query menos todas las demás
+    op: Literal["intersection", "difference", "union", "overlap"]
+    queries: list[str] = Field(..., min_length=2, max_length=20)
 
 
 class QueryListResponse(BaseModel):
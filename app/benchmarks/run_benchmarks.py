@@ -0,0 +1,357 @@
+# app/benchmarks/run_benchmarks.py
+"""
+Suite de benchmarks: preprocesado, motor de consultas y endpoints de datos
+sobre un dataset sintético (ver synthetic_dataset.py).
+
+Uso (desde app/):
+    python -m benchmarks.run_benchmarks --rows 100000 500000
+    python -m benchmarks.run_benchmarks --compare output/benchmarks/<anterior>.json
+
+Los resultados se guardan en JSON (output/benchmarks/) para poder
+comparar ejecuciones entre sí.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+APP_DIR = Path(__file__).resolve().parents[1]
+
+from core._1_config_loader import load_config
+from core._2_preprocessor import (
+    ROW_ID_COLUMN,
+    _preprocess_dataframe,
+    compute_dataset_stats,
+    time_columns,
+)
+from core._3_input_controller import parse_pattern
+from core._4_query_engine import run_query
+from core._7_query_planner import plan_query
+
+from benchmarks.synthetic_dataset import generate_windows, write_windows
+
+
+# -------------------------------------------------------------------------
+# Medición
+# -------------------------------------------------------------------------
+
+def timed(fn: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """
+    Ejecuta fn `warmup + repeat` veces y resume las `repeat` últimas (ms).
+    """
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+
+    samples = np.array(samples)
+
+    return {
+        "min_ms": round(float(samples.min()), 3),
+        "median_ms": round(float(np.median(samples)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "mean_ms": round(float(samples.mean()), 3),
+        "repeat": repeat,
+    }
+
+
+# -------------------------------------------------------------------------
+# 1️⃣ Preprocesado
+# -------------------------------------------------------------------------
+
+def bench_preprocessing(config, rows_list: List[int], gen: Dict[str, Any], repeat: int) -> List[dict]:
+    results = []
+
+    for rows in rows_list:
+        raw = generate_windows(config, rows, **gen)
+        timing = timed(lambda: _preprocess_dataframe(raw, config), repeat, warmup=0)
+
+        results.append({
+            "rows": rows,
+            **timing,
+            "rows_per_s": round(rows / (timing["median_ms"] / 1000)),
+        })
+        print(f"  preprocesado {rows:>10,} filas: {timing['median_ms']:>10.1f} ms")
+
+    return results
+
+
+# -------------------------------------------------------------------------
+# 2️⃣ Motor de consultas (por clase de patrón)
+# -------------------------------------------------------------------------
+
+def pattern_classes(df: pd.DataFrame, separator: str) -> Dict[str, tuple]:
+    """
+    Patrones representativos construidos a partir de los datos, para que
+    todas las clases devuelvan resultados independientemente del seed.
+    """
+    obs_levels, pred_levels = df.index.levels
+    obs_codes, pred_codes = df.index.codes
+
+    top_obs = obs_levels[np.bincount(obs_codes[obs_codes >= 0]).argmax()]
+    top_pred = pred_levels[np.bincount(pred_codes[pred_codes >= 0]).argmax()]
+
+    a = top_obs.split(separator)[0]
+    b = top_pred.split(separator)[0]
+
+    return {
+        "exact": (top_obs, None),
+        "wildcard": (f"{a}{separator}?{separator}*", None),
+        "prefix": (f"{a}{separator}*", None),
+        "src_dst": (f"{a}{separator}*", f"{b}{separator}*"),
+        "dst_exact": (None, top_pred),
+    }
+
+
+def bench_queries(config, df: pd.DataFrame, repeat: int) -> List[dict]:
+    separator = config["processing"]["separator"]
+    stats = compute_dataset_stats(df, config)
+
+    # Igual que en el servicio con carga perezosa: claves + row_id + tiempos
+    keys = df[[ROW_ID_COLUMN] + [c for c in time_columns(config).values() if c in df.columns]]
+
+    results = []
+
+    for name, (src, dst) in pattern_classes(df, separator).items():
+        src_pattern = parse_pattern(src, "observation", config) if src else None
+        dst_pattern = parse_pattern(dst, "prediction", config) if dst else None
+
+        def query():
+            plan = plan_query(src_pattern, dst_pattern, config, stats)
+            return run_query(keys, src_pattern, dst_pattern, config, plan=plan), plan
+
+        matched, plan = query()
+        timing = timed(query, repeat)
+
+        results.append({
+            "class": name,
+            "src": src,
+            "dst": dst,
+            "rows": len(matched),
+            "strategies": [s.strategy for s in plan.steps],
+            **timing,
+        })
+        print(f"  {name:<10} {str(src):>16} | {str(dst):<12} {len(matched):>9,} filas: {timing['median_ms']:>8.2f} ms")
+
+    return results
+
+
+# -------------------------------------------------------------------------
+# 3️⃣ API: profundidad de paginación y serialización
+# -------------------------------------------------------------------------
+
+def bench_api(config, raw: pd.DataFrame, df: pd.DataFrame, repeat: int, workdir: Path) -> Dict[str, Any]:
+    """
+    Levanta la app real (TestClient) sobre el dataset sintético. Las
+    rutas se redirigen con las variables de entorno del config loader.
+    """
+    raw_path = write_windows(raw, workdir / "raw.parquet")
+
+    os.environ.update({
+        "DATASET_RAW_PATH": str(raw_path),
+        "DATASET_PROCESSED_PATH": str(workdir / "processed" / "indexed.parquet"),
+        "DATASET_PARTITIONED_PATH": str(workdir / "processed" / "partitioned"),
+        "OUTPUT_DIR": str(workdir / "queries"),
+        "OUTPUT_DIR_CSV": str(workdir / "queries_csv"),
+    })
+
+    from fastapi.testclient import TestClient
+    from api.routes import _json_default, _to_records
+    from main import app
+
+    client = TestClient(app)
+    separator = config["processing"]["separator"]
+
+    # Consulta amplia: resultado grande para paginar
+    src = pattern_classes(df, separator)["prefix"][0]
+
+    t0 = time.perf_counter()
+    query = client.post("/query", json={"src": src}).json()
+    first_run_ms = (time.perf_counter() - t0) * 1000
+
+    query_id, total = query["query_id"], query["rows"]
+    print(f"  POST /query src={src}: {total:,} filas en {first_run_ms:.1f} ms (incluye carga)")
+
+    pagination = []
+    for depth in (0.0, 0.25, 0.5, 0.9):
+        offset = int(total * depth)
+
+        for fmt in ("json", "ndjson"):
+            url = f"/query/{query_id}/data?offset={offset}&limit=500&format={fmt}"
+            response = client.get(url)
+
+            pagination.append({
+                "depth": depth,
+                "offset": offset,
+                "format": fmt,
+                "bytes": len(response.content),
+                **timed(lambda: client.get(url), repeat),
+            })
+
+    for row in pagination:
+        print(f"  data {row['format']:<6} offset {row['offset']:>9,}: {row['median_ms']:>8.2f} ms")
+
+    # Serialización aislada por tamaño de página
+    page_source = pd.read_parquet(query["output"])
+
+    serialisation = []
+    for size in (100, 500, 2000):
+        page = page_source.iloc[:size]
+
+        as_json = json.dumps(_to_records(page), default=_json_default).encode()
+        as_ndjson = "".join(
+            json.dumps(r, default=_json_default) + "\n" for r in _to_records(page)
+        ).encode()
+
+        serialisation.append({
+            "rows": len(page),
+            "json": timed(lambda: json.dumps(_to_records(page), default=_json_default), repeat),
+            "json_bytes": len(as_json),
+            "json_gzip_bytes": len(gzip.compress(as_json, 6)),
+            "ndjson_bytes": len(as_ndjson),
+        })
+
+    return {
+        "query": {"src": src, "rows": total, "first_run_ms": round(first_run_ms, 3)},
+        "pagination": pagination,
+        "serialisation": serialisation,
+    }
+
+
+# -------------------------------------------------------------------------
+# Resultados
+# -------------------------------------------------------------------------
+
+def _meta(args) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, cwd=APP_DIR,
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "args": {k: (list(v) if isinstance(v, tuple) else v) for k, v in vars(args).items()
+                 if k not in ("out", "compare")},
+    }
+
+
+def _flatten(results: Dict[str, Any]) -> Dict[str, float]:
+    """
+    {clave legible: median_ms} para comparar dos ejecuciones.
+    """
+    flat = {}
+
+    for row in results.get("preprocessing", []):
+        flat[f"preprocessing/{row['rows']}"] = row["median_ms"]
+    for row in results.get("queries", []):
+        flat[f"query/{row['class']}"] = row["median_ms"]
+    for row in results.get("api", {}).get("pagination", []):
+        flat[f"data/{row['format']}/{row['depth']}"] = row["median_ms"]
+    for row in results.get("api", {}).get("serialisation", []):
+        flat[f"serialise/{row['rows']}"] = row["json"]["median_ms"]
+
+    return flat
+
+
+def compare(current: Dict[str, Any], previous_path: Path) -> None:
+    with Path(previous_path).open("r", encoding="utf-8") as f:
+        previous = json.load(f)
+
+    now, before = _flatten(current), _flatten(previous)
+
+    print(f"\n📊 Comparación con {previous_path} ({previous['meta'].get('commit')})")
+    for key in sorted(now.keys() & before.keys()):
+        ratio = now[key] / before[key] if before[key] else float("nan")
+        flag = "🔴" if ratio > 1.1 else "🟢" if ratio < 0.9 else "  "
+        print(f"  {flag} {key:<28} {before[key]:>10.2f} -> {now[key]:>10.2f} ms  (x{ratio:.2f})")
+
+
+# -------------------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------------------
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Benchmarks del analizador de ventanas")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000],
+                        help="tamaños de dataset (el mayor se usa para consultas y API)")
+    parser.add_argument("--obs-length", type=int, nargs=2, default=(1, 12), metavar=("MIN", "MAX"))
+    parser.add_argument("--pred-length", type=int, nargs=2, default=(1, 6), metavar=("MIN", "MAX"))
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sections", nargs="+", default=["preprocessing", "queries", "api"],
+                        choices=["preprocessing", "queries", "api"])
+    parser.add_argument("--out", type=Path, default=APP_DIR / "output" / "benchmarks")
+    parser.add_argument("--compare", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    # Rutas relativas de config.yml y plantillas se resuelven desde app/
+    os.chdir(APP_DIR)
+
+    config = load_config()
+    gen = {
+        "obs_length": tuple(args.obs_length),
+        "pred_length": tuple(args.pred_length),
+        "skew": args.skew,
+        "seed": args.seed,
+    }
+
+    results: Dict[str, Any] = {"meta": _meta(args)}
+
+    if "preprocessing" in args.sections:
+        print("1️⃣ Preprocesado")
+        results["preprocessing"] = bench_preprocessing(config, args.rows, gen, max(1, args.repeat // 2))
+
+    rows = max(args.rows)
+    raw = generate_windows(config, rows, **gen)
+    df = _preprocess_dataframe(raw, config)
+
+    if "queries" in args.sections:
+        print(f"2️⃣ Consultas ({rows:,} filas)")
+        results["queries"] = bench_queries(config, df, args.repeat)
+
+    if "api" in args.sections:
+        print(f"3️⃣ API ({rows:,} filas)")
+        with tempfile.TemporaryDirectory(prefix="wea_bench_") as workdir:
+            results["api"] = bench_api(config, raw, df, args.repeat, Path(workdir))
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    out_path = args.out / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with out_path.open("w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\n✅ Resultados en {out_path}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
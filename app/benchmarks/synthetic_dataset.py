@@ -0,0 +1,142 @@
+# app/benchmarks/synthetic_dataset.py
+"""
+Generador de datasets de ventanas sintéticos con el mismo esquema que el
+raw real (columnas de config.yml) y los event_id del diccionario real.
+
+Uso:
+    python -m benchmarks.synthetic_dataset --rows 1000000 --out /tmp/raw.parquet
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core._1_config_loader import load_config
+
+
+# -------------------------------------------------------------------------
+# API principal
+# -------------------------------------------------------------------------
+
+def load_event_ids(config: Dict[str, Any]) -> np.ndarray:
+    """
+    event_id del diccionario real (02_EventDictionary_notebook.json).
+    """
+    path = Path(config["paths"]["dataset_dicctionary"])
+    with path.open("r", encoding="utf-8") as f:
+        mapping = json.load(f)
+
+    return np.array(sorted(int(v) for v in mapping.values()), dtype=np.int64)
+
+
+def generate_windows(
+    config: Dict[str, Any],
+    rows: int,
+    obs_length: Tuple[int, int] = (1, 12),
+    pred_length: Tuple[int, int] = (1, 6),
+    skew: float = 1.1,
+    seed: int = 0,
+    event_ids: Optional[np.ndarray] = None,
+    as_strings: bool = True,
+) -> pd.DataFrame:
+    """
+    Genera `rows` ventanas consecutivas (paso de 10 min, tobs 60,
+    tlead 10, tpred 30) con secuencias de longitud uniforme en
+    [min, max] y eventos con popularidad Zipf(skew): skew=0 -> uniforme,
+    skew>1 -> unos pocos eventos dominan, como en los datos reales.
+
+    as_strings=True guarda los eventos como "[1, 2, 3]" (formato del raw).
+    """
+
+    rng = np.random.default_rng(seed)
+    events = load_event_ids(config) if event_ids is None else np.asarray(event_ids)
+
+    # Ranking de popularidad aleatorio pero reproducible
+    ranked = rng.permutation(events)
+    weights = 1.0 / np.arange(1, len(ranked) + 1) ** skew
+    weights /= weights.sum()
+
+    obs = _sequences(rng, rows, obs_length, ranked, weights)
+    pred = _sequences(rng, rows, pred_length, ranked, weights)
+
+    if as_strings:
+        obs = [str(s) for s in obs]
+        pred = [str(s) for s in pred]
+
+    t0 = pd.Timestamp("2024-01-01") + pd.to_timedelta(np.arange(rows) * 10, unit="m")
+
+    columns = config["columns"]
+
+    return pd.DataFrame({
+        columns["observation"]["start"]: t0,
+        columns["observation"]["end"]: t0 + pd.Timedelta(minutes=60),
+        columns["observation"]["events"]: obs,
+        columns["prediction"]["start"]: t0 + pd.Timedelta(minutes=70),
+        columns["prediction"]["end"]: t0 + pd.Timedelta(minutes=100),
+        columns["prediction"]["events"]: pred,
+    })
+
+
+def write_windows(df: pd.DataFrame, path: Path) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(path, index=False)
+    return path
+
+
+# -------------------------------------------------------------------------
+# Helpers internos
+# -------------------------------------------------------------------------
+
+def _sequences(
+    rng: np.random.Generator,
+    rows: int,
+    length: Tuple[int, int],
+    ranked: np.ndarray,
+    weights: np.ndarray,
+) -> list:
+    """
+    Todas las secuencias en un único sorteo vectorizado y luego troceado.
+    """
+    lo, hi = length
+    lengths = rng.integers(lo, hi + 1, size=rows)
+
+    flat = rng.choice(ranked, size=int(lengths.sum()), p=weights)
+    bounds = np.cumsum(lengths)[:-1]
+
+    return [chunk.tolist() for chunk in np.split(flat, bounds)]
+
+
+# -------------------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------------------
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Genera un dataset de ventanas sintético")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--obs-length", type=int, nargs=2, default=(1, 12), metavar=("MIN", "MAX"))
+    parser.add_argument("--pred-length", type=int, nargs=2, default=(1, 6), metavar=("MIN", "MAX"))
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, required=True)
+    args = parser.parse_args()
+
+    config = load_config()
+    df = generate_windows(
+        config,
+        args.rows,
+        obs_length=tuple(args.obs_length),
+        pred_length=tuple(args.pred_length),
+        skew=args.skew,
+        seed=args.seed,
+    )
+
+    print(f"✅ {len(df):,} ventanas -> {write_windows(df, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# app/helpers/_10_prefix_tree.py
+import heapq
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+# -------------------------------------------------------------------------
+# Árbol de prefijos con contadores
+# -------------------------------------------------------------------------
+
+class PrefixTree:
+    """
+    Trie sobre secuencias de eventos (enteros). Cada nodo guarda cuántas
+    filas empiezan por el prefijo que representa.
+
+    Nodo = [count, {event_id: nodo_hijo}]
+    """
+
+    def __init__(self, max_depth: int = 8):
+        self.max_depth = max_depth
+        self.root: list = [0, {}]
+        self.rows = 0  # filas ya contadas (para refrescos incrementales)
+        # Huella de esas filas (LoadedDataset.prefix_version): un árbol
+        # solo se refresca sobre un dataset que empieza por ellas
+        self.version: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # Construcción
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_index(
+        cls,
+        index: pd.MultiIndex,
+        level: int,
+        separator: str,
+        max_depth: int = 8
+    ) -> "PrefixTree":
+        tree = cls(max_depth=max_depth)
+        tree.refresh(index, level, separator)
+        return tree
+
+    def refresh(self, index: pd.MultiIndex, level: int, separator: str) -> int:
+        """
+        Añade solo las filas nuevas (posición >= self.rows). Con un dataset
+        que solo crece por el final el árbol nunca se reconstruye entero.
+        Devuelve cuántas filas se han añadido.
+        """
+        codes = index.codes[level][self.rows:]
+        added = len(codes)
+
+        if added:
+            self.add_levels(index.levels[level], _weights(codes, len(index.levels[level])), separator)
+            self.rows += added
+
+        return added
+
+    def add_levels(self, levels: pd.Index, weights: np.ndarray, separator: str) -> None:
+        """
+        Cuenta cada secuencia distinta una sola vez, con su peso.
+        """
+        for seq, weight in zip(levels, weights):
+            if weight:
+                self.add(_encode(seq, separator), int(weight))
+
+    def add(self, events: List[int], weight: int = 1) -> None:
+        node = self.root
+        node[0] += weight
+
+        for event in events[:self.max_depth]:
+            child = node[1].get(event)
+            if child is None:
+                child = node[1][event] = [0, {}]
+            child[0] += weight
+            node = child
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    @property
+    def total(self) -> int:
+        return self.root[0]
+
+    def top_k(self, length: int, k: int = 20) -> List[Dict[str, Any]]:
+        """
+        Los k prefijos de `length` eventos más frecuentes.
+        """
+        if length < 1 or length > self.max_depth:
+            raise ValueError(f"length debe estar entre 1 y {self.max_depth}")
+
+        best = heapq.nlargest(
+            k,
+            self._prefixes(self.root, [], length),
+            key=lambda item: (item[1], [-e for e in item[0]]),
+        )
+
+        return [
+            {
+                "prefix": prefix,
+                "count": count,
+                "share": count / self.total if self.total else 0.0,
+            }
+            for prefix, count in best
+        ]
+
+    def _prefixes(self, node: list, prefix: List[int], remaining: int):
+        if remaining == 0:
+            yield list(prefix), node[0]
+            return
+
+        for event, child in node[1].items():
+            prefix.append(event)
+            yield from self._prefixes(child, prefix, remaining - 1)
+            prefix.pop()
+
+
+# -------------------------------------------------------------------------
+# Helpers
+# -------------------------------------------------------------------------
+
+def prefix_tree_from_rows(
+    index: pd.MultiIndex,
+    level: int,
+    separator: str,
+    max_depth: int = 8
+) -> PrefixTree:
+    """
+    Árbol de un subconjunto de filas (p. ej. las que cumplen el patrón
+    del otro lado). Mismo coste: una pasada por secuencias distintas.
+    """
+    tree = PrefixTree(max_depth=max_depth)
+    codes = index.codes[level]
+    tree.add_levels(index.levels[level], _weights(codes, len(index.levels[level])), separator)
+    tree.rows = len(codes)
+    return tree
+
+
+def _weights(codes: np.ndarray, n_levels: int) -> np.ndarray:
+    return np.bincount(codes[codes >= 0], minlength=n_levels)
+
+
+def _encode(seq: Optional[str], separator: str) -> List[int]:
+    if not seq:
+        return []
+    return [int(e) for e in seq.split(separator) if e.lstrip("-").isdigit()]
@@ -0,0 +1,67 @@
+# app/helpers/_11_preview.py
+from statistics import NormalDist
+from typing import Dict, Any
+
+import numpy as np
+import pandas as pd
+
+
+# -------------------------------------------------------------------------
+# Muestreo
+# -------------------------------------------------------------------------
+
+def sample_frame(df: pd.DataFrame, size: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Muestra aleatoria simple (sin reemplazo) de `size` filas que conserva
+    el orden original, de modo que los cortes temporales por búsqueda
+    binaria siguen siendo válidos sobre la muestra.
+    """
+
+    if size >= len(df):
+        return df
+
+    rng = np.random.default_rng(seed)
+    positions = np.sort(rng.choice(len(df), size=size, replace=False))
+
+    return df.iloc[positions]
+
+
+# -------------------------------------------------------------------------
+# Estimación
+# -------------------------------------------------------------------------
+
+def estimate_count(
+    hits: int,
+    sample_size: int,
+    total: int,
+    confidence: float = 0.95
+) -> Dict[str, Any]:
+    """
+    Estima cuántas de `total` filas cumplen la consulta a partir de
+    `hits` aciertos en una muestra de `sample_size`.
+
+    Intervalo de Wilson (se comporta bien con proporciones cercanas a 0,
+    el caso típico) con corrección de población finita.
+    """
+
+    if sample_size <= 0 or total <= 0:
+        return {"rows": 0, "low": 0, "high": 0, "confidence": confidence}
+
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = hits / sample_size
+
+    fpc = (total - sample_size) / (total - 1) if total > 1 else 0.0
+    z2n = z * z / sample_size
+
+    center = (p + z2n / 2) / (1 + z2n)
+    half = z * np.sqrt(fpc * (p * (1 - p) / sample_size + z2n / (4 * sample_size))) / (1 + z2n)
+
+    low = max(center - half, 0.0)
+    high = min(center + half, 1.0)
+
+    return {
+        "rows": int(round(p * total)),
+        "low": int(np.floor(low * total)),
+        "high": int(np.ceil(high * total)),
+        "confidence": confidence,
+    }
@@ -0,0 +1,199 @@
+# app/helpers/_12_event_predicates.py
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from core._6_event_dictionary import build_event_dictionary
+
+
+# Sintaxis de un token predicado dentro de un patrón:
+#
+#   Battery_Active_Power          -> cualquier evento del componente
+#   Battery_Active_Power:Q90      -> percentil destino exacto
+#   Battery_Active_Power:Q90+     -> percentil destino >= Q90
+#   Battery_Active_Power:Q20-     -> percentil destino <= Q20
+#   Battery_Active_Power:Q20-Q50  -> rango (ambos incluidos)
+#   any:Q95                       -> cualquier componente
+#
+# Sin '.' ni espacios: el normalizador de patrones los trata como separador
+_PREDICATE_REGEX = re.compile(
+    r"^(?P<component>[A-Za-z][\w-]*?)"
+    r"(?::(?P<lo>Q\d+)(?:(?P<op>[+-])(?P<hi>Q\d+)?)?)?$"
+)
+
+ANY_COMPONENT = "any"
+
+
+@dataclass
+class EventLookup:
+    """
+    Tablas id -> (componente, percentil) indexadas por event_id.
+    -1 = evento desconocido o fuera del esquema de percentiles.
+    """
+    components: List[str]
+    percentiles: List[str]
+    component_of: np.ndarray   # int32[n_events]
+    percentile_of: np.ndarray  # int8[n_events] (índice en config.percentiles)
+
+    @property
+    def n_events(self) -> int:
+        return len(self.component_of)
+
+
+# -------------------------------------------------------------------------
+# API principal
+# -------------------------------------------------------------------------
+
+def is_predicate(token: str) -> bool:
+    """
+    Un token es predicado si empieza por letra (como exige
+    _PREDICATE_REGEX). Ids, '?', '*' y sus combinaciones ("475*") siguen
+    siendo patrones de eventos.
+    """
+    return token[:1].isascii() and token[:1].isalpha()
+
+
+def load_event_lookup(config: Dict[str, Any]) -> EventLookup:
+    """
+    Construye (una vez por diccionario y esquema de percentiles) las
+    tablas de búsqueda a partir del diccionario enriquecido.
+    """
+
+    path = Path(config["paths"]["dataset_dicctionary"])
+    key = (str(path), path.stat().st_mtime_ns, tuple(config["percentiles"]))
+
+    with _LOOKUP_LOCK:
+        lookup = _LOOKUPS.get(key)
+        if lookup is None:
+            lookup = _LOOKUPS[key] = _build_lookup(config)
+
+    return lookup
+
+
+def compile_predicate(token: str, lookup: EventLookup) -> Tuple[str, np.ndarray]:
+    """
+    Traduce un token predicado a (forma canónica, event_ids que lo cumplen).
+    """
+
+    match = _PREDICATE_REGEX.match(token)
+    if not match:
+        raise ValueError(f"Predicado no válido: {token!r}")
+
+    component = _resolve_component(match.group("component"), lookup)
+    lo, hi, spec = _resolve_percentiles(match, lookup)
+
+    mask = (lookup.percentile_of >= lo) & (lookup.percentile_of <= hi)
+
+    if component is not None:
+        mask &= lookup.component_of == lookup.components.index(component)
+
+    if component is None and spec is None:
+        # "any" a secas: explícito para no confundirlo con '?'
+        spec = f"{lookup.percentiles[0]}-{lookup.percentiles[-1]}"
+
+    canonical = component or ANY_COMPONENT
+    if spec:
+        canonical = f"{canonical}:{spec}"
+
+    return canonical, np.flatnonzero(mask)
+
+
+def event_mask(event_ids: np.ndarray, n_events: int) -> np.ndarray:
+    """
+    Máscara de pertenencia indexable por event_id (tamaño n_events + 1:
+    la última posición recoge ids fuera de rango y vale False).
+    """
+    mask = np.zeros(n_events + 1, dtype=bool)
+    mask[event_ids[event_ids < n_events]] = True
+    return mask
+
+
+# -------------------------------------------------------------------------
+# Helpers internos
+# -------------------------------------------------------------------------
+
+_LOOKUPS: Dict[tuple, EventLookup] = {}
+_LOOKUP_LOCK = Lock()
+
+
+def _build_lookup(config: Dict[str, Any]) -> EventLookup:
+    events = build_event_dictionary(config)
+    percentiles = list(config["percentiles"])
+
+    components = sorted({e["component"] for e in events.values()})
+    component_ids = {name: i for i, name in enumerate(components)}
+
+    n_events = max(events, default=-1) + 1
+
+    component_of = np.full(n_events, -1, dtype=np.int32)
+    percentile_of = np.full(n_events, -1, dtype=np.int8)
+
+    for event_id, event in events.items():
+        component_of[event_id] = component_ids[event["component"]]
+        percentile_of[event_id] = event["percentile_index"]
+
+    return EventLookup(
+        components=components,
+        percentiles=percentiles,
+        component_of=component_of,
+        percentile_of=percentile_of,
+    )
+
+
+def _resolve_component(name: str, lookup: EventLookup) -> Optional[str]:
+    if name.lower() == ANY_COMPONENT:
+        return None
+
+    if name in lookup.components:
+        return name
+
+    # Tolerar mayúsculas/minúsculas: la forma canónica usa el nombre real
+    matches = [c for c in lookup.components if c.lower() == name.lower()]
+    if len(matches) == 1:
+        return matches[0]
+
+    raise ValueError(f"Componente desconocido: {name}")
+
+
+def _resolve_percentiles(match: re.Match, lookup: EventLookup) -> Tuple[int, int, Optional[str]]:
+    """
+    Rango [lo, hi] de índices de percentil y su forma canónica.
+    """
+
+    last = len(lookup.percentiles) - 1
+
+    if match.group("lo") is None:
+        return 0, last, None
+
+    lo = _percentile_index(match.group("lo"), lookup)
+    op, hi = match.group("op"), match.group("hi")
+
+    if op is None:
+        return lo, lo, lookup.percentiles[lo]
+
+    if op == "+":
+        if hi is not None:
+            raise ValueError(f"Rango de percentiles no válido: {match.string!r}")
+        return lo, last, f"{lookup.percentiles[lo]}+"
+
+    if hi is None:
+        return 0, lo, f"{lookup.percentiles[lo]}-"
+
+    hi = _percentile_index(hi, lookup)
+    if hi < lo:
+        lo, hi = hi, lo
+
+    return lo, hi, f"{lookup.percentiles[lo]}-{lookup.percentiles[hi]}"
+
+
+def _percentile_index(label: str, lookup: EventLookup) -> int:
+    # "Q5" y "Q05" son el mismo percentil
+    value = int(label[1:])
+    for i, p in enumerate(lookup.percentiles):
+        if int(p[1:]) == value:
+            return i
+    raise ValueError(f"Percentil fuera del esquema configurado: {label}")
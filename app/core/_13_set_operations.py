@@ -0,0 +1,84 @@
+# app/helpers/_13_set_operations.py
+from typing import Dict, Any, List
+
+import numpy as np
+
+
+# Operaciones entre resultados guardados (conjuntos de row_id):
+#   intersection -> filas presentes en todas las queries
+#   difference   -> filas de la primera que no están en ninguna otra
+#   union        -> filas de cualquiera de ellas
+#   overlap      -> solo recuentos (no genera resultado)
+SET_OPERATIONS = ("intersection", "difference", "union", "overlap")
+
+# Operaciones en las que el orden de las queries no cambia el resultado
+COMMUTATIVE = ("intersection", "union", "overlap")
+
+
+# -------------------------------------------------------------------------
+# API principal
+# -------------------------------------------------------------------------
+
+def combine_row_ids(op: str, row_ids: List[np.ndarray]) -> np.ndarray:
+    """
+    Aplica la operación sobre los row_id de cada resultado. Devuelve los
+    row_id ordenados (= orden del dataset procesado).
+    """
+
+    _check(op, row_ids)
+
+    sets = [np.unique(np.asarray(ids, dtype=np.int64)) for ids in row_ids]
+    result = sets[0]
+
+    for other in sets[1:]:
+        if op == "intersection":
+            result = np.intersect1d(result, other, assume_unique=True)
+        elif op == "difference":
+            result = np.setdiff1d(result, other, assume_unique=True)
+        elif op == "union":
+            result = np.union1d(result, other)
+
+    return result
+
+
+def overlap_counts(query_ids: List[str], row_ids: List[np.ndarray]) -> Dict[str, Any]:
+    """
+    Tamaños, intersección y unión de todas las queries y, por pares,
+    intersección y similitud de Jaccard.
+    """
+
+    _check("overlap", row_ids)
+
+    sets = [np.unique(np.asarray(ids, dtype=np.int64)) for ids in row_ids]
+
+    pairs = []
+    for i in range(len(sets)):
+        for j in range(i + 1, len(sets)):
+            common = len(np.intersect1d(sets[i], sets[j], assume_unique=True))
+            union = len(sets[i]) + len(sets[j]) - common
+            pairs.append({
+                "a": query_ids[i],
+                "b": query_ids[j],
+                "intersection": common,
+                "only_a": len(sets[i]) - common,
+                "only_b": len(sets[j]) - common,
+                "jaccard": common / union if union else 0.0,
+            })
+
+    intersection = len(combine_row_ids("intersection", sets))
+    union = len(combine_row_ids("union", sets))
+
+    return {
+        "rows": {qid: len(s) for qid, s in zip(query_ids, sets)},
+        "intersection": intersection,
+        "union": union,
+        "jaccard": intersection / union if union else 0.0,
+        "pairs": pairs,
+    }
+
+
+def _check(op: str, row_ids: List[np.ndarray]) -> None:
+    if op not in SET_OPERATIONS:
+        raise ValueError(f"Operación desconocida: {op}")
+    if len(row_ids) < 2:
+        raise ValueError("Se necesitan al menos dos queries")
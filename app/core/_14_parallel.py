@@ -0,0 +1,100 @@
+# app/helpers/_14_parallel.py
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, Any, Callable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+# Paralelismo dentro de una consulta: el trabajo sobre N elementos (claves
+# distintas o filas) se parte en shards contiguos de tamaño fijo que se
+# reparten en un pool de hilos compartido por todo el proceso. Solo
+# compensa con kernels que sueltan el GIL (NumPy, pyarrow.compute).
+DEFAULT_SHARD_ROWS = 1_000_000
+
+
+# -------------------------------------------------------------------------
+# API principal
+# -------------------------------------------------------------------------
+
+def thread_count(config: Dict[str, Any]) -> int:
+    """
+    processing.threads: 0 / ausente => un hilo por core.
+    """
+    threads = int(config["processing"].get("threads") or 0)
+    return threads if threads > 0 else (os.cpu_count() or 1)
+
+
+def shard_bounds(n: int, shard_rows: int) -> List[Tuple[int, int]]:
+    """
+    Rangos [lo, hi) contiguos que cubren 0..n en orden.
+    """
+    shard_rows = max(int(shard_rows), 1)
+    return [(lo, min(lo + shard_rows, n)) for lo in range(0, n, shard_rows)] or [(0, 0)]
+
+
+def map_shards(
+    fn: Callable[[int, int], T],
+    n: int,
+    config: Dict[str, Any]
+) -> List[T]:
+    """
+    Aplica fn(lo, hi) a cada shard y devuelve los resultados EN ORDEN de
+    shard. Con un solo shard (o un solo hilo) se ejecuta en el hilo que
+    llama, sin pasar por el pool.
+    """
+
+    shard_rows = int(config["processing"].get("shard_rows") or DEFAULT_SHARD_ROWS)
+    bounds = shard_bounds(n, shard_rows)
+    threads = thread_count(config)
+
+    if len(bounds) == 1 or threads == 1:
+        return [fn(lo, hi) for lo, hi in bounds]
+
+    owner = threading.get_ident()
+
+    def run(b: Tuple[int, int]) -> T:
+        me = threading.get_ident()
+        _WORKING_FOR[me] = owner
+        try:
+            return fn(*b)
+        finally:
+            _WORKING_FOR.pop(me, None)
+
+    pool = _pool(threads)
+    return list(pool.map(run, bounds))
+
+
+def shard_threads(owner: int) -> List[int]:
+    """
+    Hilos del pool que ejecutan ahora mismo shards lanzados por el hilo
+    `owner` (el perfilador por muestreo los muestrea con él).
+    """
+    return [thread for thread, o in list(_WORKING_FOR.items()) if o == owner]
+
+
+# -------------------------------------------------------------------------
+# Pool de hilos (uno por proceso)
+# -------------------------------------------------------------------------
+
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_SIZE = 0
+_POOL_LOCK = Lock()
+
+# hilo del pool -> hilo que lanzó el shard que está ejecutando
+_WORKING_FOR: Dict[int, int] = {}
+
+
+def _pool(threads: int) -> ThreadPoolExecutor:
+    global _POOL, _POOL_SIZE
+
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_SIZE != threads:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False)
+            _POOL = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="shard")
+            _POOL_SIZE = threads
+
+        return _POOL
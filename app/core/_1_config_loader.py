@@ -1,6 +1,7 @@
 # app/helpers/_1_config_loader.py
 # app/helpers/_1_config_loader.py
 
+import copy
 import os
 from pathlib import Path
 from typing import Dict, Any, List
@@ -16,6 +17,7 @@ import yaml
 ENV_OVERRIDES = {
     "DATASET_RAW_PATH": ("paths", "dataset_raw"),
     "DATASET_PROCESSED_PATH": ("paths", "dataset_processed"),
+    "DATASET_PARTITIONED_PATH": ("paths", "dataset_partitioned"),
     "OUTPUT_DIR": ("paths", "output_dir"),
     "OUTPUT_DIR_CSV": ("paths", "output_dir_csv"),
     "DATASET_DICTIONARY_PATH": ("paths", "dataset_dicctionary"),
@@ -68,6 +70,44 @@ def load_config(config_path: Path | None = None) -> Dict[str, Any]:
     return config
 
 
+def default_dataset_name(config: Dict[str, Any]) -> str:
+    """
+    Nombre del dataset definido en `paths` (el de siempre).
+    """
+    return config.get("datasets", {}).get("default", "default")
+
+
+def dataset_names(config: Dict[str, Any]) -> List[str]:
+    """
+    Datasets servibles: el de `paths` más los de `datasets.extra`.
+    """
+    extra = config.get("datasets", {}).get("extra") or {}
+    return [default_dataset_name(config)] + [n for n in extra if n != default_dataset_name(config)]
+
+
+def config_for_dataset(config: Dict[str, Any], name: str | None) -> Dict[str, Any]:
+    """
+    Devuelve una copia del config cuyas rutas de dataset apuntan al
+    dataset `name`. El resto de secciones (columnas, procesado, salida)
+    se comparten.
+    """
+    if name is None or name == default_dataset_name(config):
+        return config
+
+    extra = config.get("datasets", {}).get("extra") or {}
+    if name not in extra:
+        raise KeyError(f"Dataset desconocido: {name}")
+
+    dataset_config = copy.deepcopy(config)
+    dataset_config["paths"].update(extra[name])
+
+    if "dataset_partitioned" not in extra[name]:
+        # Sin layout particionado propio no puede usar el del dataset base
+        dataset_config.setdefault("partitioning", {})["enabled"] = False
+
+    return dataset_config
+
+
 # -------------------------------------------------------------------------
 # Helpers internos
 # -------------------------------------------------------------------------
@@ -102,11 +142,13 @@ def _resolve_paths(config: Dict[str, Any], base_dir: Path) -> None:
     """
     Convierte paths relativos a absolutos.
     """
-    paths = config.get("paths", {})
-    for key, value in paths.items():
-        p = Path(value)
-        if not p.is_absolute():
-            paths[key] = str((base_dir / p).resolve())
+    extra = config.get("datasets", {}).get("extra") or {}
+
+    for paths in [config.get("paths", {})] + list(extra.values()):
+        for key, value in paths.items():
+            p = Path(value)
+            if not p.is_absolute():
+                paths[key] = str((base_dir / p).resolve())
 
 
 def _validate_config(config: Dict[str, Any]) -> None:
@@ -135,6 +177,16 @@ def _validate_config(config: Dict[str, Any]) -> None:
         if _get_nested_key(config, key_path) is None:
             raise ValueError(f"Falta columna obligatoria: {'.'.join(key_path)}")
 
+    if config.get("partitioning", {}).get("enabled", False):
+        if _get_nested_key(config, ("paths", "dataset_partitioned")) is None:
+            raise ValueError("Falta configuración obligatoria: paths.dataset_partitioned")
+
+    extra = config.get("datasets", {}).get("extra") or {}
+    for name, paths in extra.items():
+        for key in ("dataset_raw", "dataset_processed"):
+            if not isinstance(paths, dict) or paths.get(key) is None:
+                raise ValueError(f"Falta configuración obligatoria: datasets.extra.{name}.{key}")
+
     percentiles = config.get("percentiles")
     if not isinstance(percentiles, list) or not percentiles:
         raise ValueError("percentiles debe ser una lista no vacía")
@@ -1,41 +1,355 @@
 # app/helpers/_2_preprocessor.py 
+import hashlib
+import json
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 
+from core._12_event_predicates import load_event_lookup
 
-def load_or_preprocess_dataset(config: Dict[str, Any]) -> pd.DataFrame:
+
+# Identificador estable de fila: posición en el parquet procesado
+ROW_ID_COLUMN = "row_id"
+
+# Vistas agregadas de las secuencias (columnas derivadas <clave>_<vista>):
+#   component  -> id de componente de cada evento
+#   percentile -> índice del percentil destino de cada evento
+SEQUENCE_VIEWS = ("component", "percentile")
+
+
+def load_or_preprocess_dataset(
+    config: Dict[str, Any],
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
     """
     Carga el dataset procesado si existe.
     Si no existe, carga el raw, lo preprocesa y lo guarda.
     Devuelve siempre un DataFrame listo para consulta.
+
+    columns: proyección opcional. El MultiIndex (obs_seq, pred_seq) y
+    row_id se cargan siempre; el resto de columnas puede pedirse luego
+    con fetch_rows.
     """
 
     processed_path = Path(config["paths"]["dataset_processed"])
     raw_path = Path(config["paths"]["dataset_raw"])
 
     if processed_path.exists():
-        return _load_processed_dataset(processed_path)
+        df = _load_processed_dataset(processed_path, columns)
+        # Procesados anteriores a las vistas: se derivan al cargar
+        return ensure_sequence_views(df, config, columns)
 
     # Si no existe el procesado → preprocesar
     df_raw = _load_raw_dataset(raw_path)
     df_processed = _preprocess_dataframe(df_raw, config)
 
-    _save_processed_dataset(df_processed, processed_path)
+    _save_processed_dataset(
+        df_processed,
+        processed_path,
+        row_group_size=config["processing"].get("row_group_size"),
+    )
+    _save_dataset_stats(
+        _versioned_stats(df_processed, config),
+        _stats_path(processed_path),
+    )
+
+    if columns is not None:
+        # Como al cargar el procesado: las columnas que no existen se ignoran
+        df_processed = df_processed[
+            [c for c in _with_row_id(columns) if c in df_processed.columns]
+        ]
 
     return df_processed
 
 
+def resident_columns(config: Dict[str, Any]) -> Optional[List[str]]:
+    """
+    Columnas que se mantienen en memoria además de las claves de
+    búsqueda. None significa "todas" (carga clásica, sin proyección).
+    """
+    processing = config["processing"]
+
+    if not processing.get("lazy_columns", False):
+        return None
+
+    columns = list(processing.get("resident_columns") or [])
+
+    # Los inicios de ventana se quedan en memoria para el filtro temporal
+    # y las vistas agregadas para poder consultarlas
+    for col in list(time_columns(config).values()) + all_view_columns(config):
+        if col not in columns:
+            columns.append(col)
+
+    return columns
+
+
+def time_columns(config: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Columna de inicio de cada ventana: {"observation": ..., "prediction": ...}
+    """
+    return {
+        side: config["columns"][side]["start"]
+        for side in ("observation", "prediction")
+        if config["columns"][side].get("start")
+    }
+
+
+def sequence_views(config: Dict[str, Any]) -> List[str]:
+    """
+    Vistas agregadas activas (processing.views).
+    """
+    views = list(config["processing"].get("views") or [])
+
+    for view in views:
+        if view not in SEQUENCE_VIEWS:
+            raise ValueError(f"Vista de secuencia desconocida: {view}")
+
+    return views
+
+
+def view_columns(config: Dict[str, Any], view: str) -> Tuple[str, str]:
+    """
+    Columnas (obs, pred) de una vista: "obs_seq_component", "pred_seq_component"
+    """
+    index_columns = config["processing"]["index_columns"]
+    return (
+        f"{index_columns['observation']}_{view}",
+        f"{index_columns['prediction']}_{view}",
+    )
+
+
+def all_view_columns(config: Dict[str, Any]) -> List[str]:
+    return [col for view in sequence_views(config) for col in view_columns(config, view)]
+
+
+def ensure_sequence_views(
+    df: pd.DataFrame,
+    config: Dict[str, Any],
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Añade las columnas de vista que falten (o solo las pedidas en
+    `columns`). Se calculan sobre las secuencias distintas del índice y
+    se proyectan a las filas con sus codes: nunca se recorre fila a fila.
+    """
+
+    missing = [
+        view for view in sequence_views(config)
+        if (columns is None or set(view_columns(config, view)) & set(columns))
+        and not set(view_columns(config, view)) <= set(df.columns)
+    ]
+
+    if not missing:
+        return df
+
+    try:
+        lookup = load_event_lookup(config)
+    except FileNotFoundError as e:
+        print(f"[WARN] Vistas de secuencia no disponibles: {e}")
+        return df
+
+    separator = config["processing"]["separator"]
+    tables = {"component": lookup.component_of, "percentile": lookup.percentile_of}
+
+    for view in missing:
+        for level, col in enumerate(view_columns(config, view)):
+            df[col] = _coarsen_level(df.index, level, tables[view], separator)
+
+    return df
+
+
+def view_frame(df: pd.DataFrame, config: Dict[str, Any], view: str) -> pd.DataFrame:
+    """
+    El mismo dataset indexado por las secuencias de la vista. Las claves
+    originales pasan a ser columnas.
+    """
+    return df.reset_index().set_index(list(view_columns(config, view)))
+
+
+def base_frame(df: pd.DataFrame, config: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Inversa de view_frame: vuelve a indexar por (obs_seq, pred_seq).
+    """
+    index_columns = config["processing"]["index_columns"]
+    return df.reset_index().set_index(
+        [index_columns["observation"], index_columns["prediction"]]
+    )
+
+
+def fetch_rows(
+    config: Dict[str, Any],
+    row_ids: np.ndarray,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Lee del parquet procesado solo las filas indicadas (en el orden dado),
+    abriendo únicamente los row groups que las contienen.
+    """
+
+    pf = pq.ParquetFile(config["paths"]["dataset_processed"])
+    row_ids = np.asarray(row_ids, dtype=np.int64)
+
+    group_rows = [
+        pf.metadata.row_group(i).num_rows
+        for i in range(pf.metadata.num_row_groups)
+    ]
+    offsets = np.concatenate(([0], np.cumsum(group_rows)))
+
+    if len(row_ids) == 0:
+        return pf.read_row_groups([], columns=columns, use_pandas_metadata=True).to_pandas()
+
+    # Row group de cada fila y posición dentro de la tabla leída
+    row_group_of = np.searchsorted(offsets, row_ids, side="right") - 1
+    groups = np.unique(row_group_of)
+
+    base = np.zeros(len(group_rows), dtype=np.int64)
+    base[groups] = np.concatenate(([0], np.cumsum([group_rows[g] for g in groups])[:-1]))
+
+    local = row_ids - offsets[row_group_of] + base[row_group_of]
+
+    table = pf.read_row_groups(groups, columns=columns, use_pandas_metadata=True)
+
+    return table.take(local).to_pandas()
+
+
+def load_dataset_stats(
+    config: Dict[str, Any],
+    df: Optional[pd.DataFrame] = None
+) -> Dict[str, Any]:
+    """
+    Devuelve las estadísticas de frecuencia por posición del dataset y
+    su versión. Si el fichero de estadísticas no existe, no tiene versión
+    o el procesado ha cambiado, las calcula a partir del DataFrame y las
+    guarda.
+    """
+
+    stats_path = _stats_path(Path(config["paths"]["dataset_processed"]))
+
+    if stats_path.exists():
+        with stats_path.open("r", encoding="utf-8") as f:
+            stats = json.load(f)
+
+        # Sin versión (formato anterior) o procesado reemplazado en disco
+        # desde que se calcularon => se recalculan
+        if stats.get("version") and stats.get("source") == dataset_source(config):
+            return stats
+
+    if df is None:
+        df = load_or_preprocess_dataset(config, columns=resident_columns(config))
+
+    stats = _versioned_stats(df, config)
+    _save_dataset_stats(stats, stats_path)
+
+    return stats
+
+
+# -------------------------------------------------------------------------
+# Versión del dataset (invalidación de resultados cacheados)
+# -------------------------------------------------------------------------
+
+def dataset_source(config: Dict[str, Any]) -> Optional[Dict[str, int]]:
+    """
+    Firma barata (tamaño + mtime) del parquet procesado: detecta que se ha
+    reemplazado sin leerlo.
+    """
+    path = Path(config["paths"]["dataset_processed"])
+    if not path.exists():
+        return None
+
+    st = path.stat()
+    return {"bytes": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def stored_dataset_version(
+    config: Dict[str, Any],
+    source: Optional[Dict[str, int]]
+) -> Optional[str]:
+    """
+    Versión guardada en el fichero de estadísticas, sin calcular nada:
+    None si no existe o si se calculó para otro `source` (dataset_source).
+    """
+    stats_path = _stats_path(Path(config["paths"]["dataset_processed"]))
+
+    if source is None or not stats_path.exists():
+        return None
+
+    with stats_path.open("r", encoding="utf-8") as f:
+        stats = json.load(f)
+
+    if stats.get("source") != source:
+        return None
+
+    return (stats.get("version") or {}).get("fingerprint")
+
+
+def row_hashes(df: pd.DataFrame, config: Dict[str, Any]) -> np.ndarray:
+    """
+    Hash por fila (uint64) de lo que determina los resultados: claves
+    (obs_seq, pred_seq), row_id y tiempos. Por valor, no por código de
+    categoría: no depende del orden de los levels.
+    """
+    columns = [ROW_ID_COLUMN] + [
+        c for c in time_columns(config).values() if c in df.columns
+    ]
+
+    keys = pd.util.hash_pandas_object(df.index, index=False).to_numpy()
+    values = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+    return keys * np.uint64(31) + values
+
+
+def dataset_fingerprint(hashes: np.ndarray, rows: Optional[int] = None) -> str:
+    """
+    Huella de las `rows` primeras filas. Como las filas añadidas van al
+    final (orden temporal), la huella de una versión anterior coincide
+    con la del prefijo de la nueva si solo se han añadido filas.
+    """
+    prefix = hashes[:rows] if rows is not None else hashes
+    return hashlib.sha1(np.ascontiguousarray(prefix).tobytes()).hexdigest()[:16]
+
+
+def _versioned_stats(df: pd.DataFrame, config: Dict[str, Any]) -> Dict[str, Any]:
+    stats = compute_dataset_stats(df, config)
+
+    stats["version"] = {
+        "fingerprint": dataset_fingerprint(row_hashes(df, config)),
+        "rows": int(len(df)),
+    }
+    stats["source"] = dataset_source(config)
+
+    return stats
+
+
 # -------------------------------------------------------------------------
 # Carga de datasets
 # -------------------------------------------------------------------------
 
-def _load_processed_dataset(path: Path) -> pd.DataFrame:
+def _load_processed_dataset(
+    path: Path,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
     """
-    Carga el dataset ya procesado.
+    Carga el dataset ya procesado (opcionalmente solo algunas columnas).
+    Los procesados antiguos no traen row_id: se reconstruye por posición.
     """
-    return pd.read_parquet(path)
+    available = pq.ParquetFile(path).schema_arrow.names
+
+    if columns is not None:
+        columns = [c for c in _with_row_id(columns) if c in available]
+
+    df = pd.read_parquet(path, columns=columns)
+
+    if ROW_ID_COLUMN not in df.columns:
+        df.insert(0, ROW_ID_COLUMN, np.arange(len(df), dtype=np.int64))
+
+    return df
+
+
+def _with_row_id(columns: List[str]) -> List[str]:
+    return [ROW_ID_COLUMN] + [c for c in columns if c != ROW_ID_COLUMN]
 
 
 def _load_raw_dataset(path: Path) -> pd.DataFrame:
@@ -99,20 +413,166 @@ def _preprocess_dataframe(df: pd.DataFrame, config: Dict[str, Any]) -> pd.DataFr
         lambda x: separator.join(map(str, x))
     )
 
+    # Orden temporal por inicio de observación: el filtro por fechas pasa
+    # a ser una búsqueda binaria y los row groups quedan acotados en tiempo
+    obs_start_col = time_columns(config).get("observation")
+    if obs_start_col in df.columns:
+        for col in time_columns(config).values():
+            if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = pd.to_datetime(df[col])
+
+        df = df.sort_values(obs_start_col, kind="stable", ignore_index=True)
+
+    # Claves codificadas por diccionario: cada secuencia distinta se
+    # guarda una sola vez (levels) y las filas solo llevan su code
+    df[obs_index_col] = df[obs_index_col].astype("category")
+    df[pred_index_col] = df[pred_index_col].astype("category")
+
+    # Identificador estable de fila (posición en el parquet procesado)
+    df.insert(0, ROW_ID_COLUMN, np.arange(len(df), dtype=np.int64))
+
     # MultiIndex
     df = df.set_index([obs_index_col, pred_index_col])
 
-    return df
+    # Vistas agregadas (componente / percentil), calculadas una sola vez
+    return ensure_sequence_views(df, config)
+
+
+def _coarsen_level(
+    index: pd.MultiIndex,
+    level: int,
+    table: np.ndarray,
+    separator: str
+) -> pd.Categorical:
+    """
+    Traduce cada secuencia distinta con la tabla event_id -> valor de la
+    vista. Los eventos fuera del diccionario se omiten.
+    """
+
+    n = len(table)
+    coarse = []
+
+    for seq in index.levels[level]:
+        events = [int(e) for e in (seq.split(separator) if seq else []) if e.isdigit()]
+        values = [table[e] for e in events if e < n and table[e] >= 0]
+        coarse.append(separator.join(map(str, values)))
+
+    # Varias secuencias colapsan en la misma clave agregada
+    categories, inverse = np.unique(np.asarray(coarse, dtype=object), return_inverse=True)
+    codes = index.codes[level]
+
+    return pd.Categorical.from_codes(
+        np.where(codes >= 0, inverse[np.maximum(codes, 0)], -1),
+        categories=categories,
+    )
 
 
 
+# -------------------------------------------------------------------------
+# Estadísticas (usadas por el planificador de consultas)
+# -------------------------------------------------------------------------
+
+def compute_dataset_stats(df: pd.DataFrame, config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Calcula, para cada nivel del MultiIndex, el histograma de longitudes
+    de secuencia y la frecuencia de cada evento en las primeras posiciones.
+
+    {
+      "rows": int,
+      "observation": {"lengths": {len: n}, "positions": [{event: n}, ...]},
+      "prediction":  {...}
+    }
+    """
+
+    separator = config["processing"]["separator"]
+    max_positions = int(config["processing"].get("stats_positions", 8))
+
+    stats = {
+        "rows": int(len(df)),
+        "observation": _sequence_stats(df.index, 0, separator, max_positions),
+        "prediction": _sequence_stats(df.index, 1, separator, max_positions),
+        "sorted_by": None,
+        "time": {},
+    }
+
+    for side, col in time_columns(config).items():
+        if col not in df.columns or len(df) == 0:
+            continue
+
+        values = df[col]
+        stats["time"][side] = {
+            "min": values.min().isoformat(),
+            "max": values.max().isoformat(),
+        }
+
+        if side == "observation" and values.is_monotonic_increasing:
+            stats["sorted_by"] = col
+
+    return stats
+
+
+def _sequence_stats(
+    index: pd.MultiIndex,
+    level: int,
+    separator: str,
+    max_positions: int
+) -> Dict[str, Any]:
+    """
+    Recorre solo las secuencias distintas (levels del MultiIndex,
+    ponderadas por su frecuencia), no todas las filas.
+    """
+
+    keys = index.levels[level]
+    codes = index.codes[level]
+    counts = np.bincount(codes[codes >= 0], minlength=len(keys))
+
+    lengths: Dict[str, int] = {}
+    positions: List[Dict[str, int]] = [{} for _ in range(max_positions)]
+
+    for seq, n in zip(keys, counts):
+        if n == 0:
+            continue
+
+        parts = seq.split(separator) if seq else []
+        n = int(n)
+
+        key = str(len(parts))
+        lengths[key] = lengths.get(key, 0) + n
+
+        for i, event in enumerate(parts[:max_positions]):
+            positions[i][event] = positions[i].get(event, 0) + n
+
+    return {"lengths": lengths, "positions": positions}
+
+
 # -------------------------------------------------------------------------
 # Persistencia
 # -------------------------------------------------------------------------
 
-def _save_processed_dataset(df: pd.DataFrame, path: Path) -> None:
+def _save_processed_dataset(
+    df: pd.DataFrame,
+    path: Path,
+    row_group_size: Optional[int] = None
+) -> None:
     """
     Guarda el dataset procesado en disco.
+    Row groups acotados => fetch_rows solo lee los bloques necesarios.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(path, row_group_size=row_group_size)
+
+
+def _stats_path(processed_path: Path) -> Path:
+    """
+    Las estadísticas viven junto al dataset procesado.
+    """
+    return processed_path.with_suffix(".stats.json")
+
+
+def _save_dataset_stats(stats: Dict[str, Any], path: Path) -> None:
+    """
+    Guarda las estadísticas del dataset procesado.
     """
     path.parent.mkdir(parents=True, exist_ok=True)
-    df.to_parquet(path)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(stats, f)
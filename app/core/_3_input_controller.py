@@ -1,7 +1,10 @@
 # app/helpers/_3_input_controller.py
 import re
 from dataclasses import dataclass
-from typing import Optional, Dict, Any
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Union
+
+from core._12_event_predicates import compile_predicate, is_predicate, load_event_lookup
 
 
 @dataclass
@@ -15,6 +18,29 @@ class QueryPattern:
     prefix: Optional[str]
     target: str
 
+    # Solo si el patrón usa predicados (componente/percentil): un array de
+    # event_ids admitidos por cada posición fija (None = '?')
+    events: Optional[List[Any]] = None
+
+
+@dataclass
+class TimeRange:
+    """
+    Rango temporal [start, end) sobre el inicio de la ventana de
+    observación o de predicción.
+    """
+    start: Optional[datetime]
+    end: Optional[datetime]
+    target: str
+    canonical: str
+
+    def to_dict(self) -> dict:
+        return {
+            "target": self.target,
+            "start": self.start.isoformat() if self.start else None,
+            "end": self.end.isoformat() if self.end else None,
+        }
+
 # -------------------------------------------------------------------------
 # API principal
 # -------------------------------------------------------------------------
@@ -35,6 +61,10 @@ def parse_pattern(
     separator = config["processing"]["separator"]
 
     canonical = _normalize_input(raw_pattern, separator)
+
+    if any(is_predicate(part) for part in canonical.split(separator)):
+        return _parse_predicate_pattern(raw_pattern, canonical, column_type, config)
+
     regex, prefix = _build_regex_and_prefix(canonical, separator)
 
     return QueryPattern(
@@ -46,6 +76,57 @@ def parse_pattern(
     )
 
 
+def parse_time_range(
+    start: Union[str, datetime, None],
+    end: Union[str, datetime, None],
+    column_type: str = "observation"
+) -> Optional[TimeRange]:
+    """
+    Procesa un rango temporal. Devuelve None si no hay límites.
+    Acepta datetime o strings ISO 8601.
+    """
+
+    if start is None and end is None:
+        return None
+
+    if column_type not in ("observation", "prediction"):
+        raise ValueError(f"column_type inválido: {column_type}")
+
+    start = _parse_datetime(start)
+    end = _parse_datetime(end)
+
+    if start is not None and end is not None and utc_naive(start) >= utc_naive(end):
+        raise ValueError("El inicio del rango temporal debe ser anterior al fin")
+
+    canonical = "{}:{}/{}".format(
+        column_type,
+        start.isoformat() if start else "",
+        end.isoformat() if end else "",
+    )
+
+    return TimeRange(start=start, end=end, target=column_type, canonical=canonical)
+
+
+def _parse_datetime(value: Union[str, datetime, None]) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+
+    try:
+        return datetime.fromisoformat(value.strip())
+    except ValueError:
+        raise ValueError(f"Fecha no válida: {value!r}")
+
+
+def utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Fecha comparable con cualquier otra: las que traen zona horaria pasan
+    a UTC sin zona y las que no la traen se toman ya como UTC.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.replace(tzinfo=None) - value.utcoffset()
+
+
 # -------------------------------------------------------------------------
 # Normalización de entrada
 # -------------------------------------------------------------------------
@@ -111,3 +192,63 @@ def _build_regex_and_prefix(normalized: str, separator: str):
         regex = f"^{base_regex}$"
 
     return regex, prefix
+
+
+# -------------------------------------------------------------------------
+# Patrones con predicados (componente / percentil)
+# -------------------------------------------------------------------------
+
+def _parse_predicate_pattern(
+    raw_pattern: str,
+    normalized: str,
+    column_type: str,
+    config: Dict[str, Any]
+) -> QueryPattern:
+    """
+    "Battery_Active_Power:Q90+,*" -> cada predicado se compila al conjunto
+    de event_ids que lo cumplen. La regex equivalente (alternancia de ids)
+    se conserva, pero el motor los evalúa vectorizados (estrategia "vector").
+    """
+
+    separator = config["processing"]["separator"]
+    lookup = load_event_lookup(config)
+
+    canonical_parts = []
+    regex_parts = []
+    events: List[Any] = []
+    has_star = False
+
+    for part in normalized.split(separator):
+        if part == "*":
+            has_star = True
+            canonical_parts.append(part)
+            break
+
+        if part == "?":
+            canonical_parts.append(part)
+            regex_parts.append(r"\d+")
+            events.append(None)
+            continue
+
+        if is_predicate(part):
+            name, ids = compile_predicate(part, lookup)
+            canonical_parts.append(name)
+            regex_parts.append("(?:{})".format("|".join(str(i) for i in ids)) if len(ids) else "(?!)")
+            events.append(ids)
+            continue
+
+        canonical_parts.append(part)
+        regex_parts.append(re.escape(part))
+        events.append([int(part)])
+
+    base_regex = separator.join(regex_parts)
+    regex = f"^{base_regex}(?:{separator}.*)?$" if has_star else f"^{base_regex}$"
+
+    return QueryPattern(
+        raw=raw_pattern,
+        canonical=separator.join(canonical_parts),
+        regex=regex,
+        prefix=None,
+        target=column_type,
+        events=events,
+    )
@@ -1,10 +1,19 @@
 # app/helpers/_4_query_engine.py
 import re
-from typing import Optional, Dict, Any
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional, Dict, Any, Callable
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 
-from core._3_input_controller import QueryPattern
+from core._3_input_controller import QueryPattern, TimeRange
+from core._7_query_planner import QueryPlan, TimeStep, plan_query, _extract_prefix
+from core._12_event_predicates import event_mask
+from core._14_parallel import map_shards
 
 
 
@@ -16,39 +25,66 @@ def run_query(
     df: pd.DataFrame,
     src_pattern: Optional[QueryPattern],
     dst_pattern: Optional[QueryPattern],
-    config: Dict[str, Any]
+    config: Dict[str, Any],
+    plan: Optional[QueryPlan] = None,
+    time_range: Optional[TimeRange] = None,
+    progress: Optional[Callable[..., None]] = None
 ) -> pd.DataFrame:
     """
     Ejecuta la consulta sobre el DataFrame preprocesado usando
     patrones de observación (src) y/o predicción (dst).
+
+    Si se recibe un plan (ver _7_query_planner), se respetan su orden y
+    sus estrategias y se anotan en él las filas reales de cada paso.
+    El rango temporal (si lo hay) se aplica antes que los patrones.
+
+    progress(**campos): se llama al empezar cada paso (step, steps,
+    rows_in) y al terminar cada shard de filas (rows_scanned,
+    rows_matched acumulados dentro del paso).
     """
 
-    if src_pattern is None and dst_pattern is None:
+    if src_pattern is None and dst_pattern is None and time_range is None:
         return df
 
+    if plan is None:
+        plan = plan_query(src_pattern, dst_pattern, config, time_range=time_range)
+
     result = df
 
     separator = config["processing"]["separator"]
 
-    if src_pattern is not None:
-        result = _apply_pattern(
-            result,
-            pattern=src_pattern,
-            level=0,  # obs_seq
-            separator=separator
-        )
+    if plan.time_step is not None:
+        t0 = time.perf_counter()
+        result = _apply_time_range(result, plan.time_step)
+        plan.time_step.actual_rows = len(result)
+        plan.time_step.elapsed_ms = _elapsed_ms(t0)
+
+    for i, step in enumerate(plan.steps, start=1):
+        t0 = time.perf_counter()
+        if progress is not None:
+            progress(step=i, steps=len(plan.steps), rows_in=len(result), rows_scanned=0, rows_matched=0)
 
-    if dst_pattern is not None:
         result = _apply_pattern(
             result,
-            pattern=dst_pattern,
-            level=1,  # pred_seq
-            separator=separator
+            pattern=step.pattern,
+            level=step.level,
+            separator=separator,
+            strategy=step.strategy,
+            config=config,
+            progress=progress,
         )
+        step.actual_rows = len(result)
+        step.elapsed_ms = _elapsed_ms(t0)
+
+    plan.actual_rows = len(result)
 
     return result
 
 
+def _elapsed_ms(t0: float) -> float:
+    return round((time.perf_counter() - t0) * 1000, 3)
+
+
 # -------------------------------------------------------------------------
 # Aplicación de patrones
 # -------------------------------------------------------------------------
@@ -57,64 +93,251 @@ def _apply_pattern(
     df: pd.DataFrame,
     pattern: QueryPattern,
     level: int,
-    separator: str
+    separator: str,
+    strategy: str = "scan",
+    config: Optional[Dict[str, Any]] = None,
+    progress: Optional[Callable[..., None]] = None
 ) -> pd.DataFrame:
     """
     Aplica un patrón a un nivel del MultiIndex.
 
     level = 0 -> obs_seq
     level = 1 -> pred_seq
+
+    El patrón se evalúa UNA vez por secuencia distinta (levels del
+    MultiIndex) y el resultado se proyecta a las filas con sus codes.
+
+    Ambas fases se reparten por shards (de claves y de filas) en el pool
+    de hilos (ver _14_parallel): kernels de NumPy / pyarrow.compute que
+    sueltan el GIL. Las posiciones se concatenan en orden de shard, así
+    que el resultado conserva el orden de filas.
+
+    progress: se le notifican las filas recorridas / seleccionadas cada
+    vez que termina un shard de filas (en el hilo del shard).
+    """
+
+    config = config or {"processing": {"threads": 1}}
+
+    levels = df.index.levels[level]
+    codes = df.index.codes[level]
+
+    if strategy == "vector":
+        flat, offsets, lengths = _encoded_levels(levels, separator)
+        parts = map_shards(
+            lambda lo, hi: _match_vector((flat, offsets[lo:hi], lengths[lo:hi]), pattern),
+            len(levels),
+            config,
+        )
+    else:
+        keys = _arrow_levels(levels)
+        parts = map_shards(
+            lambda lo, hi: _match_keys(keys.slice(lo, hi - lo), pattern, separator, strategy),
+            len(levels),
+            config,
+        )
+
+    # codes == -1 => clave nula, nunca casa
+    key_mask = np.append(np.concatenate(parts), False)
+
+    counts = [0, 0]
+    counts_lock = Lock()
+
+    def project(lo: int, hi: int) -> np.ndarray:
+        selected = lo + np.flatnonzero(key_mask[codes[lo:hi]])
+
+        if progress is not None:
+            with counts_lock:
+                counts[0] += hi - lo
+                counts[1] += len(selected)
+                progress(rows_scanned=counts[0], rows_matched=counts[1])
+
+        return selected
+
+    positions = map_shards(project, len(df), config)
+
+    return df.take(np.concatenate(positions))
+
+
+def _match_keys(
+    keys: pa.Array,
+    pattern: QueryPattern,
+    separator: str,
+    strategy: str
+) -> np.ndarray:
+    """
+    Devuelve una máscara booleana sobre las claves distintas.
+
+    strategy = "index"  -> igualdad exacta con la forma canónica
+    strategy = "prefix" -> startswith del prefijo estructural
+    strategy = "scan"   -> regex
     """
 
-    index_values = df.index.get_level_values(level)
+    # 1️⃣ Match exacto (sin comodines)
+    if strategy == "index":
+        return _to_mask(pc.equal(keys, pattern.canonical))
 
-    # 1️⃣ Prefijo ESTRUCTURAL (solo si el usuario ha puesto *)
+    # 2️⃣ Prefijo ESTRUCTURAL (solo si el usuario ha puesto *)
     prefix = _extract_prefix(pattern, separator)
 
     if prefix is not None:
-        mask = index_values.str.startswith(prefix)
-        return df[mask]
+        return _to_mask(pc.starts_with(keys, prefix))
+
+    # 3️⃣ Regex (match exacto o con ?)
+    try:
+        return _to_mask(pc.match_substring_regex(keys, pattern.regex))
+    except pa.ArrowInvalid:
+        # Sintaxis que RE2 no admite: regex de Python
+        regex = re.compile(pattern.regex)
+        return np.asarray(pd.Index(keys.to_pylist(), dtype=object).str.match(regex), dtype=bool)
 
-    # 2️⃣ Regex (match exacto o con ?)
-    regex = re.compile(pattern.regex)
-    mask = index_values.str.match(regex)
-    return df[mask]
+
+def _to_mask(result: pa.Array) -> np.ndarray:
+    return pc.fill_null(result, False).to_numpy(zero_copy_only=False)
 
 
 # -------------------------------------------------------------------------
-# Prefijo semántico CORRECTO
+# Predicados sobre secuencias codificadas (estrategia "vector")
 # -------------------------------------------------------------------------
 
-def _extract_prefix(
-    pattern: QueryPattern,
-    separator: str
-) -> Optional[str]:
+# Codificación por objeto levels (enteros para "vector", pyarrow para el
+# resto): el dataset residente conserva sus levels entre consultas, así
+# que se codifica una sola vez
+_ENCODED: "OrderedDict[tuple, tuple]" = OrderedDict()
+_ENCODED_MAX = 16
+_ENCODED_LOCK = Lock()
+
+
+def _match_vector(encoded: tuple, pattern: QueryPattern) -> np.ndarray:
+    """
+    Evalúa posición a posición sobre los enteros: longitud exigida y, en
+    cada posición fija, pertenencia a su conjunto de eventos mediante una
+    tabla booleana indexada por event_id. Cada posición solo mira las
+    claves que siguen vivas.
     """
-    Extrae un prefijo SOLO cuando el usuario usa '*'
-    y SOLO como secuencia completa, no como substring.
 
-    Ejemplos:
-    - "475,*"       -> "475,"
-    - "1,2,*"       -> "1,2,"
-    - "1,?,2,*"     -> None (tiene wildcard estructural)
-    - "1,2"         -> None
+    flat, offsets, lengths = encoded
+    fixed = pattern.events
+
+    if pattern.canonical.endswith("*"):
+        alive = lengths >= len(fixed)
+    else:
+        alive = lengths == len(fixed)
+
+    for i, ids in enumerate(fixed):
+        if ids is None:
+            continue
+
+        rows = np.flatnonzero(alive)
+        if not len(rows):
+            break
+
+        ids = np.asarray(ids, dtype=np.int64)
+        n_events = int(ids.max()) + 1 if len(ids) else 0
+        member = event_mask(ids, n_events)
+
+        values = flat[offsets[rows] + i]
+        values = np.where((values < 0) | (values >= n_events), n_events, values)
+
+        alive[rows[~member[values]]] = False
+
+    return alive
+
+
+def _encoded_levels(levels: pd.Index, separator: str) -> tuple:
+    return _level_cache(levels, "encoded", lambda: _encode_levels(levels, separator))
+
+
+def _arrow_levels(levels: pd.Index) -> pa.Array:
+    """
+    Claves distintas como array de pyarrow (strings planos).
     """
+    return _level_cache(
+        levels,
+        "arrow",
+        lambda: pa.array(np.asarray(levels, dtype=object), type=pa.large_string()),
+    )
 
-    raw = pattern.raw.replace(" ", "").replace(".", separator)
 
-    # Prefijo SOLO si termina en *
-    if not raw.endswith("*"):
-        return None
+def _level_cache(levels: pd.Index, kind: str, build):
+    key = (id(levels), kind)
+
+    with _ENCODED_LOCK:
+        hit = _ENCODED.get(key)
+        if hit is not None and hit[0] is levels:
+            _ENCODED.move_to_end(key)
+            return hit[1]
+
+    value = build()
+
+    with _ENCODED_LOCK:
+        _ENCODED[key] = (levels, value)
+        while len(_ENCODED) > _ENCODED_MAX:
+            _ENCODED.popitem(last=False)
+
+    return value
+
+
+def _encode_levels(levels: pd.Index, separator: str) -> tuple:
+    """
+    Secuencias distintas como enteros planos:
+      flat[offsets[k] + i] = evento i de la clave k (-1 si no es numérico)
+      lengths[k]           = número de eventos de la clave k
+    """
+
+    seqs = pd.Series(np.asarray(levels, dtype=object)).str.split(separator).explode()
+    seqs = seqs[seqs.notna() & (seqs != "")]
 
-    # Quitar el *
-    base = raw[:-1]
+    flat = pd.to_numeric(seqs, errors="coerce").fillna(-1).to_numpy(dtype=np.int64)
+    lengths = np.bincount(seqs.index.to_numpy(dtype=np.int64), minlength=len(levels))
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
 
-    # Si hay '?' en el prefijo, no es estructural → usar regex
-    if "?" in base:
+    return flat, offsets, lengths
+
+
+# -------------------------------------------------------------------------
+# Filtro temporal
+# -------------------------------------------------------------------------
+
+def _apply_time_range(df: pd.DataFrame, step: TimeStep) -> pd.DataFrame:
+    """
+    Filtra las ventanas cuyo inicio cae en [start, end).
+
+    Con el dataset ordenado por la columna ("slice") basta una búsqueda
+    binaria y un corte contiguo, sin recorrer las filas.
+    """
+
+    values = df[step.column]
+    start = _to_column_time(step.time_range.start, values)
+    end = _to_column_time(step.time_range.end, values)
+
+    if step.strategy == "slice":
+        lo = values.searchsorted(start, side="left") if start is not None else 0
+        hi = values.searchsorted(end, side="left") if end is not None else len(values)
+        return df.iloc[lo:hi]
+
+    mask = np.ones(len(df), dtype=bool)
+    if start is not None:
+        mask &= (values >= start).to_numpy()
+    if end is not None:
+        mask &= (values < end).to_numpy()
+
+    return df[mask]
+
+
+def _to_column_time(value, values: pd.Series):
+    """
+    Adapta la fecha a la zona horaria (o ausencia de ella) de la columna.
+    """
+
+    if value is None:
         return None
 
-    # El prefijo debe acabar en separador
-    if not base.endswith(separator):
-        base += separator
+    ts = pd.Timestamp(value)
+    tz = getattr(values.dtype, "tz", None)
+
+    if tz is None and ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    elif tz is not None and ts.tzinfo is None:
+        ts = ts.tz_localize(tz)
 
-    return base
+    return ts
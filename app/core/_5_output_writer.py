@@ -1,25 +1,50 @@
 # app/helpers/_5_output_writer.py   
 from pathlib import Path
-from typing import Optional, Dict, Any, List # Añadido List
+from typing import Optional, Dict, Any, Callable, Iterator, List # Añadido List
 from datetime import datetime
+import hashlib
+import json
 import re
 import os
+import uuid
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-from core._3_input_controller import QueryPattern
+from core._2_preprocessor import ROW_ID_COLUMN
+from core._3_input_controller import QueryPattern, TimeRange
 
 OUTPUT_MODES = ["parquet", "csv"]
 
+# Filas por escritura (row group del parquet / bloque del CSV): entre
+# bloque y bloque se informa del progreso (processing.write_chunk_rows)
+WRITE_CHUNK_ROWS = 100_000
+
 def save_results(
     df: pd.DataFrame,
     src_pattern: Optional[QueryPattern],
     dst_pattern: Optional[QueryPattern],
-    config: Dict[str, Any]
+    config: Dict[str, Any],
+    time_range: Optional[TimeRange] = None,
+    dataset: Optional[str] = None,
+    view: Optional[str] = None,
+    query_id: Optional[str] = None,
+    progress: Optional[Callable[..., None]] = None
 ) -> List[Path]: # Cambiado de Path a List[Path]
     """
     Guarda el DataFrame resultado en disco en los formatos definidos en OUTPUT_MODES.
     Devuelve una lista con los Paths de los ficheros generados.
+
+    Con query_id los ficheros se llaman <query_id>.<ext> (ver result_paths)
+    y cada uno se escribe en un temporal y se renombra: un lector nunca ve
+    un fichero a medias y dos escritores de la misma query no se pisan.
+    Sin query_id se conserva el nombre legible a partir de los patrones.
+
+    Cada fichero se escribe por bloques de filas; tras cada bloque se
+    llama a progress(format, rows_written, rows_total, bytes_written),
+    con bytes_written acumulado entre todos los formatos.
     """
 
     output_dir = Path(config["paths"]["output_dir"])
@@ -30,34 +55,255 @@ def save_results(
     output_dir_csv.mkdir(parents=True, exist_ok=True)
     os.chmod(output_dir_csv, 0o775)  # Asegura permisos de lectura/escritura/ejecución
 
+    # Las claves categóricas arrastran el diccionario completo del dataset
+    df = _decode_keys(df)
+
     # Obtenemos el nombre base sin extensión
-    base_filename = _build_filename(src_pattern, dst_pattern)
+    base_filename = query_id or _build_filename(src_pattern, dst_pattern, time_range, dataset, view)
     
     generated_paths = []
 
+    chunk_rows = int(config["processing"].get("write_chunk_rows") or WRITE_CHUNK_ROWS)
+    written = 0   # bytes de los ficheros ya terminados
+
     # Iteramos sobre los modos configurados
     for mode in OUTPUT_MODES:
+
+        def on_chunk(tmp: Path, rows: int) -> None:
+            if progress is not None:
+                progress(
+                    format=mode,
+                    rows_written=rows,
+                    rows_total=len(df),
+                    bytes_written=written + tmp.stat().st_size,
+                )
+
         if mode == "parquet":
             file_path = output_dir / f"{base_filename}.parquet"
-            df.to_parquet(file_path)
+            atomic_write(file_path, lambda tmp: _write_parquet(df, tmp, chunk_rows, on_chunk))
             generated_paths.append(file_path)
             
         elif mode == "csv":
             file_path = output_dir_csv / f"{base_filename}.csv"
             # index=False suele ser preferible para no guardar el índice numérico en el CSV
-            df.to_csv(file_path, index=False, encoding='utf-8') 
+            atomic_write(file_path, lambda tmp: _write_csv(df, tmp, chunk_rows, on_chunk))
             generated_paths.append(file_path)
 
+        written += file_path.stat().st_size
+
     return generated_paths
 
 
+def _write_parquet(
+    df: pd.DataFrame,
+    path: Path,
+    chunk_rows: int,
+    on_chunk: Callable[[Path, int], None]
+) -> None:
+    """
+    Mismo fichero que df.to_parquet (esquema y metadata de pandas), con
+    un row group por bloque de chunk_rows filas.
+    """
+    table = pa.Table.from_pandas(df)
+
+    with pq.ParquetWriter(path, table.schema) as writer:
+        for lo in range(0, max(table.num_rows, 1), chunk_rows):
+            writer.write_table(table.slice(lo, chunk_rows))
+            on_chunk(path, min(lo + chunk_rows, table.num_rows))
+
+
+def _write_csv(
+    df: pd.DataFrame,
+    path: Path,
+    chunk_rows: int,
+    on_chunk: Callable[[Path, int], None]
+) -> None:
+    # newline="": el mismo fin de línea que df.to_csv(path)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for lo in range(0, max(len(df), 1), chunk_rows):
+            df.iloc[lo : lo + chunk_rows].to_csv(f, index=False, header=lo == 0)
+            f.flush()
+            on_chunk(path, min(lo + chunk_rows, len(df)))
+
+
+# -------------------------------------------------------------------------
+# Almacenamiento por query_id
+# -------------------------------------------------------------------------
+
+def result_paths(config: Dict[str, Any], query_id: str) -> Dict[str, Path]:
+    """
+    Rutas de una query calculadas a partir de su id (sin buscar en disco).
+    """
+    output_dir = Path(config["paths"]["output_dir"])
+
+    return {
+        "parquet": output_dir / f"{query_id}.parquet",
+        "csv": Path(config["paths"]["output_dir_csv"]) / f"{query_id}.csv",
+        "metadata": output_dir / f"{query_id}.json",
+    }
+
+
+def write_metadata(config: Dict[str, Any], query_id: str, data: Dict[str, Any]) -> Path:
+    path = result_paths(config, query_id)["metadata"]
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    payload = json.dumps(data, indent=2)
+    atomic_write(path, lambda tmp: tmp.write_text(payload, encoding="utf-8"))
+
+    return path
+
+
+def file_manifest(paths: List[Path]) -> Dict[str, Dict[str, Any]]:
+    """
+    {formato: {path, bytes, sha256}} de los ficheros de un resultado.
+    El hash identifica el contenido (integridad, deduplicación).
+    """
+    manifest = {}
+
+    for path in paths:
+        digest = hashlib.sha256()
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+
+        manifest[path.suffix.lstrip(".")] = {
+            "path": str(path),
+            "bytes": path.stat().st_size,
+            "sha256": digest.hexdigest(),
+        }
+
+    return manifest
+
+
+def atomic_write(path: Path, write: Callable[[Path], Any]) -> None:
+    """
+    write(tmp) escribe en un temporal del mismo directorio y os.replace
+    lo publica de golpe (atómico en el mismo sistema de ficheros).
+    """
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def _decode_keys(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convierte los niveles categóricos del índice en strings planos para
+    que el resultado no guarde todas las secuencias del dataset.
+    """
+
+    if not isinstance(df.index, pd.MultiIndex):
+        return df
+
+    if not any(isinstance(lvl, pd.CategoricalIndex) for lvl in df.index.levels):
+        return df
+
+    df = df.copy(deep=False)
+    df.index = pd.MultiIndex.from_arrays(
+        [
+            np.asarray(df.index.get_level_values(i), dtype=object)
+            for i in range(df.index.nlevels)
+        ],
+        names=df.index.names,
+    )
+
+    return df
+
+
+# -------------------------------------------------------------------------
+# Lectura por lotes (streaming de resultados)
+# -------------------------------------------------------------------------
+
+def result_rows(path: Path) -> int:
+    """
+    Filas de un resultado leyendo solo los metadatos del parquet.
+    """
+    return pq.ParquetFile(path).metadata.num_rows
+
+
+def result_row_ids(path: Path) -> np.ndarray:
+    """
+    row_id de todas las filas de un resultado (solo esa columna).
+    """
+    parquet = pq.ParquetFile(path)
+
+    if ROW_ID_COLUMN not in parquet.schema_arrow.names:
+        raise ValueError(f"El resultado no tiene {ROW_ID_COLUMN}: {path.name}")
+
+    return parquet.read(columns=[ROW_ID_COLUMN]).column(0).to_numpy()
+
+
+def iter_result_batches(
+    path: Path,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    batch_size: int = 1000
+) -> Iterator[pa.RecordBatch]:
+    """
+    Recorre [offset, offset + limit) del resultado en lotes de
+    `batch_size` filas, saltando los row groups anteriores a offset
+    sin leerlos.
+
+    El fichero se abre ya (FileNotFoundError aquí y no en el primer
+    lote): si luego se borra, el stream sigue leyendo del abierto.
+    """
+    return _iter_batches(pq.ParquetFile(path), offset, limit, batch_size)
+
+
+def _iter_batches(
+    parquet: pq.ParquetFile,
+    offset: int,
+    limit: Optional[int],
+    batch_size: int
+) -> Iterator[pa.RecordBatch]:
+    metadata = parquet.metadata
+
+    end = metadata.num_rows if limit is None else min(offset + limit, metadata.num_rows)
+
+    # Primer row group que contiene `offset`
+    first, skip = 0, offset
+    while first < metadata.num_row_groups and skip >= metadata.row_group(first).num_rows:
+        skip -= metadata.row_group(first).num_rows
+        first += 1
+
+    remaining = end - offset
+    if remaining <= 0 or first >= metadata.num_row_groups:
+        return
+
+    row_groups = list(range(first, metadata.num_row_groups))
+
+    for batch in parquet.iter_batches(batch_size=batch_size, row_groups=row_groups):
+        if skip:
+            if skip >= batch.num_rows:
+                skip -= batch.num_rows
+                continue
+            batch = batch.slice(skip)
+            skip = 0
+
+        if batch.num_rows > remaining:
+            batch = batch.slice(0, remaining)
+
+        remaining -= batch.num_rows
+        yield batch
+
+        if remaining <= 0:
+            return
+
+
 # -------------------------------------------------------------------------
 # Construcción del nombre de fichero
 # -------------------------------------------------------------------------
 
 def _build_filename(
     src_pattern: Optional[QueryPattern],
-    dst_pattern: Optional[QueryPattern]
+    dst_pattern: Optional[QueryPattern],
+    time_range: Optional[TimeRange] = None,
+    dataset: Optional[str] = None,
+    view: Optional[str] = None
 ) -> str:
     """
     Construye un nombre de fichero base legible y estable.
@@ -66,12 +312,22 @@ def _build_filename(
 
     parts = []
 
+    # Solo datasets distintos del por defecto llevan prefijo
+    if dataset:
+        parts.append(f"ds_{_sanitize(dataset)}")
+
+    if view:
+        parts.append(f"view_{_sanitize(view)}")
+
     if src_pattern:
         parts.append(f"src_{_sanitize(src_pattern.raw)}")
 
     if dst_pattern:
         parts.append(f"dst_{_sanitize(dst_pattern.raw)}")
 
+    if time_range:
+        parts.append(f"{time_range.target[:3]}_{_sanitize_time(time_range)}")
+
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
     name = "__".join(parts) if parts else "query"
@@ -81,6 +337,16 @@ def _build_filename(
     # return f"{name}__{timestamp}" # Descomentar si quieres timestamp
 
 
+def _sanitize_time(time_range: TimeRange) -> str:
+    """
+    "20240101T000000-20240108T000000" (lado abierto -> "open")
+    """
+    def fmt(value):
+        return value.strftime("%Y%m%dT%H%M%S") if value else "open"
+
+    return f"{fmt(time_range.start)}-{fmt(time_range.end)}"
+
+
 def _sanitize(value: str) -> str:
     """
     Limpia una string para que sea segura como nombre de fichero
@@ -89,6 +355,13 @@ def _sanitize(value: str) -> str:
 
     value = value.strip().lower()
 
+    # Predicados de percentil ("any:q90+", "x:q20-"): el sufijo distingue
+    # consultas distintas y no debe perderse al limpiar
+    value = value.replace("+", "_up")
+    value = re.sub(r"(q\d+)-(q\d+)", r"\1_to_\2", value)
+    value = re.sub(r"(q\d+)-(?=,|$)", r"\1_down", value)
+    value = value.replace(":", "_")
+
     # 🔑 eliminar separadores lógicos al final (muy importante)
     value = value.rstrip(",.-_")
 
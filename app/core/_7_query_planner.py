@@ -0,0 +1,459 @@
+# app/helpers/_7_query_planner.py
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+from core._3_input_controller import QueryPattern, TimeRange, utc_naive
+
+
+# -------------------------------------------------------------------------
+# Estrategias de acceso
+# -------------------------------------------------------------------------
+
+# Coste relativo por fila evaluada de cada estrategia
+#   index  -> igualdad exacta sobre la clave (sin comodines)
+#   prefix -> startswith (patrón terminado en *)
+#   scan   -> regex completa (patrones con ?)
+#   vector -> predicados por componente/percentil: tablas de pertenencia
+#             sobre las secuencias codificadas como enteros
+STRATEGY_COSTS = {
+    "index": 1.0,
+    "prefix": 2.0,
+    "vector": 3.0,
+    "scan": 6.0,
+}
+
+_LEVELS = {
+    "observation": 0,  # obs_seq
+    "prediction": 1,   # pred_seq
+}
+
+_SHORT_TARGETS = {"observation": "obs", "prediction": "pred"}
+
+
+@dataclass
+class PlanStep:
+    """
+    Un predicado del plan: qué patrón, sobre qué nivel y con qué estrategia.
+    """
+    pattern: QueryPattern
+    level: int
+    strategy: str
+    selectivity: float
+    estimated_rows: int
+    actual_rows: Optional[int] = None
+    elapsed_ms: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "target": self.pattern.target,
+            "pattern": self.pattern.canonical,
+            "strategy": self.strategy,
+            "selectivity": self.selectivity,
+            "estimated_rows": self.estimated_rows,
+            "actual_rows": self.actual_rows,
+            "elapsed_ms": self.elapsed_ms,
+        }
+
+
+@dataclass
+class TimeStep:
+    """
+    Filtro temporal, siempre el primer paso del plan.
+
+    strategy = "slice" -> el dataset está ordenado por esa columna:
+                          búsqueda binaria y corte contiguo
+    strategy = "mask"  -> comparación fila a fila
+    """
+    time_range: TimeRange
+    column: str
+    strategy: str
+    selectivity: float
+    estimated_rows: int
+    actual_rows: Optional[int] = None
+    elapsed_ms: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            **self.time_range.to_dict(),
+            "column": self.column,
+            "strategy": self.strategy,
+            "selectivity": self.selectivity,
+            "estimated_rows": self.estimated_rows,
+            "actual_rows": self.actual_rows,
+            "elapsed_ms": self.elapsed_ms,
+        }
+
+
+@dataclass
+class QueryPlan:
+    """
+    Plan de ejecución: filtro temporal (si lo hay) y predicados
+    ordenados del más al menos selectivo.
+    """
+    steps: List[PlanStep] = field(default_factory=list)
+    time_step: Optional[TimeStep] = None
+    total_rows: Optional[int] = None
+    estimated_rows: Optional[int] = None
+    actual_rows: Optional[int] = None
+    estimated_cost: Optional[float] = None
+
+    # Poda de particiones (solo con partitioning.enabled)
+    partitions: Optional[Dict[str, Any]] = None
+
+    @property
+    def pattern_class(self) -> str:
+        """
+        Etiqueta de baja cardinalidad para métricas: estrategia por lado
+        ("obs:prefix+pred:index") más "time" si hay filtro temporal.
+        """
+        parts = [
+            f"{_SHORT_TARGETS[step.pattern.target]}:{step.strategy}"
+            for step in sorted(self.steps, key=lambda s: s.level)
+        ]
+        if self.time_step is not None:
+            parts.append("time")
+        return "+".join(parts) or "all"
+
+    def to_dict(self) -> dict:
+        return {
+            "partitions": _partitions_to_dict(self.partitions),
+            "time": self.time_step.to_dict() if self.time_step else None,
+            "steps": [s.to_dict() for s in self.steps],
+            "total_rows": self.total_rows,
+            "estimated_rows": self.estimated_rows,
+            "actual_rows": self.actual_rows,
+            "estimated_cost": self.estimated_cost,
+        }
+
+
+# -------------------------------------------------------------------------
+# API principal
+# -------------------------------------------------------------------------
+
+def plan_query(
+    src_pattern: Optional[QueryPattern],
+    dst_pattern: Optional[QueryPattern],
+    config: Dict[str, Any],
+    stats: Optional[Dict[str, Any]] = None,
+    time_range: Optional[TimeRange] = None,
+    view: Optional[str] = None
+) -> QueryPlan:
+    """
+    Construye el plan de una consulta.
+
+    Sin estadísticas se mantiene el orden clásico (src -> dst).
+    Con estadísticas se estima la selectividad de cada predicado y se
+    elige el orden de menor coste esperado.
+
+    view: vista agregada sobre la que se evalúan los patrones (sus ids
+    no son eventos: no sirven para podar por first_event).
+    """
+
+    separator = config["processing"]["separator"]
+
+    steps = [
+        _plan_step(pattern, separator, stats)
+        for pattern in (src_pattern, dst_pattern)
+        if pattern is not None
+    ]
+
+    time_step = (
+        _plan_time_step(time_range, config, stats)
+        if time_range is not None else None
+    )
+
+    partitions = None
+    if config.get("partitioning", {}).get("enabled", False):
+        partitions = _plan_partitions(
+            src_pattern if view is None else None, time_range, separator
+        )
+
+    if stats is None:
+        return QueryPlan(steps=steps, time_step=time_step, partitions=partitions)
+
+    total = int(stats["rows"])
+
+    # Con dos predicados: coste(A, B) = N·cA + N·selA·cB
+    if len(steps) == 2:
+        a, b = steps
+        if _order_cost(b, a) < _order_cost(a, b):
+            steps = [b, a]
+
+    # El corte temporal reduce las filas que ven los predicados
+    time_selectivity = time_step.selectivity if time_step else 1.0
+
+    selectivity = time_selectivity
+    for step in steps:
+        selectivity *= step.selectivity
+
+    return QueryPlan(
+        steps=steps,
+        time_step=time_step,
+        total_rows=total,
+        estimated_rows=int(round(total * selectivity)),
+        estimated_cost=round(total * time_selectivity * _order_cost(*steps), 3),
+        partitions=partitions,
+    )
+
+
+# -------------------------------------------------------------------------
+# Construcción de cada paso
+# -------------------------------------------------------------------------
+
+def _plan_step(
+    pattern: QueryPattern,
+    separator: str,
+    stats: Optional[Dict[str, Any]]
+) -> PlanStep:
+    strategy = _choose_strategy(pattern, separator)
+
+    if stats is None:
+        return PlanStep(
+            pattern=pattern,
+            level=_LEVELS[pattern.target],
+            strategy=strategy,
+            selectivity=1.0,
+            estimated_rows=0,
+        )
+
+    selectivity = _estimate_selectivity(
+        pattern, strategy, separator, stats[pattern.target], int(stats["rows"])
+    )
+
+    return PlanStep(
+        pattern=pattern,
+        level=_LEVELS[pattern.target],
+        strategy=strategy,
+        selectivity=selectivity,
+        estimated_rows=int(round(int(stats["rows"]) * selectivity)),
+    )
+
+
+def _plan_time_step(
+    time_range: TimeRange,
+    config: Dict[str, Any],
+    stats: Optional[Dict[str, Any]]
+) -> TimeStep:
+    column = config["columns"][time_range.target]["start"]
+
+    if stats is None:
+        return TimeStep(
+            time_range=time_range,
+            column=column,
+            strategy="mask",
+            selectivity=1.0,
+            estimated_rows=0,
+        )
+
+    strategy = "slice" if stats.get("sorted_by") == column else "mask"
+    selectivity = _estimate_time_selectivity(
+        time_range, stats.get("time", {}).get(time_range.target)
+    )
+
+    return TimeStep(
+        time_range=time_range,
+        column=column,
+        strategy=strategy,
+        selectivity=selectivity,
+        estimated_rows=int(round(int(stats["rows"]) * selectivity)),
+    )
+
+
+def _plan_partitions(
+    src_pattern: Optional[QueryPattern],
+    time_range: Optional[TimeRange],
+    separator: str
+) -> Dict[str, Any]:
+    """
+    Qué particiones pueden contener resultados:
+      - first_event: primer evento fijo del patrón de observación
+      - time_from / time_to: rango sobre el inicio de observación.
+        Para rangos sobre la predicción solo vale el límite superior
+        (la predicción empieza después de la observación).
+    """
+
+    spec: Dict[str, Any] = {}
+
+    if src_pattern is not None:
+        first = src_pattern.canonical.split(separator)[0]
+        if first.isdigit():
+            spec["first_event"] = first
+
+    if time_range is not None:
+        if time_range.target == "observation" and time_range.start is not None:
+            spec["time_from"] = time_range.start
+        if time_range.end is not None:
+            spec["time_to"] = time_range.end
+
+    return spec
+
+
+def _partitions_to_dict(spec: Optional[Dict[str, Any]]) -> Optional[dict]:
+    if spec is None:
+        return None
+    return {
+        k: v.isoformat() if isinstance(v, datetime) else v
+        for k, v in spec.items()
+    }
+
+
+def _choose_strategy(pattern: QueryPattern, separator: str) -> str:
+    """
+    Elige el camino de acceso más barato capaz de resolver el patrón.
+    """
+    if pattern.events is not None:
+        return "vector"
+
+    if _extract_prefix(pattern, separator) is not None:
+        return "prefix"
+
+    parts = pattern.canonical.split(separator)
+    if "?" not in parts and "*" not in parts:
+        return "index"
+
+    return "scan"
+
+
+def _order_cost(*steps: PlanStep) -> float:
+    """
+    Coste esperado (por fila del dataset) de evaluar los pasos en orden.
+    """
+    cost = 0.0
+    remaining = 1.0
+    for step in steps:
+        cost += remaining * STRATEGY_COSTS[step.strategy]
+        remaining *= step.selectivity
+    return cost
+
+
+# -------------------------------------------------------------------------
+# Estimación de selectividad
+# -------------------------------------------------------------------------
+
+def _estimate_selectivity(
+    pattern: QueryPattern,
+    strategy: str,
+    separator: str,
+    side_stats: Dict[str, Any],
+    total: int
+) -> float:
+    """
+    Estima la fracción de filas que cumplen el patrón suponiendo
+    independencia entre posiciones:
+
+      sel = P(longitud) · Π P(evento_i | longitud > i)
+    """
+
+    if total == 0:
+        return 0.0
+
+    parts = pattern.canonical.split(separator)
+
+    if strategy == "prefix":
+        # La abreviatura "475*" equivale a "475,*": se estima por sus eventos
+        prefix = _extract_prefix(pattern, separator)
+        parts = prefix[:-len(separator)].split(separator) + ["*"]
+
+    has_star = "*" in parts
+    fixed = parts[:parts.index("*")] if has_star else parts
+
+    lengths = {int(k): v for k, v in side_stats["lengths"].items()}
+    positions = side_stats["positions"]
+
+    # Longitud exigida por el patrón
+    if has_star:
+        # El prefijo estructural ("475,") exige al menos un evento más
+        min_len = len(fixed) + (1 if strategy == "prefix" else 0)
+        matching = sum(n for length, n in lengths.items() if length >= min_len)
+    else:
+        matching = lengths.get(len(fixed), 0)
+
+    selectivity = matching / total
+
+    for i, event in enumerate(fixed):
+        if event == "?" or i >= len(positions):
+            continue
+
+        longer = sum(n for length, n in lengths.items() if length > i)
+        if longer == 0:
+            return 0.0
+
+        if pattern.events is not None:
+            # Predicado: suma de las frecuencias de todos sus eventos
+            hits = sum(positions[i].get(str(e), 0) for e in pattern.events[i])
+        else:
+            hits = positions[i].get(event, 0)
+
+        selectivity *= hits / longer
+
+    return min(max(selectivity, 0.0), 1.0)
+
+
+def _estimate_time_selectivity(
+    time_range: TimeRange,
+    bounds: Optional[Dict[str, str]]
+) -> float:
+    """
+    Supone ventanas repartidas uniformemente entre el mínimo y el máximo.
+    """
+
+    if not bounds:
+        return 1.0
+
+    lo = datetime.fromisoformat(bounds["min"])
+    hi = datetime.fromisoformat(bounds["max"])
+
+    span = (hi - lo).total_seconds()
+    if span <= 0:
+        return 1.0
+
+    start = utc_naive(time_range.start) or lo
+    end = utc_naive(time_range.end) or hi
+
+    covered = (min(end, hi) - max(start, lo)).total_seconds()
+
+    return min(max(covered / span, 0.0), 1.0)
+
+
+# -------------------------------------------------------------------------
+# Prefijo semántico CORRECTO
+# -------------------------------------------------------------------------
+
+def _extract_prefix(
+    pattern: QueryPattern,
+    separator: str
+) -> Optional[str]:
+    """
+    Extrae un prefijo SOLO cuando el usuario usa '*'
+    y SOLO como secuencia completa, no como substring.
+
+    Ejemplos:
+    - "475,*"       -> "475,"
+    - "1,2,*"       -> "1,2,"
+    - "1,?,2,*"     -> None (tiene wildcard estructural)
+    - "1,2"         -> None
+    """
+
+    # Los predicados no tienen forma textual en la clave
+    if pattern.events is not None:
+        return None
+
+    raw = pattern.raw.replace(" ", "").replace(".", separator)
+
+    # Prefijo SOLO si termina en *
+    if not raw.endswith("*"):
+        return None
+
+    # Quitar el *
+    base = raw[:-1]
+
+    # Si hay '?' en el prefijo, no es estructural → usar regex
+    if "?" in base:
+        return None
+
+    # El prefijo debe acabar en separador
+    if not base.endswith(separator):
+        base += separator
+
+    return base
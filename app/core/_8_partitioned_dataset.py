@@ -0,0 +1,288 @@
+# app/helpers/_8_partitioned_dataset.py
+import json
+import shutil
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from core._2_preprocessor import (
+    ROW_ID_COLUMN,
+    all_view_columns,
+    dataset_source,
+    ensure_sequence_views,
+    load_dataset_stats,
+    load_or_preprocess_dataset,
+    time_columns,
+)
+
+
+# Columnas de partición (directorios Hive: time_bucket=.../first_event=...)
+TIME_BUCKET_COLUMN = "time_bucket"
+FIRST_EVENT_COLUMN = "first_event"
+PARTITION_COLUMNS = [TIME_BUCKET_COLUMN, FIRST_EVENT_COLUMN]
+
+# Valor de first_event para secuencias de observación vacías
+EMPTY_EVENT = "none"
+
+# Firma del procesado del que salieron las particiones (el prefijo '_'
+# hace que pyarrow lo ignore al descubrir ficheros)
+SOURCE_FILE = "_source.json"
+
+
+# -------------------------------------------------------------------------
+# API principal
+# -------------------------------------------------------------------------
+
+def partitioning_enabled(config: Dict[str, Any]) -> bool:
+    return bool(config.get("partitioning", {}).get("enabled", False))
+
+
+def ensure_partitioned_dataset(config: Dict[str, Any]) -> Path:
+    """
+    Devuelve la ruta del dataset particionado, generándolo a partir del
+    procesado (y este a partir del raw) la primera vez.
+    """
+
+    path = Path(config["paths"]["dataset_partitioned"])
+
+    if path.exists():
+        built_from = _read_source(path)
+
+        if built_from is None:
+            # Particiones anteriores a la firma: se asumen al día
+            _write_source(path, dataset_source(config))
+            return path
+
+        if built_from == dataset_source(config):
+            return path
+
+        # El procesado ha cambiado: las particiones ya no le corresponden
+        print(f"♻️ Procesado modificado, regenerando particiones en {path}")
+        shutil.rmtree(path)
+
+    df = load_or_preprocess_dataset(config)
+    load_dataset_stats(config, df)
+
+    _save_partitioned_dataset(df, path, config)
+    _write_source(path, dataset_source(config))
+
+    return path
+
+
+def load_partitions(
+    config: Dict[str, Any],
+    spec: Optional[Dict[str, Any]] = None,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Carga solo las particiones que pueden contener resultados.
+    Devuelve el mismo formato que load_or_preprocess_dataset:
+    MultiIndex categórico (obs_seq, pred_seq) ordenado por row_id.
+    """
+
+    obs_index_col, pred_index_col = _index_columns(config)
+
+    dataset = _dataset(config)
+
+    if columns is not None:
+        # Particiones escritas antes de las vistas no tienen sus columnas
+        columns = [ROW_ID_COLUMN, obs_index_col, pred_index_col] + [
+            c for c in columns
+            if c not in (ROW_ID_COLUMN, obs_index_col, pred_index_col)
+            and c in dataset.schema.names
+        ]
+
+    table = dataset.to_table(
+        filter=partition_expression(spec, config),
+        columns=columns,
+    )
+
+    return ensure_sequence_views(_to_frame(table, config), config, columns)
+
+
+def fetch_partition_rows(
+    config: Dict[str, Any],
+    row_ids: np.ndarray,
+    spec: Optional[Dict[str, Any]] = None
+) -> pd.DataFrame:
+    """
+    Lee todas las columnas de las filas indicadas, limitando la lectura a
+    las particiones del plan.
+    """
+
+    expression = pc.field(ROW_ID_COLUMN).isin(pa.array(row_ids, type=pa.int64()))
+
+    partitions = partition_expression(spec, config)
+    if partitions is not None:
+        expression = partitions & expression
+
+    table = _dataset(config).to_table(filter=expression)
+
+    return _to_frame(table, config)
+
+
+def partition_expression(
+    spec: Optional[Dict[str, Any]],
+    config: Dict[str, Any]
+) -> Optional[ds.Expression]:
+    """
+    Traduce el spec de particiones del planificador a un filtro de Arrow.
+
+    spec = {"first_event": "475", "time_from": datetime, "time_to": datetime}
+    """
+
+    if not spec:
+        return None
+
+    freq = _bucket_freq(config)
+    expression = None
+
+    def _and(expr):
+        return expr if expression is None else expression & expr
+
+    if spec.get(FIRST_EVENT_COLUMN) is not None:
+        expression = _and(pc.field(FIRST_EVENT_COLUMN) == str(spec[FIRST_EVENT_COLUMN]))
+
+    # Las etiquetas de bucket (fecha de inicio, YYYY-MM-DD) ordenan igual
+    # que el tiempo, así que el rango se filtra por comparación de strings
+    if spec.get("time_from") is not None:
+        label = _bucket_labels(pd.Series([_naive(spec["time_from"])]), freq)[0]
+        expression = _and(pc.field(TIME_BUCKET_COLUMN) >= label)
+
+    if spec.get("time_to") is not None:
+        label = _bucket_labels(pd.Series([_naive(spec["time_to"])]), freq)[0]
+        expression = _and(pc.field(TIME_BUCKET_COLUMN) <= label)
+
+    return expression
+
+
+# -------------------------------------------------------------------------
+# Escritura
+# -------------------------------------------------------------------------
+
+def _save_partitioned_dataset(
+    df: pd.DataFrame,
+    path: Path,
+    config: Dict[str, Any]
+) -> None:
+    """
+    Escribe el dataset procesado como directorio Hive particionado por
+    bucket temporal y primer evento de observación.
+    """
+
+    separator = config["processing"]["separator"]
+    obs_index_col, pred_index_col = _index_columns(config)
+    obs_start_col = time_columns(config).get("observation")
+
+    flat = df.reset_index()
+
+    # Claves como strings planos: un diccionario categórico se copiaría
+    # entero en cada fichero de partición
+    for col in [obs_index_col, pred_index_col] + all_view_columns(config):
+        if col in flat.columns:
+            flat[col] = np.asarray(flat[col], dtype=object)
+
+    if obs_start_col in flat.columns:
+        flat[TIME_BUCKET_COLUMN] = _bucket_labels(flat[obs_start_col], _bucket_freq(config))
+    else:
+        flat[TIME_BUCKET_COLUMN] = "all"
+
+    # Primer evento calculado una vez por secuencia distinta
+    keys = df.index.levels[0]
+    first = pd.Index(np.asarray(keys, dtype=object)).str.split(separator).str[0]
+    first = np.where(first.isna() | (first == ""), EMPTY_EVENT, first).astype(object)
+    codes = df.index.codes[0]
+    flat[FIRST_EVENT_COLUMN] = np.append(first, EMPTY_EVENT)[codes]
+
+    table = pa.Table.from_pandas(flat, preserve_index=False)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    ds.write_dataset(
+        table,
+        path,
+        format="parquet",
+        partitioning=ds.partitioning(
+            pa.schema([(c, pa.string()) for c in PARTITION_COLUMNS]),
+            flavor="hive",
+        ),
+        max_partitions=int(config["partitioning"].get("max_partitions", 100_000)),
+        max_rows_per_group=int(config["processing"].get("row_group_size") or 65536),
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+# -------------------------------------------------------------------------
+# Helpers internos
+# -------------------------------------------------------------------------
+
+def _read_source(path: Path) -> Optional[Dict[str, int]]:
+    try:
+        with (path / SOURCE_FILE).open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_source(path: Path, source: Optional[Dict[str, int]]) -> None:
+    with (path / SOURCE_FILE).open("w", encoding="utf-8") as f:
+        json.dump(source, f)
+
+
+def _dataset(config: Dict[str, Any]) -> ds.Dataset:
+    return ds.dataset(
+        ensure_partitioned_dataset(config),
+        format="parquet",
+        partitioning=ds.partitioning(
+            pa.schema([(c, pa.string()) for c in PARTITION_COLUMNS]),
+            flavor="hive",
+        ),
+    )
+
+
+def _to_frame(table: pa.Table, config: Dict[str, Any]) -> pd.DataFrame:
+    obs_index_col, pred_index_col = _index_columns(config)
+
+    df = table.to_pandas()
+    df = df.drop(columns=[c for c in PARTITION_COLUMNS if c in df.columns])
+
+    # El orden global (temporal) lo da row_id, no el orden de los ficheros
+    df = df.sort_values(ROW_ID_COLUMN, kind="stable", ignore_index=True)
+
+    for col in [obs_index_col, pred_index_col] + all_view_columns(config):
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+
+    return df.set_index([obs_index_col, pred_index_col])
+
+
+def _index_columns(config: Dict[str, Any]) -> tuple[str, str]:
+    index_columns = config["processing"]["index_columns"]
+    return index_columns["observation"], index_columns["prediction"]
+
+
+def _bucket_freq(config: Dict[str, Any]) -> str:
+    return config.get("partitioning", {}).get("time_bucket", "M")
+
+
+def _bucket_labels(values: pd.Series, freq: str) -> np.ndarray:
+    """
+    Etiqueta de bucket = fecha de inicio del periodo (YYYY-MM-DD).
+    """
+    values = pd.to_datetime(values)
+    if getattr(values.dt, "tz", None) is not None:
+        values = values.dt.tz_convert(None)
+
+    return values.dt.to_period(freq).dt.start_time.dt.strftime("%Y-%m-%d").to_numpy()
+
+
+def _naive(value):
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts
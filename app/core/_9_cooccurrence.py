@@ -0,0 +1,251 @@
+# app/helpers/_9_cooccurrence.py
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from core._2_preprocessor import dataset_source
+
+
+# Matrices guardadas (CSR: fila = evento origen, columna = evento destino)
+#   obs_to_pred  -> ventanas con el evento de observación y el de predicción
+#   pred_to_obs  -> la traspuesta (búsquedas en sentido inverso)
+#   obs_transitions / pred_transitions -> pares consecutivos a -> b
+MATRICES = ["obs_to_pred", "pred_to_obs", "obs_transitions", "pred_transitions"]
+
+
+# -------------------------------------------------------------------------
+# API principal
+# -------------------------------------------------------------------------
+
+def ensure_cooccurrence(config: Dict[str, Any], df: pd.DataFrame) -> Optional[Path]:
+    """
+    Precalcula (una vez por dataset procesado) la matriz de co-ocurrencia
+    obs × pred y las transiciones de primer orden, y las guarda en .npz.
+    Se recalculan si el procesado ha cambiado desde entonces (firma de
+    dataset_source guardada en el propio .npz).
+    """
+
+    if not config["processing"].get("cooccurrence", True):
+        return None
+
+    path = cooccurrence_path(config)
+
+    if not cooccurrence_current(config):
+        matrices = compute_cooccurrence(df, config)
+        matrices["source"] = _encode_source(dataset_source(config))
+        _save(matrices, path)
+
+    return path
+
+
+def cooccurrence_current(config: Dict[str, Any]) -> bool:
+    """
+    True si el .npz existe y se calculó sobre el procesado actual.
+    """
+    path = cooccurrence_path(config)
+
+    if not path.exists():
+        return False
+
+    with np.load(path) as data:
+        if "source" not in data.files:
+            # Anterior a la firma: no se sabe de qué datos es
+            return False
+        return _decode_source(data["source"]) == dataset_source(config)
+
+
+def load_cooccurrence(config: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    path = cooccurrence_path(config)
+
+    if not path.exists():
+        raise FileNotFoundError(f"Co-ocurrencias no precalculadas: {path}")
+
+    with np.load(path) as data:
+        return {k: data[k] for k in data.files if k != "source"}
+
+
+def cooccurrence_path(config: Dict[str, Any]) -> Path:
+    return Path(config["paths"]["dataset_processed"]).with_suffix(".cooc.npz")
+
+
+def top_k(
+    matrices: Dict[str, np.ndarray],
+    name: str,
+    event_id: int,
+    k: int = 10
+) -> List[Dict[str, Any]]:
+    """
+    Los k eventos más frecuentes tras/junto a `event_id` en la matriz
+    `name`, con soporte (sobre ventanas) y confianza: en co-ocurrencias
+    sobre las ventanas que contienen event_id; en transiciones sobre
+    todas las transiciones que salen de event_id (un evento puede
+    repetirse dentro de una secuencia).
+    """
+
+    if name not in MATRICES:
+        raise ValueError(f"Matriz desconocida: {name}")
+
+    indptr = matrices[f"{name}_indptr"]
+
+    if event_id < 0 or event_id >= len(indptr) - 1:
+        return []
+
+    start, end = indptr[event_id], indptr[event_id + 1]
+    indices = matrices[f"{name}_indices"][start:end]
+    data = matrices[f"{name}_data"][start:end]
+
+    # Una fila tiene como mucho n_events entradas: ordenarla entera es
+    # barato y deja los empates resueltos por event_id
+    order = np.lexsort((indices, -data))[:k]
+
+    rows = int(matrices["rows"])
+
+    if name.endswith("_transitions"):
+        base = int(data.sum())
+    else:
+        base = int(matrices[f"{name.split('_')[0]}_event_rows"][event_id])
+
+    return [
+        {
+            "event_id": int(indices[i]),
+            "count": int(data[i]),
+            "support": float(data[i]) / rows if rows else 0.0,
+            "confidence": float(data[i]) / base if base else 0.0,
+        }
+        for i in order
+    ]
+
+
+# -------------------------------------------------------------------------
+# Cálculo
+# -------------------------------------------------------------------------
+
+def compute_cooccurrence(df: pd.DataFrame, config: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """
+    Trabaja sobre pares distintos (obs_seq, pred_seq) ponderados por su
+    número de filas, nunca fila a fila.
+    """
+
+    separator = config["processing"]["separator"]
+    index = df.index
+
+    obs = _explode_levels(index.levels[0], separator)
+    pred = _explode_levels(index.levels[1], separator)
+
+    n_events = int(max(
+        obs["event"].to_numpy().max(initial=-1),
+        pred["event"].to_numpy().max(initial=-1),
+    )) + 1
+
+    # Pares distintos de secuencias con su frecuencia
+    codes = pd.DataFrame({"obs": index.codes[0], "pred": index.codes[1]})
+    codes = codes[(codes["obs"] >= 0) & (codes["pred"] >= 0)]
+    pairs = codes.value_counts().rename("weight").reset_index()
+
+    # obs_seq -> eventos de predicción (sin repetir evento por ventana)
+    pred_sets = pred[["level", "event"]].drop_duplicates()
+    by_obs = (
+        pairs.merge(pred_sets, left_on="pred", right_on="level")
+        .groupby(["obs", "event"], sort=False)["weight"].sum()
+        .reset_index()
+        .rename(columns={"event": "pred_event"})
+    )
+
+    obs_sets = obs[["level", "event"]].drop_duplicates()
+    cooc = (
+        by_obs.merge(obs_sets, left_on="obs", right_on="level")
+        .groupby(["event", "pred_event"], sort=False)["weight"].sum()
+        .reset_index()
+    )
+
+    obs_weights = np.bincount(codes["obs"], minlength=len(index.levels[0]))
+    pred_weights = np.bincount(codes["pred"], minlength=len(index.levels[1]))
+
+    result: Dict[str, np.ndarray] = {"rows": np.int64(len(codes)), "n_events": np.int64(n_events)}
+
+    result.update(_csr("obs_to_pred", cooc["event"], cooc["pred_event"], cooc["weight"], n_events))
+    result.update(_csr("pred_to_obs", cooc["pred_event"], cooc["event"], cooc["weight"], n_events))
+
+    for side, exploded, weights in (("obs", obs, obs_weights), ("pred", pred, pred_weights)):
+        src, dst, w = _transitions(exploded, weights)
+        result.update(_csr(f"{side}_transitions", src, dst, w, n_events))
+
+        # Ventanas que contienen cada evento (denominador de la confianza)
+        sets = exploded[["level", "event"]].drop_duplicates()
+        result[f"{side}_event_rows"] = np.bincount(
+            sets["event"], weights=weights[sets["level"]], minlength=n_events
+        ).astype(np.int64)
+
+    return result
+
+
+def _explode_levels(levels: pd.Index, separator: str) -> pd.DataFrame:
+    """
+    (level, event) para cada evento de cada secuencia distinta, en orden.
+    """
+
+    seqs = pd.Series(np.asarray(levels, dtype=object)).str.split(separator).explode()
+    seqs = seqs[seqs.notna() & (seqs != "")]
+
+    exploded = pd.DataFrame({
+        "level": seqs.index.to_numpy(dtype=np.int64),
+        "event": pd.to_numeric(seqs, errors="coerce").to_numpy(),
+    }).dropna()
+
+    exploded["event"] = exploded["event"].astype(np.int64)
+    return exploded[exploded["event"] >= 0].reset_index(drop=True)
+
+
+def _transitions(exploded: pd.DataFrame, weights: np.ndarray):
+    """
+    Pares consecutivos (a -> b) dentro de cada secuencia, ponderados.
+    """
+
+    level = exploded["level"].to_numpy()
+    event = exploded["event"].to_numpy()
+
+    same = level[1:] == level[:-1]
+
+    frame = pd.DataFrame({
+        "src": event[:-1][same],
+        "dst": event[1:][same],
+        "weight": weights[level[1:][same]],
+    })
+    frame = frame.groupby(["src", "dst"], sort=False)["weight"].sum().reset_index()
+
+    return frame["src"], frame["dst"], frame["weight"]
+
+
+def _csr(name: str, rows, cols, data, n: int) -> Dict[str, np.ndarray]:
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int32)
+    data = np.asarray(data, dtype=np.int64)
+
+    order = np.lexsort((cols, rows))
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=n))))
+
+    return {
+        f"{name}_indptr": indptr.astype(np.int64),
+        f"{name}_indices": cols[order],
+        f"{name}_data": data[order],
+    }
+
+
+def _encode_source(source: Optional[Dict[str, int]]) -> np.ndarray:
+    if source is None:
+        return np.array([-1, -1], dtype=np.int64)
+    return np.array([source["bytes"], source["mtime_ns"]], dtype=np.int64)
+
+
+def _decode_source(encoded: np.ndarray) -> Optional[Dict[str, int]]:
+    size, mtime_ns = (int(v) for v in encoded)
+    if size < 0:
+        return None
+    return {"bytes": size, "mtime_ns": mtime_ns}
+
+
+def _save(matrices: Dict[str, np.ndarray], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(path, **matrices)
@@ -6,21 +6,100 @@ export const API = {
         return await res.json();
     },
 
-    async runQuery(src, dst) {
+    async runQuery(src, dst, { background = false } = {}) {
         const res = await fetch("/query", {
             method: "POST",
             headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ src, dst })
+            body: JSON.stringify({ src, dst, background })
         });
         if (!res.ok) throw new Error(await res.text());
         return await res.json();
     },
 
+    /**
+     * Sigue el canal SSE de progreso (/query/{id}/progress...) llamando a
+     * onEvent con cada actualización. Se resuelve con el último evento al
+     * llegar a "done" y se rechaza con "error".
+     */
+    watchProgress(url, onEvent) {
+        return new Promise((resolve, reject) => {
+            const source = new EventSource(url);
+
+            source.onmessage = (msg) => {
+                const event = JSON.parse(msg.data);
+                onEvent(event);
+
+                if (event.stage === "done") {
+                    source.close();
+                    resolve(event);
+                } else if (event.stage === "error") {
+                    source.close();
+                    reject(new Error(event.error || "Error en la consulta"));
+                }
+            };
+
+            // EventSource reconecta solo (con Last-Event-ID); solo se
+            // abandona si el servidor cierra definitivamente
+            source.onerror = () => {
+                if (source.readyState === EventSource.CLOSED) {
+                    reject(new Error("Progreso no disponible"));
+                }
+            };
+        });
+    },
+
     async fetchQueryData(queryId, offset = 0, limit = 500) {
         const res = await fetch(
             `/query/${queryId}/data?offset=${offset}&limit=${limit}`
         );
         if (!res.ok) throw new Error("Error cargando datos");
         return await res.json();
+    },
+
+    /**
+     * Descarga [offset, offset + limit) en NDJSON y llama a onRows con
+     * cada bloque de filas según va llegando (sin esperar al final).
+     */
+    async streamQueryData(queryId, { offset = 0, limit = 5000, batch = null, renderMs = null, signal } = {}, onRows) {
+        const params = new URLSearchParams({ format: "ndjson", offset, limit });
+        if (batch) params.set("batch", batch);
+        if (renderMs) params.set("render_ms", renderMs.toFixed(1));
+
+        const res = await fetch(`/query/${queryId}/data?${params}`, { signal });
+        if (!res.ok) throw new Error("Error cargando datos");
+
+        const meta = {
+            total: Number(res.headers.get("X-Total-Count")),
+            batchSize: Number(res.headers.get("X-Batch-Size"))
+        };
+
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        let received = 0;
+
+        const flush = (text) => {
+            const rows = text.split("\n").filter(Boolean).map(l => JSON.parse(l));
+            received += rows.length;
+            if (rows.length) onRows(rows, meta);
+        };
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+
+            // La última línea puede llegar partida: se guarda para el siguiente bloque
+            const cut = buffer.lastIndexOf("\n");
+            if (cut >= 0) {
+                flush(buffer.slice(0, cut));
+                buffer = buffer.slice(cut + 1);
+            }
+        }
+
+        flush(buffer + decoder.decode());
+
+        return { ...meta, received };
     }
 };
@@ -2,6 +2,7 @@
 import { API } from "./api.js";
 import { state } from "./state.js";
 import {
+    renderProgress,
     renderQueriesList,
     selectQuery,
     showVisualizationPlaceholder
@@ -34,7 +35,22 @@ async function onSubmitQuery(e) {
     const src = document.getElementById("src-input").value || null;
     const dst = document.getElementById("dst-input").value || null;
 
-    const result = await API.runQuery(src, dst);
-    await loadQueries();
-    selectQuery(result.query_id);
+    const button = document.getElementById("run-query-btn");
+    button.disabled = true;
+
+    try {
+        // En segundo plano: la petición vuelve enseguida (202) y el avance
+        // llega por SSE en lugar de esperar (y agotar) un único POST
+        const job = await API.runQuery(src, dst, { background: true });
+        await loadQueries();
+
+        await API.watchProgress(job.progress, renderProgress);
+
+        await loadQueries();
+        selectQuery(job.query_id);
+    } catch (err) {
+        renderProgress({ stage: "error", error: err.message });
+    } finally {
+        button.disabled = false;
+    }
 }
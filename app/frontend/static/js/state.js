@@ -4,10 +4,15 @@ export const state = {
     queries: [],              // histórico de consultas
     selectedQueryId: null,    // query seleccionada
 
+    rows: [],                 // filas ya recibidas de la query seleccionada
+
     pagination: {
-        offset: 0,
-        limit: 500,
+        offset: 0,            // filas recibidas (siguiente offset a pedir)
+        limit: 5000,          // filas por petición en streaming
+        batch: null,          // tamaño de lote que propone el servidor
+        renderMs: null,       // coste medido de pintar el último lote
         total: 0,
-        loading: false
+        loading: false,
+        controller: null      // AbortController del stream en curso
     }
 };
@@ -49,3 +49,41 @@ export function showVisualizationContent() {
     document.getElementById("visualization-placeholder").style.display = "none";
     document.getElementById("visualization-content").style.display = "block";
 }
+
+// Etapas del progreso de una consulta (ver services/queries_service.py)
+const STAGE_LABELS = {
+    queued: "En cola",
+    load_dataset: "Cargando dataset",
+    plan: "Planificando",
+    load_partitions: "Leyendo particiones",
+    match: "Buscando patrones",
+    materialize: "Leyendo filas",
+    save_results: "Guardando resultados",
+    save_profile: "Guardando perfil",
+    write_metadata: "Guardando metadata",
+    done: "Terminada",
+    error: "Error"
+};
+
+export function renderProgress(event) {
+    const box = document.getElementById("query-progress");
+    box.style.display = "block";
+    box.classList.toggle("error", event.stage === "error");
+
+    const parts = [STAGE_LABELS[event.stage] ?? event.stage];
+
+    if (event.stage === "error") {
+        parts.push(event.error ?? "");
+    } else if (event.stage === "match" && event.rows_in) {
+        const step = event.steps > 1 ? ` (paso ${event.step}/${event.steps})` : "";
+        parts.push(`${(event.rows_scanned ?? 0).toLocaleString()} / ${event.rows_in.toLocaleString()} filas${step}`);
+        parts.push(`${(event.rows_matched ?? 0).toLocaleString()} coinciden`);
+    } else if (event.stage === "save_results" && event.bytes_written) {
+        parts.push(`${event.format}: ${(event.rows_written ?? 0).toLocaleString()} / ${(event.rows_total ?? 0).toLocaleString()} filas`);
+        parts.push(`${(event.bytes_written / 1024 ** 2).toFixed(1)} MB`);
+    } else if (event.stage === "done" && event.rows != null) {
+        parts.push(`${event.rows.toLocaleString()} filas`);
+    }
+
+    box.textContent = parts.join(" · ");
+}
@@ -21,12 +21,27 @@ async function loadEventDictionary() {
     return EVENT_DICT;
 }
 
+/* =========================================================
+   Virtualización
+   ========================================================= */
+const ROW_HEIGHT = 36;      // .window.virtual (28px) + separación
+const OVERSCAN = 10;        // filas extra por encima/debajo de la vista
+const PREFETCH_ROWS = 200;  // pedir más cuando faltan menos de N filas
+
+const rendered = new Map(); // índice de fila -> nodo en el DOM
+let scheduled = false;
+
 /* =========================================================
    Render principal (RESET)
    ========================================================= */
 export async function renderVisualization(query) {
     const container = document.getElementById("visualization-content");
+
+    // Cancelar el stream de la query anterior
+    state.pagination.controller?.abort();
+
     container.innerHTML = "";
+    rendered.clear();
 
     if (!query) {
         showVisualizationPlaceholder();
@@ -34,75 +49,153 @@ export async function renderVisualization(query) {
     }
 
     showVisualizationContent();
+    container.classList.add("virtual");
+    container.style.height = "0px";
 
-    // Reset paginación
+    // Reset paginación (el tamaño de lote aprendido se conserva)
+    state.rows = [];
     state.pagination.offset = 0;
     state.pagination.total = 0;
     state.pagination.loading = false;
 
+    const scroller = document.getElementById("visualization-container");
+    scroller.scrollTop = 0;
+    scroller.onscroll = () => scheduleRender(query);
 
-    await loadMoreWindows(query, true);
+    await loadMoreWindows(query);
 }
 
 /* =========================================================
-   Cargar más ventanas
+   Cargar más ventanas (streaming)
    ========================================================= */
-export async function loadMoreWindows(query, reset = false) {
+export async function loadMoreWindows(query) {
     if (state.pagination.loading) return;
 
+    const eventDict = await loadEventDictionary();
+    const controller = new AbortController();
+
     state.pagination.loading = true;
+    state.pagination.controller = controller;
 
-    const { offset, limit } = state.pagination;
+    const { offset, limit, batch, renderMs } = state.pagination;
 
-    const data = await API.fetchQueryData(
-        query.query_id,
-        offset,
-        limit
-    );
+    try {
+        const meta = await API.streamQueryData(
+            query.query_id,
+            { offset, limit, batch, renderMs, signal: controller.signal },
+            (rows, { total, batchSize }) => {
+                const t0 = performance.now();
 
-    state.pagination.total = data.total;
+                state.rows.push(...rows);
+                state.pagination.total = total;
+                state.pagination.batch = batchSize;
+                state.pagination.offset = state.rows.length;
 
-    renderWindows(data.rows, offset === 0);
+                renderVisibleRows(eventDict);
+                updateStreamStatus();
 
-    state.pagination.offset += data.rows.length;
-    state.pagination.loading = false;
+                state.pagination.renderMs = performance.now() - t0;
+            }
+        );
 
-    updateLoadMoreButton();
+        state.pagination.total = meta.total;
+    } catch (err) {
+        if (err.name !== "AbortError") throw err;
+        return;
+    } finally {
+        if (state.pagination.controller === controller) {
+            state.pagination.loading = false;
+        }
+    }
+
+    updateStreamStatus();
+
+    // La vista puede haber llegado al final mientras llegaban los datos
+    scheduleRender(query);
 }
 
 /* =========================================================
-   Render ventanas
+   Render ventanas (solo las visibles)
    ========================================================= */
-async function renderWindows(rows, firstBatch) {
-    const container = document.getElementById("visualization-content");
-    const eventDict = await loadEventDictionary();
+function scheduleRender(query) {
+    if (scheduled) return;
+    scheduled = true;
 
-    rows.forEach((row, i) => {
-        const idx = state.pagination.offset + i;
+    requestAnimationFrame(async () => {
+        scheduled = false;
+        renderVisibleRows(await loadEventDictionary());
 
-        const w = document.createElement("div");
-        w.className = "window";
+        const { offset, total, loading } = state.pagination;
+        const [, last] = visibleRange();
 
-        w.innerHTML = `<div class="window-label">Ventana ${idx + 1}</div>`;
+        if (!loading && offset < total && last + PREFETCH_ROWS >= offset) {
+            loadMoreWindows(query);
+        }
+    });
+}
 
-        w.appendChild(createEventsBlock(
-            row.observation_events || row.obs_events || [],
-            eventDict
-        ));
+function visibleRange() {
+    const scroller = document.getElementById("visualization-container");
+    const content = document.getElementById("visualization-content");
 
-        // w.appendChild(document.createTextNode(" | "));
-        const sep = document.createElement("div");
-        sep.className = "window-separator";
-        w.appendChild(sep);
+    const top = Math.max(scroller.scrollTop - content.offsetTop, 0);
 
+    const first = Math.max(Math.floor(top / ROW_HEIGHT) - OVERSCAN, 0);
+    const last = Math.ceil((top + scroller.clientHeight) / ROW_HEIGHT) + OVERSCAN;
 
-        w.appendChild(createEventsBlock(
-            row.prediction_events || row.pred_events || [],
-            eventDict
-        ));
+    return [first, last];
+}
+
+function renderVisibleRows(eventDict) {
+    const container = document.getElementById("visualization-content");
+
+    // La altura total reserva el scroll de todas las filas, recibidas o no
+    container.style.height =
+        `${Math.max(state.pagination.total, state.rows.length) * ROW_HEIGHT}px`;
+
+    const [first, lastVisible] = visibleRange();
+    const last = Math.min(lastVisible, state.rows.length);
+
+    // Fuera de la vista -> fuera del DOM
+    for (const [idx, node] of rendered) {
+        if (idx < first || idx >= last) {
+            node.remove();
+            rendered.delete(idx);
+        }
+    }
+
+    for (let idx = first; idx < last; idx++) {
+        if (rendered.has(idx)) continue;
+
+        const w = createWindow(state.rows[idx], idx, eventDict);
+        w.style.top = `${idx * ROW_HEIGHT}px`;
 
         container.appendChild(w);
-    });
+        rendered.set(idx, w);
+    }
+}
+
+function createWindow(row, idx, eventDict) {
+    const w = document.createElement("div");
+    w.className = "window virtual";
+
+    w.innerHTML = `<div class="window-label">Ventana ${idx + 1}</div>`;
+
+    w.appendChild(createEventsBlock(
+        row.observation_events || row.obs_events || [],
+        eventDict
+    ));
+
+    const sep = document.createElement("div");
+    sep.className = "window-separator";
+    w.appendChild(sep);
+
+    w.appendChild(createEventsBlock(
+        row.prediction_events || row.pred_events || [],
+        eventDict
+    ));
+
+    return w;
 }
 
 /* =========================================================
@@ -146,32 +239,23 @@ function createEventsBlock(events, dict) {
 }
 
 /* =========================================================
-   Botón cargar más
+   Estado de la carga
    ========================================================= */
-function updateLoadMoreButton() {
-    let btn = document.getElementById("load-more-btn");
-
-    if (!btn) {
-        btn = document.createElement("button");
-        btn.id = "load-more-btn";
-        btn.textContent = "Cargar más";
-        btn.onclick = () => {
-            const q = state.queries.find(
-                q => q.query_id === state.selectedQueryId
-            );
-            loadMoreWindows(q);
-        };
+function updateStreamStatus() {
+    let status = document.getElementById("stream-status");
+
+    if (!status) {
+        status = document.createElement("div");
+        status.id = "stream-status";
 
         document
             .getElementById("visualization-container")
-            .appendChild(btn);
+            .appendChild(status);
     }
 
-    if (state.pagination.offset >= state.pagination.total) {
-        btn.style.display = "none";
-    } else {
-        btn.style.display = "block";
-        btn.textContent =
-            `Cargar más (${state.pagination.offset}/${state.pagination.total})`;
-    }
+    const { offset, total, loading } = state.pagination;
+
+    status.textContent = loading
+        ? `Recibiendo ventanas… ${offset}/${total}`
+        : `${offset}/${total} ventanas`;
 }
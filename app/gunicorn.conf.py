@@ -0,0 +1,39 @@
+# gunicorn.conf.py
+#
+# Producción (desde app/):  gunicorn -c gunicorn.conf.py main:app
+#
+# Workers uvicorn (ASGI). Con datasets.shared_memory.enabled el proceso
+# maestro carga los datasets residentes UNA vez en memoria compartida
+# antes de crear los workers (on_starting) y los libera al salir
+# (on_exit); cada worker los adjunta en solo lectura al usarlos, así que
+# la memoria no crece con el número de workers.
+
+import os
+import sys
+
+# El maestro importa core/ y state/ en los hooks
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8050')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+
+# La app se importa en cada worker: hilos de arranque, pools y registro
+# de queries son por worker. Lo único común es la memoria compartida
+preload_app = False
+
+
+def on_starting(server):
+    from core._1_config_loader import load_config
+    from state.shared_dataset import publish_datasets
+
+    path = publish_datasets(load_config())
+    if path is not None:
+        server.log.info("Datasets en memoria compartida (manifiesto %s)", path)
+
+
+def on_exit(server):
+    from state.shared_dataset import release_datasets
+
+    release_datasets()
@@ -1,21 +1,78 @@
 # main.py
 
+# Primero: marca el inicio del arranque (ver /health)
+from state.boot import BOOT
+
+import threading
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 
+from api.compression import CompressionMiddleware
+from api.dependencies import get_config, query_service_ready, warm_up
+from api.http_cache import AssetVersions, CachedStaticFiles
 from api.routes import router as api_router
+from state.executors import EXECUTORS, ExecutorBusy
+from state.progress import PROGRESS
 
 
 # =====================================================
 # APP
 # =====================================================
 
+config = get_config()
+http_cfg = config.get("http", {})
+startup_cfg = config.get("startup", {})
+
+# Pools del trabajo bloqueante de las rutas (tamaños en config.executors)
+EXECUTORS.configure(config)
+
+# Streams SSE de progreso (frecuencia, keepalive y retención en config.progress)
+PROGRESS.configure(config)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    El servicio (pandas, registro de queries, dataset) se prepara en un
+    hilo aparte: el worker responde a /health desde el primer momento.
+    """
+    BOOT.mark("serving")
+
+    if startup_cfg.get("warm_up", True):
+        threading.Thread(
+            target=warm_up,
+            kwargs={"preload_dataset": bool(startup_cfg.get("preload_dataset", False))},
+            name="service-warm-up",
+            daemon=True,
+        ).start()
+
+    yield
+
+    EXECUTORS.shutdown()
+
+
 app = FastAPI(
     title="Visualizador de Ventanas",
     description="Interfaz web para la consulta y visualización de ventanas de eventos",
     version="1.0.0",
+    lifespan=lifespan,
+)
+
+
+# =====================================================
+# COMPRESIÓN (gzip / brotli por encima de un umbral)
+# =====================================================
+
+compression_cfg = http_cfg.get("compression", {})
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(compression_cfg.get("minimum_size", 1024)),
+    gzip_level=int(compression_cfg.get("gzip_level", 6)),
+    brotli_quality=int(compression_cfg.get("brotli_quality", 5)),
 )
 
 
@@ -26,6 +83,18 @@ app = FastAPI(
 app.include_router(api_router)
 
 
+@app.exception_handler(ExecutorBusy)
+async def executor_busy(request: Request, exc: ExecutorBusy):
+    """
+    Control de admisión: pool lleno => 429 con Retry-After
+    """
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "pool": exc.pool},
+        headers={"Retry-After": str(int(exc.retry_after_s))},
+    )
+
+
 # =====================================================
 # FRONTEND (templates + static)
 # =====================================================
@@ -33,10 +102,18 @@ app.include_router(api_router)
 # Templates HTML
 templates = Jinja2Templates(directory="frontend/templates")
 
+# URLs de estáticos versionadas por contenido (?v=<hash>)
+assets = AssetVersions("frontend/static", url_prefix="/static")
+templates.env.globals["static_url"] = assets.url
+templates.env.globals["import_map"] = assets.import_map
+
 # Archivos estáticos (css / js / icons / etc.)
 app.mount(
     "/static",
-    StaticFiles(directory="frontend/static"),
+    CachedStaticFiles(
+        directory="frontend/static",
+        max_age=int(http_cfg.get("static_max_age", 31536000)),
+    ),
     name="static",
 )
 
@@ -46,7 +123,7 @@ app.mount(
 # =====================================================
 
 @app.get("/", response_class=HTMLResponse)
-def index(request: Request):
+async def index(request: Request):
     """
     Página principal de la aplicación web
     """
@@ -61,5 +138,14 @@ def index(request: Request):
 # =====================================================
 
 @app.get("/health")
-def health():
-    return {"status": "ok"}
+async def health():
+    # async y sin trabajo bloqueante: responde aunque los pools estén llenos
+    return {
+        "status": "ok",
+        "ready": query_service_ready(),
+        "boot": BOOT.to_dict(),
+        "executors": EXECUTORS.to_dict(),
+    }
+
+
+BOOT.mark("app_ready")
@@ -0,0 +1,192 @@
+# services/profiling.py
+
+import cProfile
+import io
+import pstats
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from core._14_parallel import shard_threads
+
+
+PROFILE_MODES = ("sampling", "cprofile")
+
+# cProfile admite una sola sesión activa a la vez (en 3.12 usa
+# sys.monitoring, que es de todo el proceso): las demás consultas que lo
+# pidan mientras tanto se perfilan por muestreo
+_CPROFILE_LOCK = threading.Lock()
+
+
+# -------------------------------------------------------------------------
+# Decisión: ¿se perfila esta consulta?
+# -------------------------------------------------------------------------
+
+def resolve_profile_mode(config: Dict[str, Any], header: Optional[str]) -> Optional[str]:
+    """
+    Modo de perfilado de una petición (None = sin perfilar).
+
+    - Cabecera X-Profile: "1"/"true" (modo de config), "sampling" o
+      "cprofile". Fuerza el perfilado aunque esté desactivado en config.
+    - profiling.enabled en config: perfila todas las consultas no
+      cacheadas con profiling.mode.
+    """
+    cfg = config.get("profiling", {})
+    default_mode = cfg.get("mode", "sampling")
+
+    if header:
+        value = header.strip().lower()
+        if value in PROFILE_MODES:
+            return value
+        if value in ("1", "true", "yes", "on"):
+            return default_mode
+        return None
+
+    return default_mode if cfg.get("enabled", False) else None
+
+
+# -------------------------------------------------------------------------
+# Perfilador
+# -------------------------------------------------------------------------
+
+class QueryProfiler:
+    """
+    Perfila el hilo que ejecuta la consulta.
+
+    sampling -> un hilo auxiliar muestrea la pila del hilo de la consulta
+                y de los hilos que ejecutan sus shards (_14_parallel)
+                cada interval_ms (sys._current_frames). Sobrecoste bajo y
+                constante; salida en formato "folded" (flamegraph.pl,
+                speedscope), con las pilas de los shards bajo "[shard]".
+    cprofile -> cProfile determinista (todas las llamadas). Exacto pero
+                con sobrecoste notable; salida .prof (pstats/snakeviz).
+                Una sola sesión a la vez: si ya hay otra (u otra
+                herramienta de perfilado activa) se usa sampling. En
+                Python >= 3.12 recoge todos los hilos del proceso.
+    """
+
+    def __init__(self, mode: str = "sampling", interval_ms: float = 5.0):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Modo de perfilado desconocido: {mode}")
+
+        self.mode = mode
+        self.interval = interval_ms / 1000
+
+        self._profile: Optional[cProfile.Profile] = None
+        self._samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    @property
+    def started(self) -> bool:
+        return self._profile is not None or self._sampler is not None
+
+    def __enter__(self) -> "QueryProfiler":
+        if self.mode == "cprofile" and not self._start_cprofile():
+            self.mode = "sampling"
+
+        if self.mode == "sampling":
+            target = threading.get_ident()
+            self._sampler = threading.Thread(
+                target=self._sample, args=(target,), name="query-profiler", daemon=True
+            )
+            self._sampler.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._profile is not None:
+            self._profile.disable()
+            _CPROFILE_LOCK.release()
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+
+    def _start_cprofile(self) -> bool:
+        if not _CPROFILE_LOCK.acquire(blocking=False):
+            print("[WARN] cProfile ocupado por otra consulta, se perfila por muestreo")
+            return False
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # "Another profiling tool is already active" (3.12+)
+            _CPROFILE_LOCK.release()
+            print(f"[WARN] cProfile no disponible ({e}), se perfila por muestreo")
+            return False
+
+        self._profile = profile
+        return True
+
+    # ------------------------------------------------------------------
+    # Muestreo
+    # ------------------------------------------------------------------
+
+    def _sample(self, target: int) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+
+            threads = [(target, None)] + [(t, "[shard]") for t in shard_threads(target)]
+
+            for thread, root in threads:
+                frame = frames.get(thread)
+                if frame is None:
+                    continue
+
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if root is not None:
+                    stack.append(root)
+
+                self._samples[";".join(reversed(stack))] += 1
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+
+    def save(self, base_path: Path) -> Path:
+        """
+        Guarda el perfil junto a la metadata de la query:
+        <base>.prof (cprofile) o <base>.profile.txt (sampling).
+        """
+        base_path = Path(base_path)
+        base_path.parent.mkdir(parents=True, exist_ok=True)
+
+        if self.mode == "cprofile":
+            path = base_path.with_suffix(".prof")
+            self._profile.dump_stats(path)
+            return path
+
+        path = base_path.with_suffix(".profile.txt")
+        with path.open("w", encoding="utf-8") as f:
+            for stack, count in self._samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+# -------------------------------------------------------------------------
+# Lectura
+# -------------------------------------------------------------------------
+
+def render_profile(path: Path, limit: int = 50) -> str:
+    """
+    Informe de texto de un perfil guardado: las `limit` funciones con
+    más tiempo acumulado (cprofile) o las `limit` pilas más muestreadas
+    (sampling).
+    """
+    path = Path(path)
+
+    if path.suffix == ".prof":
+        stream = io.StringIO()
+        pstats.Stats(str(path), stream=stream).sort_stats("cumulative").print_stats(limit)
+        return stream.getvalue()
+
+    with path.open("r", encoding="utf-8") as f:
+        lines = [line for _, line in zip(range(limit), f)]
+
+    return "".join(lines)
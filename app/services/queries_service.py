@@ -2,17 +2,69 @@
 
 import hashlib
 import json
+from contextlib import nullcontext
 from pathlib import Path
+from threading import Thread
 from typing import Optional, Dict, Any
 
+import pandas as pd
+
 from core._1_config_loader import load_config
-from core._2_preprocessor import load_or_preprocess_dataset
-from core._3_input_controller import QueryPattern, parse_pattern
+from core._2_preprocessor import (
+    ROW_ID_COLUMN,
+    base_frame,
+    fetch_rows,
+    resident_columns,
+    sequence_views,
+    view_frame,
+)
+from core._3_input_controller import (
+    QueryPattern,
+    TimeRange,
+    parse_pattern,
+    parse_time_range,
+)
 from core._4_query_engine import run_query
-from core._5_output_writer import save_results
-
+from core._5_output_writer import (
+    file_manifest,
+    result_paths,
+    result_row_ids,
+    save_results,
+    write_metadata,
+)
+from core._7_query_planner import QueryPlan, plan_query
+from core._8_partitioned_dataset import (
+    fetch_partition_rows,
+    load_partitions,
+    partitioning_enabled,
+)
+from core._9_cooccurrence import top_k
+from core._10_prefix_tree import PrefixTree, prefix_tree_from_rows
+from core._11_preview import estimate_count, sample_frame
+from core._12_event_predicates import load_event_lookup
+from core._13_set_operations import (
+    COMMUTATIVE,
+    combine_row_ids,
+    overlap_counts,
+)
+
+from state.boot import BOOT
 from state.registry import QueryRegistry, QueryStatus, QueryEntry
 from state.locks import QueryLockManager
+from state.progress import PROGRESS
+from services.profiling import QueryProfiler, resolve_profile_mode
+from services.retention import RetentionManager
+from state.datasets import DatasetRegistry, LoadedDataset
+from state.metrics import (
+    DATASET_MEMORY,
+    QUERY_BYTES,
+    QUERY_CACHE,
+    QUERY_DURATION,
+    QUERY_ROWS,
+    QUERY_STATUS,
+    RETENTION_RECOMPUTES,
+    StageTimer,
+)
 
 
 
@@ -21,25 +73,48 @@ from state.locks import QueryLockManager
 # -------------------------------------------------------------------------
 
 def _make_query_id(src: Optional[QueryPattern],
-                   dst: Optional[QueryPattern]) -> str:
+                   dst: Optional[QueryPattern],
+                   time_range: Optional[TimeRange] = None,
+                   dataset: Optional[str] = None,
+                   view: Optional[str] = None) -> str:
     raw = f"src={src.canonical if src else ''}|dst={dst.canonical if dst else ''}"
+    if time_range is not None:
+        raw += f"|time={time_range.canonical}"
+    # El dataset por defecto no entra en el hash: ids previos siguen válidos
+    if dataset is not None:
+        raw += f"|dataset={dataset}"
+    if view is not None:
+        raw += f"|view={view}"
     return hashlib.sha1(raw.encode()).hexdigest()[:12]
 
-def _write_query_metadata(entry) -> None:
-    if not entry.output:
-        return
+def _append_result(previous_output: str, new_rows):
+    """
+    Resultado anterior + filas nuevas detrás (mismo orden de row_id que un
+    recálculo completo). Las categóricas se reconstruyen: concatenar dos
+    con categorías distintas daría object.
+    """
+    result_df = pd.concat([pd.read_parquet(previous_output), new_rows])
+
+    for col in new_rows.columns:
+        if isinstance(new_rows[col].dtype, pd.CategoricalDtype):
+            result_df[col] = result_df[col].astype("category")
+
+    return result_df
 
-    # output puede ser string o lista
-    if isinstance(entry.output, list):
-        parquet_path = Path(entry.output[0])
-    else:
-        parquet_path = Path(entry.output)
 
-    meta_path = parquet_path.with_suffix(".json")
-    meta_path.parent.mkdir(parents=True, exist_ok=True)
+def _write_query_metadata(entry, config: Dict[str, Any]) -> None:
+    """
+    Metadata (atómica) en <output_dir>/<query_id>.json: GET /query/{id}
+    y el bootstrap la encuentran sin buscar.
+    """
+    path = write_metadata(config, entry.query_id, entry.to_dict())
 
-    with meta_path.open("w", encoding="utf-8") as f:
-        json.dump(entry.to_dict(), f, indent=2)
+    # Resultados antiguos (nombrados por patrón): la metadata junto a su
+    # parquet queda sustituida por la nueva
+    if entry.output:
+        legacy = Path(entry.output).with_suffix(".json")
+        if legacy != path and legacy.exists():
+            legacy.unlink()
 
 
 # -------------------------------------------------------------------------
@@ -48,134 +123,817 @@ def _write_query_metadata(entry) -> None:
 
 class QueryService:
 
-    def __init__(self):
-        self.config = load_config()
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = config if config is not None else load_config()
         # self.df = load_or_preprocess_dataset(self.config)
-        self._df = None
+        self.datasets = DatasetRegistry(self.config)
+        DATASET_MEMORY.callback = lambda: {
+            (d["name"],): d["memory_bytes"] for d in self.datasets.describe() if d["loaded"]
+        }
 
         self.registry = QueryRegistry()
         self.locks = QueryLockManager()
 
-        # 🆕 reconstruir estado desde disco
-        self._load_existing_queries()
+        # 🆕 reconstruir estado desde disco (en segundo plano: el registro
+        # se va llenando y get() espera si aún no ha visto una query)
+        self.registry.begin_bootstrap()
+        Thread(target=self._load_existing_queries, name="registry-bootstrap", daemon=True).start()
+
+        # Cuotas / TTL de output/queries (hilo periódico si está activo)
+        self.retention = RetentionManager(
+            self.config,
+            self.registry,
+            self.locks,
+            lambda entry: _write_query_metadata(entry, self.config),
+        )
+        self.retention.start()
 
     def _load_existing_queries(self) -> None:
         queries_dir = Path(self.config["paths"]["output_dir"])
-
-        if not queries_dir.exists():
+        loaded = 0
+
+        try:
+            if not queries_dir.exists():
+                return
+
+            for meta_file in queries_dir.glob("*.json"):
+                try:
+                    with meta_file.open("r", encoding="utf-8") as f:
+                        data = json.load(f)
+
+                    self.registry.add_from_disk(QueryEntry.from_dict(data))
+                    loaded += 1
+
+                except Exception as e:
+                    print(f"[WARN] No se pudo cargar {meta_file.name}: {e}")
+
+        finally:
+            self.registry.end_bootstrap()
+            BOOT.mark("registry_loaded", registry_entries=loaded)
+
+    def _get_dataset(self, name: Optional[str] = None) -> LoadedDataset:
+        return self.datasets.get(name)
+
+    def _get_query_dataset(
+        self,
+        dataset: LoadedDataset,
+        plan: QueryPlan,
+        view: Optional[str] = None
+    ):
+        """
+        Dataset sobre el que se evalúa la consulta: el residente completo
+        o, con dataset particionado, solo las particiones del plan.
+        Con vista, el mismo dataset indexado por las secuencias agregadas.
+        """
+        if dataset.df is not None:
+            if view is None:
+                return dataset.df
+            return self.datasets.view(dataset, view)["frame"]
+
+        df = load_partitions(
+            dataset.config,
+            plan.partitions,
+            columns=resident_columns(dataset.config),
+        )
+
+        return df if view is None else view_frame(df, dataset.config, view)
+
+    def _view_stats(self, dataset: LoadedDataset, view: Optional[str]):
+        """
+        Estadísticas para el planificador. Las de una vista solo existen
+        sobre el dataset residente; particionado se planifica sin ellas.
+        """
+        if view is None:
+            return dataset.stats
+        if dataset.df is not None:
+            return self.datasets.view(dataset, view)["stats"]
+        return None
+
+    def _check_view(self, view: Optional[str], *patterns: Optional[QueryPattern]) -> None:
+        if view is None:
             return
 
-        entries: Dict[str, QueryEntry] = {}
+        if view not in sequence_views(self.config):
+            raise ValueError(f"Vista no disponible: {view}")
+
+        # Los predicados se compilan a event_ids: no valen en una vista
+        if any(p is not None and p.events is not None for p in patterns):
+            raise ValueError("Los predicados de componente/percentil solo se aplican a eventos")
+
+    def _from_view(self, result_df, view: Optional[str]):
+        """
+        Resultado de una vista de vuelta al índice (obs_seq, pred_seq).
+        """
+        return result_df if view is None else base_frame(result_df, self.config)
+
+    def describe_views(self) -> Dict[str, Any]:
+        """
+        Vistas activas y el significado de sus ids.
+        """
+        lookup = load_event_lookup(self.config)
+
+        return {
+            "views": sequence_views(self.config),
+            "component": [{"id": i, "name": c} for i, c in enumerate(lookup.components)],
+            "percentile": [{"id": i, "name": p} for i, p in enumerate(lookup.percentiles)],
+        }
+
+    def _materialize(self, result_df, dataset: LoadedDataset, plan: QueryPlan):
+        """
+        Con carga perezosa el resultado solo trae claves + row_id:
+        se leen del parquet procesado el resto de columnas de esas filas.
+        """
+        if resident_columns(dataset.config) is None:
+            return result_df
+
+        row_ids = result_df[ROW_ID_COLUMN].to_numpy()
+
+        if partitioning_enabled(dataset.config):
+            return fetch_partition_rows(dataset.config, row_ids, plan.partitions)
+
+        return fetch_rows(dataset.config, row_ids)
+
+    def list_datasets(self) -> list[dict]:
+        return self.datasets.describe()
+
+    def top_patterns(
+        self,
+        side: str,
+        length: int,
+        k: int = 20,
+        given: Optional[str] = None,
+        dataset: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Prefijos de `length` eventos más frecuentes en un lado de la
+        ventana, opcionalmente condicionados a un patrón del otro lado.
+        """
+        loaded = self._get_dataset(dataset)
+        level = 0 if side == "observation" else 1
+        separator = self.config["processing"]["separator"]
+        depth = int(self.config["processing"].get("prefix_tree_depth", 8))
+
+        if given is None:
+            # Árbol completo del dataset: se construye una vez. Tras una
+            # recarga que solo añade filas al final, el de la versión
+            # anterior se refresca con las nuevas en lugar de reconstruirse
+            tree = loaded.prefix_trees.get(side)
+
+            if tree is None:
+                tree = loaded.inherited_prefix_trees.pop(side, None)
+
+                if tree is not None and tree.version and tree.version == loaded.prefix_version(tree.rows):
+                    tree.refresh(loaded.df.index, level, separator)
+                else:
+                    keys = self._get_query_dataset(loaded, QueryPlan())
+                    tree = PrefixTree.from_index(keys.index, level, separator, depth)
+
+                tree.version = loaded.prefix_version(tree.rows)
+                loaded.prefix_trees[side] = tree
+        else:
+            other = "prediction" if side == "observation" else "observation"
+            pattern = parse_pattern(given, other, self.config)
+            src, dst = (None, pattern) if side == "observation" else (pattern, None)
+
+            plan = plan_query(src, dst, loaded.config, loaded.stats)
+            keys = self._get_query_dataset(loaded, plan)
+            matched = run_query(keys, src, dst, loaded.config, plan=plan)
+
+            tree = prefix_tree_from_rows(matched.index, level, separator, depth)
+
+        results = tree.top_k(length, k)
+        for item in results:
+            item["pattern"] = separator.join(map(str, item["prefix"]))
+
+        return {
+            "dataset": loaded.name,
+            "side": side,
+            "length": length,
+            "given": given,
+            "total": tree.total,
+            "results": results,
+        }
+
+    def cooccurrence_top_k(
+        self,
+        matrix: str,
+        event_id: int,
+        k: int = 10,
+        dataset: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Top-k sobre las matrices precalculadas (sin escanear el dataset).
+        """
+        matrices = self.datasets.cooccurrence(dataset)
+
+        return {
+            "dataset": self.datasets.resolve(dataset),
+            "matrix": matrix,
+            "event_id": event_id,
+            "results": top_k(matrices, matrix, event_id, k),
+        }
 
-        for meta_file in queries_dir.glob("*.json"):
-            try:
-                with meta_file.open("r", encoding="utf-8") as f:
-                    data = json.load(f)
-
-                entry = QueryEntry.from_dict(data)
-                entries[entry.query_id] = entry
+    def list_queries(self) -> list[dict]:
+        """
+        Desde el registro en memoria (ya cargado del disco al arrancar):
+        no se relee la metadata de cada query en cada petición.
+        """
+        self.registry.wait_ready()
+
+        entries = sorted(self.registry.all().values(), key=lambda e: e.created_at)
+        return [e.to_dict() for e in entries]
+
+    def result_entry(self, query_id: str) -> Optional[QueryEntry]:
+        """
+        Entrada de una query cuyo resultado se va a leer. Si la retención
+        borró sus ficheros se recalcula de forma transparente.
+        """
+        entry = self.registry.get(query_id)
+        if entry is None:
+            return None
+
+        if self._evicted(entry):
+            RETENTION_RECOMPUTES.inc()
+            self._recompute(entry)
+            entry = self.registry.get(query_id)
 
-            except Exception as e:
-                print(f"[WARN] No se pudo cargar {meta_file.name}: {e}")
+        elif self._stale(entry, unknown=False):
+            # Calculada con otra versión del dataset
+            self._recompute(entry)
+            entry = self.registry.get(query_id)
 
-        self.registry.load_from_disk(entries)
+        self.registry.touch(query_id)
+        return entry
+
+    def reload_entry(self, query_id: str) -> Optional[QueryEntry]:
+        """
+        Estado de una query que ejecuta otro worker: su metadata solo se
+        escribe al terminar, así que mientras no exista (o no sea final)
+        vale la entrada del registro. Una final sustituye a la del registro.
+        """
+        path = result_paths(self.config, query_id)["metadata"]
+
+        try:
+            entry = QueryEntry.from_dict(json.loads(path.read_text(encoding="utf-8")))
+        except FileNotFoundError:
+            return self.registry.get(query_id, timeout=0)
+
+        if entry.status in (QueryStatus.PENDING, QueryStatus.RUNNING):
+            return self.registry.get(query_id, timeout=0)
+
+        self.registry.replace_from_disk(entry)
+        return entry
+
+    def needs_recompute(self, query_id: str) -> bool:
+        """
+        True si leer el resultado exige recalcularlo (result_entry será
+        una ejecución completa, no una lectura).
+        """
+        entry = self.registry.get(query_id)
+        return entry is not None and (self._evicted(entry) or self._stale(entry, unknown=False))
+
+    def _evicted(self, entry: QueryEntry) -> bool:
+        missing = entry.status == QueryStatus.DONE and not (
+            entry.output and Path(entry.output).exists()
+        )
+        return entry.status == QueryStatus.EVICTED or missing
+
+    def _stale(self, entry: QueryEntry, unknown: bool = True) -> bool:
+        """
+        Resultado calculado con otra versión del dataset (o anterior al
+        versionado: versión desconocida).
+
+        Si la versión actual no se conoce sin preprocesar el dataset se
+        devuelve `unknown`: las ejecuciones (True) cargan el dataset y lo
+        comprueban; las lecturas (False) sirven lo que hay.
+        """
+        if entry.status != QueryStatus.DONE:
+            return False
+
+        current = self.datasets.version(entry.dataset)
+        if current is None:
+            return unknown
+
+        return entry.dataset_version != current
+
+    def _appended_rows(self, dataset: LoadedDataset, previous: Optional[QueryEntry]) -> Optional[int]:
+        """
+        Si la versión actual solo añade filas a aquella con la que se
+        calculó `previous`, devuelve cuántas filas tenía entonces (las
+        únicas que no hace falta volver a evaluar). None => recálculo
+        completo.
+        """
+        if previous is None or not previous.dataset_version or not previous.dataset_rows:
+            return None
+
+        if not previous.output or not Path(previous.output).exists():
+            return None
+
+        if previous.dataset_rows >= int(dataset.stats.get("rows") or 0):
+            return None
+
+        if dataset.prefix_version(previous.dataset_rows) != previous.dataset_version:
+            return None
+
+        return previous.dataset_rows
+
+    def _recompute(self, entry: QueryEntry) -> None:
+        if entry.combine:
+            self.combine(entry.combine["op"], entry.combine["queries"])
+            return
 
-    def _get_dataset(self):
-        if self._df is None:
-            print("📦 Cargando dataset en memoria...")
-            self._df = load_or_preprocess_dataset(self.config)
-        return self._df
+        time_from = time_to = None
+        time_field = "observation"
+        if entry.time_range:
+            # "observation:<inicio>/<fin>" (lados abiertos vacíos)
+            time_field, bounds = entry.time_range.split(":", 1)
+            time_from, time_to = (b or None for b in bounds.split("/", 1))
+
+        self.run(
+            entry.src_raw,
+            entry.dst_raw,
+            time_from=time_from,
+            time_to=time_to,
+            time_field=time_field,
+            dataset=entry.dataset,
+            view=entry.view,
+        )
+
+
+    def query_id(
+        self,
+        src: Optional[str],
+        dst: Optional[str],
+        time_from: Optional[str] = None,
+        time_to: Optional[str] = None,
+        time_field: str = "observation",
+        dataset: Optional[str] = None,
+        view: Optional[str] = None,
+    ) -> str:
+        """
+        Id que tendrá la ejecución, sin ejecutarla (ValueError si algún
+        patrón no es válido): para lanzarla en segundo plano y devolver
+        ya el canal de progreso.
+        """
+        dataset_name = self.datasets.resolve(dataset)
+        extra_dataset = dataset_name if dataset_name != self.datasets.default else None
 
+        src_pattern = parse_pattern(src, "observation", self.config) if src else None
+        dst_pattern = parse_pattern(dst, "prediction", self.config) if dst else None
+        time_range = parse_time_range(time_from, time_to, time_field)
+        self._check_view(view, src_pattern, dst_pattern)
+
+        return _make_query_id(src_pattern, dst_pattern, time_range, extra_dataset, view)
+
+    def preview(
+        self,
+        src: Optional[str],
+        dst: Optional[str],
+        estimate: bool = False,
+        rows: Optional[int] = None,
+        time_from: Optional[str] = None,
+        time_to: Optional[str] = None,
+        time_field: str = "observation",
+        dataset: Optional[str] = None,
+        view: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Recuento y primeras filas de una consulta sin escribir ni
+        registrar nada.
+
+        - estimate=False -> recuento exacto (evaluación sobre las claves)
+        - estimate=True  -> recuento estimado sobre una muestra, con
+                            intervalo de confianza; las filas devueltas
+                            son las primeras de la muestra
+        """
+
+        preview_cfg = self.config.get("preview", {})
+        n_rows = int(preview_cfg.get("rows", 20) if rows is None else rows)
+
+        dataset_name = self.datasets.resolve(dataset)
+        extra_dataset = dataset_name if dataset_name != self.datasets.default else None
 
-    def list_queries(self) -> list[dict]:
-        queries_dir = Path(self.config["paths"]["output_dir"])
-        results = []
+        src_pattern = parse_pattern(src, "observation", self.config) if src else None
+        dst_pattern = parse_pattern(dst, "prediction", self.config) if dst else None
+        time_range = parse_time_range(time_from, time_to, time_field)
+        self._check_view(view, src_pattern, dst_pattern)
 
-        if not queries_dir.exists():
-            return results
+        query_id = _make_query_id(src_pattern, dst_pattern, time_range, extra_dataset, view)
 
-        for meta_file in sorted(queries_dir.glob("*.json")):
-            try:
-                with meta_file.open("r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    results.append(data)
-            except Exception as e:
-                print(f"[WARN] No se pudo leer {meta_file.name}: {e}")
+        loaded = self._get_dataset(dataset_name)
+        plan = plan_query(
+            src_pattern, dst_pattern, loaded.config, self._view_stats(loaded, view), time_range, view
+        )
 
-        return results
+        keys = self._get_query_dataset(loaded, plan, view)
+        total = len(keys)
 
+        sample_size = int(preview_cfg.get("sample_size", 200_000))
+        sampled = estimate and sample_size < total
 
-    def run(self, src: Optional[str], dst: Optional[str]) -> Dict[str, Any]:
+        if sampled:
+            keys = sample_frame(keys, sample_size, int(preview_cfg.get("seed", 0)))
 
-        src_pattern = parse_pattern(src, "observation", self.config) if src else None
-        dst_pattern = parse_pattern(dst, "prediction", self.config) if dst else None
+        result_df = run_query(
+            keys, src_pattern, dst_pattern, self.config, plan=plan, time_range=time_range
+        )
 
-        query_id = _make_query_id(src_pattern, dst_pattern)
+        if sampled:
+            count = estimate_count(
+                len(result_df), len(keys), total, float(preview_cfg.get("confidence", 0.95))
+            )
+            count["sample_size"] = len(keys)
+            count["sample_hits"] = len(result_df)
+        else:
+            count = None
+
+        # Solo se leen del disco las columnas de las filas mostradas
+        head = self._from_view(result_df.head(n_rows), view)
+        head = self._materialize(head, loaded, plan) if n_rows else head
+
+        return {
+            "query_id": query_id,
+            "rows": count["rows"] if sampled else len(result_df),
+            "output": None,
+            "cached": False,
+            "preview": True,
+            "exact": not sampled,
+            "estimate": count,
+            "data": head,
+            "plan": plan.to_dict(),
+        }
+
+    def run(
+        self,
+        src: Optional[str],
+        dst: Optional[str],
+        explain: bool = False,
+        time_from: Optional[str] = None,
+        time_to: Optional[str] = None,
+        time_field: str = "observation",
+        dataset: Optional[str] = None,
+        profile: Optional[str] = None,
+        view: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        profile: valor de la cabecera X-Profile (fuerza el perfilado y
+        guarda el perfil aunque no se supere el umbral).
+        view: vista agregada (component | percentile) sobre la que se
+        evalúan los patrones.
+
+        El avance (etapas, filas recorridas, bytes escritos) se publica en
+        el canal "query:<query_id>" (GET /query/{query_id}/progress).
+        """
+
+        timer = StageTimer()
+
+        dataset_name = self.datasets.resolve(dataset)
+        extra_dataset = dataset_name if dataset_name != self.datasets.default else None
+
+        with timer.stage("parse"):
+            src_pattern = parse_pattern(src, "observation", self.config) if src else None
+            dst_pattern = parse_pattern(dst, "prediction", self.config) if dst else None
+            time_range = parse_time_range(time_from, time_to, time_field)
+            self._check_view(view, src_pattern, dst_pattern)
+
+        query_id = _make_query_id(src_pattern, dst_pattern, time_range, extra_dataset, view)
         lock = self.locks.acquire(query_id)
 
+        progress = PROGRESS.reporter(f"query:{query_id}")
+
         with lock:
             entry = self.registry.get(query_id)
-            if entry and entry.status == QueryStatus.DONE:
-                return {
+
+            # Con el resultado borrado (retención) no hay caché ni base
+            # para el append incremental: se recalcula entera
+            done = entry is not None and entry.status == QueryStatus.DONE and not self._evicted(entry)
+
+            if done and not self._stale(entry):
+                QUERY_CACHE.inc(result="hit")
+                self.registry.touch(query_id)
+                progress(stage="done", rows=entry.rows, cached=True)
+
+                response = {
                     "query_id": query_id,
                     "rows": entry.rows,
                     "output": entry.output,
                     "cached": True,
                 }
 
+                # Plan sin estadísticas: solo para etiquetar la métrica
+                plan = plan_query(src_pattern, dst_pattern, self.config, time_range=time_range)
+
+                if explain:
+                    # Plan estimado; el resultado real es el ya cacheado
+                    loaded = self._get_dataset(dataset_name)
+                    plan = plan_query(
+                        src_pattern, dst_pattern, loaded.config,
+                        self._view_stats(loaded, view), time_range, view,
+                    )
+                    plan.actual_rows = entry.rows
+                    response["plan"] = plan.to_dict()
+
+                QUERY_DURATION.observe(timer.total(), pattern_class=plan.pattern_class, cached="true")
+                return response
+
+            # Resultado de una versión anterior del dataset: puede bastar
+            # con evaluar las filas añadidas desde entonces
+            previous = entry if done else None
+            QUERY_CACHE.inc(result="stale" if previous else "miss")
+
             entry = self.registry.create(
                 query_id=query_id,
                 src_raw=src,
                 dst_raw=dst,
                 src=src_pattern.canonical if src_pattern else None,
                 dst=dst_pattern.canonical if dst_pattern else None,
+                time_range=time_range.canonical if time_range else None,
+                dataset=dataset_name,
+                view=view,
             )
 
             self.registry.update(query_id, status=QueryStatus.RUNNING)
 
+            # A partir de aquí cada etapa se anuncia en el canal de progreso
+            timer.progress = progress
+
+            plan = None
+
+            profile_cfg = self.config.get("profiling", {})
+            profile_mode = resolve_profile_mode(self.config, profile)
+            profiler = (
+                QueryProfiler(profile_mode, float(profile_cfg.get("interval_ms", 5)))
+                if profile_mode else None
+            )
+
             try:
-                df = self._get_dataset()
+                # Dentro del try: si el perfilador no arranca la query queda en error
+                with profiler or nullcontext():
+                    with timer.stage("load_dataset"):
+                        loaded = self._get_dataset(dataset_name)
+
+                    with timer.stage("plan"):
+                        plan = plan_query(
+                            src_pattern, dst_pattern, loaded.config,
+                            self._view_stats(loaded, view), time_range, view,
+                        )
+
+                    with timer.stage("load_partitions"):
+                        df = self._get_query_dataset(loaded, plan, view)
+
+                        base_rows = self._appended_rows(loaded, previous)
+                        if base_rows:
+                            df = df[df[ROW_ID_COLUMN].to_numpy() >= base_rows]
+                            progress(incremental_from=base_rows)
+
+                    with timer.stage("match"):
+                        result_df = run_query(
+                            df,
+                            src_pattern,
+                            dst_pattern,
+                            self.config,
+                            plan=plan,
+                            time_range=time_range,
+                            progress=progress,
+                        )
+
+                    with timer.stage("materialize"):
+                        result_df = self._from_view(result_df, view)
+                        result_df = self._materialize(result_df, loaded, plan)
+
+                        if base_rows:
+                            result_df = _append_result(previous.output, result_df)
+
+                    with timer.stage("save_results"):
+                        paths = save_results(
+                            result_df,
+                            src_pattern,
+                            dst_pattern,
+                            self.config,
+                            time_range=time_range,
+                            dataset=extra_dataset,
+                            view=view,
+                            query_id=query_id,
+                            progress=progress,
+                        )
+
+                    QUERY_BYTES.observe(sum(p.stat().st_size for p in paths))
+                    QUERY_ROWS.observe(len(result_df), pattern_class=plan.pattern_class)
+
+                    parquet_path = paths[0]   # el parquet es el output principal
+
+                    self.registry.update(
+                        query_id,
+                        status=QueryStatus.DONE,
+                        rows=len(result_df),
+                        output=str(parquet_path),
+                        manifest=file_manifest(paths),
+                        dataset_version=loaded.version,
+                        dataset_rows=loaded.stats.get("rows"),
+                    )
+
+                    if base_rows:
+                        QUERY_CACHE.inc(result="incremental")
+
 
-                result_df = run_query(
-                    df,
-                    src_pattern,
-                    dst_pattern,
-                    self.config,
+            except Exception as e:
+                self.registry.update(
+                    query_id,
+                    status=QueryStatus.ERROR,
+                    error=str(e),
                 )
 
-                paths = save_results(
-                    result_df,
-                    src_pattern,
-                    dst_pattern,
-                    self.config,
+            final_entry = self.registry.get(query_id)
+
+            # La escritura de la metadata no puede medirse a sí misma: el
+            # JSON guarda el total hasta justo antes de escribirlo
+            timer.record("total", timer.total())
+
+            # Solo se guardan los perfiles de consultas lentas (o pedidos
+            # explícitamente con la cabecera)
+            slow = timer.timings["total"] >= float(profile_cfg.get("threshold_ms", 1000))
+            if profiler is not None and profiler.started and (profile or slow):
+                base = (
+                    Path(final_entry.output) if final_entry.output
+                    else Path(self.config["paths"]["output_dir"]) / query_id
                 )
+                with timer.stage("save_profile"):
+                    profile_path = profiler.save(base)
+                self.registry.update(query_id, profile=str(profile_path))
+
+            self.registry.update(query_id, timings=timer.timings)
+
+            with timer.stage("write_metadata"):
+                _write_query_metadata(final_entry, self.config)
+
+            QUERY_STATUS.inc(status=final_entry.status.value)
+            QUERY_DURATION.observe(
+                timer.total(),
+                pattern_class=plan.pattern_class if plan else "error",
+                cached="false",
+            )
+
+            if final_entry.status == QueryStatus.ERROR:
+                progress(stage="error", error=final_entry.error)
+                raise RuntimeError(final_entry.error)
+
+            progress(stage="done", rows=final_entry.rows, cached=False)
+
+            response = {
+                "query_id": query_id,
+                "rows": final_entry.rows,
+                "output": final_entry.output,
+                "cached": False,
+            }
+
+            if explain and plan is not None:
+                response["plan"] = plan.to_dict()
+                response["timings"] = timer.timings
+
+            return response
+
+    def combine(self, op: str, query_ids: list[str]) -> Dict[str, Any]:
+        """
+        Operación de conjuntos entre resultados guardados, sobre sus row_id.
+
+        - overlap -> solo recuentos (nada se escribe ni se registra)
+        - resto   -> las filas resultantes se leen del dataset procesado y
+                     se registran como una query nueva (con su metadata y
+                     su entrada de caché: repetirla no recalcula nada)
+        """
+
+        timer = StageTimer()
+
+        entries = {qid: self._combine_input(qid) for qid in query_ids}
+
+        datasets = {e.dataset or self.datasets.default for e in entries.values()}
+        if len(datasets) > 1:
+            raise ValueError("Las queries deben ser del mismo dataset")
+        dataset_name = datasets.pop()
+
+        # Identidad canónica: en las conmutativas el orden no importa
+        if op in COMMUTATIVE:
+            query_ids = sorted(entries)
+
+        with timer.stage("load_row_ids"):
+            row_ids = [self._combine_row_ids(entries, qid) for qid in query_ids]
+
+        if op == "overlap":
+            return {"op": op, "queries": query_ids, **overlap_counts(query_ids, row_ids)}
+
+        query_id = hashlib.sha1(
+            f"combine={op}|queries={','.join(query_ids)}".encode()
+        ).hexdigest()[:12]
+
+        progress = PROGRESS.reporter(f"query:{query_id}")
+
+        with self.locks.acquire(query_id):
+            entry = self.registry.get(query_id)
+
+            # Con el resultado borrado (retención) no hay caché
+            if (
+                entry is not None
+                and entry.status == QueryStatus.DONE
+                and not self._evicted(entry)
+                and not self._stale(entry)
+            ):
+                QUERY_CACHE.inc(result="hit")
+                progress(stage="done", rows=entry.rows, cached=True)
+                return {
+                    "query_id": query_id,
+                    "rows": entry.rows,
+                    "output": entry.output,
+                    "cached": True,
+                }
 
-                parquet_path = paths[0]   # el parquet es el output principal
+            QUERY_CACHE.inc(result="miss")
+
+            self.registry.create(
+                query_id=query_id,
+                src_raw=None,
+                dst_raw=None,
+                src=None,
+                dst=None,
+                dataset=dataset_name,
+                combine={"op": op, "queries": query_ids},
+            )
+            self.registry.update(query_id, status=QueryStatus.RUNNING)
+            timer.progress = progress
+
+            try:
+                with timer.stage("combine"):
+                    combined = combine_row_ids(op, row_ids)
+
+                with timer.stage("materialize"):
+                    loaded = self._get_dataset(dataset_name)
+                    if partitioning_enabled(loaded.config):
+                        result_df = fetch_partition_rows(loaded.config, combined)
+                    else:
+                        result_df = fetch_rows(loaded.config, combined)
+
+                with timer.stage("save_results"):
+                    paths = save_results(
+                        result_df,
+                        None,
+                        None,
+                        self.config,
+                        query_id=query_id,
+                        progress=progress,
+                    )
+
+                QUERY_ROWS.observe(len(result_df), pattern_class=f"combine:{op}")
 
                 self.registry.update(
                     query_id,
                     status=QueryStatus.DONE,
                     rows=len(result_df),
-                    output=str(parquet_path),
+                    output=str(paths[0]),
+                    manifest=file_manifest(paths),
+                    dataset_version=loaded.version,
+                    dataset_rows=loaded.stats.get("rows"),
                 )
 
-
             except Exception as e:
-                self.registry.update(
-                    query_id,
-                    status=QueryStatus.ERROR,
-                    error=str(e),
-                )
+                self.registry.update(query_id, status=QueryStatus.ERROR, error=str(e))
 
             final_entry = self.registry.get(query_id)
-            _write_query_metadata(final_entry)
+
+            timer.record("total", timer.total())
+            self.registry.update(query_id, timings=timer.timings)
+            _write_query_metadata(final_entry, self.config)
+
+            QUERY_STATUS.inc(status=final_entry.status.value)
+            QUERY_DURATION.observe(timer.total(), pattern_class=f"combine:{op}", cached="false")
 
             if final_entry.status == QueryStatus.ERROR:
+                progress(stage="error", error=final_entry.error)
                 raise RuntimeError(final_entry.error)
 
+            progress(stage="done", rows=final_entry.rows, cached=False)
+
             return {
                 "query_id": query_id,
                 "rows": final_entry.rows,
                 "output": final_entry.output,
                 "cached": False,
             }
+
+    def _combine_input(self, query_id: str) -> QueryEntry:
+        # Expulsada por retención o de otra versión del dataset => se recalcula
+        entry = self.result_entry(query_id)
+
+        if entry is None:
+            raise KeyError(f"Query no encontrada: {query_id}")
+
+        if entry.status != QueryStatus.DONE or not entry.output or not Path(entry.output).exists():
+            raise ValueError(f"Query sin resultado: {query_id}")
+
+        return entry
+
+    def _combine_row_ids(self, entries: Dict[str, QueryEntry], query_id: str):
+        # La retención puede borrarlo tras resolverlo: se recalcula una vez
+        try:
+            return result_row_ids(Path(entries[query_id].output))
+        except FileNotFoundError:
+            entries[query_id] = self._combine_input(query_id)
+            return result_row_ids(Path(entries[query_id].output))
@@ -0,0 +1,270 @@
+# services/retention.py
+
+import time
+from datetime import datetime
+from pathlib import Path
+from threading import Event, Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from state.locks import QueryLockManager
+from state.metrics import RETENTION_BYTES, RETENTION_EVICTIONS, RETENTION_SWEEP
+from state.registry import QueryEntry, QueryRegistry, QueryStatus
+
+
+# -------------------------------------------------------------------------
+# Gestor de retención de resultados
+# -------------------------------------------------------------------------
+
+class RetentionManager:
+    """
+    Barrido periódico de los directorios de resultados:
+
+      1. TTL: las queries en error o que nunca terminaron (p. ej. el
+         proceso murió a mitad) se olvidan pasado su TTL.
+      2. Cuotas: si un directorio supera la suya se borran los ficheros
+         de los resultados menos usados (LRU por last_access).
+
+    Las queries expulsadas por cuota siguen en el registro con
+    status=evicted (y su metadata en disco) y se recalculan al pedirlas.
+    """
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        registry: QueryRegistry,
+        locks: QueryLockManager,
+        write_metadata: Callable[[QueryEntry], None],
+    ):
+        cfg = config.get("retention", {})
+
+        self.enabled = bool(cfg.get("enabled", False))
+        self.interval_s = float(cfg.get("interval_s", 300))
+        self.error_ttl_s = cfg.get("error_ttl_s")
+        self.stale_ttl_s = cfg.get("stale_ttl_s")
+
+        self.output_dir = Path(config["paths"]["output_dir"])
+        self.output_dir_csv = Path(config["paths"]["output_dir_csv"])
+
+        # quotas_mb: {output_dir: 2048, output_dir_csv: 1024} (claves de paths)
+        self.quotas: Dict[Path, int] = {
+            Path(config["paths"][key]): int(mb * 1024 * 1024)
+            for key, mb in (cfg.get("quotas_mb") or {}).items()
+            if mb
+        }
+
+        self.registry = registry
+        self.locks = locks
+        self.write_metadata = write_metadata
+
+        self._sizes: Dict[Path, int] = {}
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+        RETENTION_BYTES.callback = lambda: {(str(d),): n for d, n in self._sizes.items()}
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+
+        self._thread = Thread(target=self._loop, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _loop(self) -> None:
+        # Sin el registro completo no se sabe a quién pertenece cada fichero
+        self.registry.wait_ready(None)
+
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"[WARN] Barrido de retención fallido: {e}")
+
+            self._stop.wait(self.interval_s)
+
+    # ------------------------------------------------------------------
+    # Barrido
+    # ------------------------------------------------------------------
+
+    def sweep(self) -> Dict[str, int]:
+        t0 = time.perf_counter()
+        now = datetime.utcnow()
+        report = {"expired": 0, "evicted": 0, "freed_bytes": 0}
+
+        # 1️⃣ Persistir los accesos (last_access) desde el último barrido
+        for query_id in self.registry.drain_touched():
+            entry = self.registry.get(query_id, timeout=0)
+            if entry is not None:
+                self.write_metadata(entry)
+
+        # 2️⃣ TTL de queries en error o sin terminar
+        for listed in self.registry.all().values():
+            if self._expired(listed, now) is None or not self.locks.try_acquire(listed.query_id):
+                continue
+
+            try:
+                # Puede haberse relanzado entre el listado y el lock
+                entry = self._current(listed)
+                reason = self._expired(entry, now) if entry is not None else None
+                if reason is None:
+                    continue
+                freed = self._delete_files(entry, metadata=True)
+                self.registry.remove(entry.query_id)
+            finally:
+                self.locks.release(listed.query_id)
+
+            report["expired"] += 1
+            report["freed_bytes"] += sum(freed.values())
+            RETENTION_EVICTIONS.inc(reason=reason)
+
+        # 3️⃣ Cuotas por directorio (LRU)
+        for directory, quota in self.quotas.items():
+            used = _directory_size(directory)
+
+            for listed, last_access in self._lru(directory):
+                if used <= quota:
+                    break
+
+                # Borrado + EVICTED bajo el lock de la query: ningún
+                # cálculo (ni append incremental) puede empezar entre medias
+                if not self.locks.try_acquire(listed.query_id):
+                    continue
+
+                try:
+                    # Relanzada o leída desde el listado: ya no es la
+                    # menos usada
+                    entry = self._current(listed)
+                    if (
+                        entry is None
+                        or entry.status != QueryStatus.DONE
+                        or entry.last_access != last_access
+                    ):
+                        continue
+                    freed = self._evict(entry)
+                finally:
+                    self.locks.release(listed.query_id)
+
+                used -= freed.get(directory, 0)
+
+                report["evicted"] += 1
+                report["freed_bytes"] += sum(freed.values())
+
+        self._sizes = {d: _directory_size(d) for d in (self.output_dir, self.output_dir_csv)}
+        RETENTION_SWEEP.observe(time.perf_counter() - t0)
+
+        return report
+
+    def _expired(self, entry: QueryEntry, now: datetime) -> Optional[str]:
+        age = _age_s(entry.updated_at or entry.created_at, now)
+        if age is None:
+            return None
+
+        if entry.status == QueryStatus.ERROR and self.error_ttl_s is not None:
+            return "error_ttl" if age > float(self.error_ttl_s) else None
+
+        if entry.status in (QueryStatus.PENDING, QueryStatus.RUNNING) and self.stale_ttl_s is not None:
+            return "stale_ttl" if age > float(self.stale_ttl_s) else None
+
+        return None
+
+    def _current(self, listed: QueryEntry) -> Optional[QueryEntry]:
+        """
+        La entrada vigente de la query si sigue siendo la listada (None si
+        se eliminó o se relanzó: registry.create la reemplaza).
+        """
+        entry = self.registry.get(listed.query_id, timeout=0)
+        return entry if entry is listed else None
+
+    def _lru(self, directory: Path) -> List[Tuple[QueryEntry, Optional[str]]]:
+        """
+        Resultados con ficheros en `directory`, del menos al más usado,
+        con su last_access al listarlos.
+        """
+        candidates = [
+            (entry, entry.last_access) for entry in self.registry.all().values()
+            if entry.status == QueryStatus.DONE
+            and any(path.parent == directory for path in self._files(entry))
+        ]
+
+        return sorted(
+            candidates,
+            key=lambda c: c[1] or c[0].updated_at or c[0].created_at,
+        )
+
+    def _evict(self, entry: QueryEntry) -> Dict[Path, int]:
+        freed = self._delete_files(entry, metadata=False)
+
+        self.registry.update(entry.query_id, status=QueryStatus.EVICTED, profile=None, manifest=None)
+        self.write_metadata(entry)
+
+        RETENTION_EVICTIONS.inc(reason="quota")
+        return freed
+
+    # ------------------------------------------------------------------
+    # Ficheros de una query
+    # ------------------------------------------------------------------
+
+    def _files(self, entry: QueryEntry) -> List[Path]:
+        if entry.manifest:
+            files = [Path(f["path"]) for f in entry.manifest.values()]
+        elif entry.output:
+            parquet = Path(entry.output)
+            files = [parquet, self.output_dir_csv / f"{parquet.stem}.csv"]
+        else:
+            files = []
+
+        if entry.profile:
+            files.append(Path(entry.profile))
+
+        return files
+
+    def _delete_files(self, entry: QueryEntry, metadata: bool) -> Dict[Path, int]:
+        """
+        Borra los ficheros de la query (y su metadata si metadata=True).
+        Devuelve los bytes liberados por directorio.
+        """
+        files = self._files(entry)
+
+        if metadata:
+            files.append(self.output_dir / f"{entry.query_id}.json")
+            if entry.output:
+                # Metadata de resultados antiguos (nombrados por patrón)
+                files.append(Path(entry.output).with_suffix(".json"))
+
+        freed: Dict[Path, int] = {}
+
+        for path in files:
+            try:
+                size = path.stat().st_size
+                path.unlink()
+            except FileNotFoundError:
+                continue
+
+            freed[path.parent] = freed.get(path.parent, 0) + size
+
+        return freed
+
+
+# -------------------------------------------------------------------------
+# Helpers
+# -------------------------------------------------------------------------
+
+def _directory_size(directory: Path) -> int:
+    if not directory.exists():
+        return 0
+    return sum(p.stat().st_size for p in directory.iterdir() if p.is_file())
+
+
+def _age_s(timestamp: Optional[str], now: datetime) -> Optional[float]:
+    if not timestamp:
+        return None
+    try:
+        return (now - datetime.fromisoformat(timestamp)).total_seconds()
+    except ValueError:
+        return None
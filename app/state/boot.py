@@ -0,0 +1,47 @@
+# state/boot.py
+
+import time
+from threading import Lock
+from typing import Any, Dict
+
+
+# -------------------------------------------------------------------------
+# Tiempos de arranque del worker
+# -------------------------------------------------------------------------
+
+class BootTimer:
+    """
+    Hitos del arranque (ms desde que se importó este módulo, que es lo
+    primero que hace main.py): app_ready, config_loaded, service_ready,
+    registry_loaded, dataset_ready...
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.phases: Dict[str, float] = {}
+        self.info: Dict[str, Any] = {}
+        self._lock = Lock()
+
+    def mark(self, phase: str, **info) -> float:
+        elapsed = round((time.perf_counter() - self.started) * 1000, 3)
+
+        with self._lock:
+            self.phases.setdefault(phase, elapsed)
+            self.info.update(info)
+
+        return elapsed
+
+    def done(self, phase: str) -> bool:
+        return phase in self.phases
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "phases_ms": dict(self.phases),
+                **self.info,
+            }
+
+
+BOOT = BootTimer()
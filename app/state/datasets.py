@@ -0,0 +1,380 @@
+# state/datasets.py
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core._1_config_loader import (
+    config_for_dataset,
+    dataset_names,
+    default_dataset_name,
+)
+from core._2_preprocessor import (
+    compute_dataset_stats,
+    dataset_fingerprint,
+    dataset_source,
+    load_dataset_stats,
+    load_or_preprocess_dataset,
+    resident_columns,
+    row_hashes,
+    stored_dataset_version,
+    view_frame,
+)
+from core._8_partitioned_dataset import (
+    ensure_partitioned_dataset,
+    partitioning_enabled,
+)
+from core._9_cooccurrence import (
+    cooccurrence_current,
+    ensure_cooccurrence,
+    load_cooccurrence,
+)
+from state.progress import PROGRESS
+from state.shared_dataset import attach_dataset
+
+
+# -------------------------------------------------------------------------
+# Dataset cargado en memoria
+# -------------------------------------------------------------------------
+
+@dataclass
+class LoadedDataset:
+    """
+    Un dataset servible: su config (rutas propias), sus estadísticas y,
+    si no está particionado, el DataFrame residente.
+    """
+
+    name: str
+    config: Dict[str, Any]
+    stats: Dict[str, Any]
+    df: Optional[pd.DataFrame] = None
+    cooccurrence: Optional[Dict[str, Any]] = None
+    prefix_trees: Dict[str, Any] = field(default_factory=dict)
+    # Árboles de la versión anterior (recarga): se reutilizan si esta
+    # solo añade filas al final
+    inherited_prefix_trees: Dict[str, Any] = field(default_factory=dict)
+    # Vistas agregadas ya indexadas: {vista: {"frame": df, "stats": {...}}}
+    views: Dict[str, Any] = field(default_factory=dict)
+    # Hash por fila (solo residentes, se calcula al comprobar un append)
+    row_hashes: Optional[np.ndarray] = None
+    # DataFrame adjuntado de la memoria compartida del proceso maestro
+    shared: bool = False
+    memory_bytes: int = 0
+    loaded_at: float = 0.0
+    last_used: float = 0.0
+
+    @property
+    def version(self) -> Optional[str]:
+        return (self.stats.get("version") or {}).get("fingerprint")
+
+    def prefix_version(self, rows: int) -> Optional[str]:
+        """
+        Huella de las `rows` primeras filas (None si no es residente).
+        """
+        if self.df is None or rows > len(self.df):
+            return None
+
+        if self.row_hashes is None:
+            self.row_hashes = row_hashes(self.df, self.config)
+            self.memory_bytes += int(self.row_hashes.nbytes)
+
+        return dataset_fingerprint(self.row_hashes, rows)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "loaded": True,
+            "partitioned": partitioning_enabled(self.config),
+            "rows": self.stats.get("rows"),
+            "version": self.version,
+            "shared": self.shared,
+            "memory_bytes": self.memory_bytes,
+            "loaded_at": self.loaded_at,
+            "last_used": self.last_used,
+        }
+
+
+# -------------------------------------------------------------------------
+# Registro de datasets (LRU con presupuesto de memoria)
+# -------------------------------------------------------------------------
+
+class DatasetRegistry:
+    """
+    Carga datasets bajo demanda por nombre y descarga los menos usados
+    cuando la memoria total supera el presupuesto configurado.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.default = default_dataset_name(config)
+
+        budget_mb = config.get("datasets", {}).get("memory_budget_mb")
+        self.budget_bytes = int(budget_mb * 1024 * 1024) if budget_mb else None
+
+        self._loaded: "OrderedDict[str, LoadedDataset]" = OrderedDict()
+        self._lock = Lock()
+        self._load_locks: Dict[str, Lock] = {name: Lock() for name in self.names()}
+        # Versión de los no cargados: {nombre: (dataset_source, versión)}
+        self._versions: Dict[str, Tuple[Optional[Dict[str, int]], str]] = {}
+        self._view_locks: Dict[Tuple[str, str], Lock] = {}
+
+    # ------------------------------------------------------------------
+    # Accesores
+    # ------------------------------------------------------------------
+
+    def names(self) -> List[str]:
+        return dataset_names(self.config)
+
+    def resolve(self, name: Optional[str]) -> str:
+        name = name or self.default
+        if name not in self.names():
+            raise KeyError(f"Dataset desconocido: {name}")
+        return name
+
+    def get(self, name: Optional[str] = None) -> LoadedDataset:
+        """
+        Devuelve el dataset (cargándolo si hace falta) y lo marca como
+        el más recientemente usado.
+        """
+        name = self.resolve(name)
+
+        previous = None
+
+        with self._lock:
+            dataset = self._loaded.get(name)
+            if dataset is not None and self._changed(dataset):
+                # El procesado se ha reemplazado en disco: nueva versión
+                print(f"♻️ Dataset '{name}' modificado en disco, recargando")
+                previous = self._loaded.pop(name)
+                dataset = None
+            if dataset is not None:
+                self._loaded.move_to_end(name)
+                dataset.last_used = time.time()
+                return dataset
+
+        # Carga fuera del lock global: otros datasets siguen disponibles
+        with self._load_locks[name]:
+            with self._lock:
+                dataset = self._loaded.get(name)
+            if dataset is None:
+                dataset = self._load(name)
+
+                if previous is not None and dataset.df is not None:
+                    dataset.inherited_prefix_trees.update(previous.inherited_prefix_trees)
+                    dataset.inherited_prefix_trees.update(previous.prefix_trees)
+
+        with self._lock:
+            self._loaded[name] = dataset
+            self._loaded.move_to_end(name)
+            self._evict(keep=name)
+
+        return dataset
+
+    def version(self, name: Optional[str] = None) -> Optional[str]:
+        """
+        Versión actual del dataset sin cargarlo ni preprocesarlo: la del
+        cargado o la de su fichero de estadísticas, cacheada mientras la
+        firma del procesado (tamaño + mtime) no cambie. None si no se
+        conoce sin calcularla (sin estadísticas o desfasadas).
+        """
+        name = self.resolve(name)
+        config = config_for_dataset(self.config, name)
+        source = dataset_source(config)
+
+        with self._lock:
+            dataset = self._loaded.get(name)
+            cached = self._versions.get(name)
+
+        if dataset is not None and dataset.stats.get("source") == source:
+            return dataset.version
+
+        if cached is not None and cached[0] == source:
+            return cached[1]
+
+        version = stored_dataset_version(config, source)
+
+        if version is not None:
+            with self._lock:
+                self._versions[name] = (source, version)
+
+        return version
+
+    def cooccurrence(self, name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Matrices de co-ocurrencia/transición del dataset (se leen del
+        .npz la primera vez que se piden). Un dataset recargado es un
+        LoadedDataset nuevo: nunca hereda las de la versión anterior.
+        """
+        dataset = self.get(name)
+
+        if dataset.cooccurrence is None:
+            if not cooccurrence_current(dataset.config):
+                # Adjuntado de memoria compartida con un .npz de otra versión
+                df = dataset.df
+                if df is None:
+                    df = load_or_preprocess_dataset(dataset.config, columns=[])
+                ensure_cooccurrence(dataset.config, df)
+
+            dataset.cooccurrence = load_cooccurrence(dataset.config)
+            dataset.memory_bytes += sum(
+                int(getattr(v, "nbytes", 0)) for v in dataset.cooccurrence.values()
+            )
+
+        return dataset.cooccurrence
+
+    def view(self, dataset: LoadedDataset, view: str) -> Dict[str, Any]:
+        """
+        Índice de una vista (y sus estadísticas) sobre el dataset residente.
+        Se construye una sola vez (lock por dataset y vista: las consultas
+        concurrentes esperan a la primera) y su memoria cuenta para el
+        presupuesto, que puede descargar otros datasets.
+        """
+        cached = dataset.views.get(view)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            lock = self._view_locks.setdefault((dataset.name, view), Lock())
+
+        with lock:
+            cached = dataset.views.get(view)
+            if cached is not None:
+                return cached
+
+            frame = view_frame(dataset.df, dataset.config, view)
+            cached = {
+                "frame": frame,
+                "stats": compute_dataset_stats(frame, dataset.config),
+            }
+
+            with self._lock:
+                dataset.views[view] = cached
+                dataset.memory_bytes += _frame_memory(frame)
+                if self._loaded.get(dataset.name) is dataset:
+                    self._evict(keep=dataset.name)
+
+        return cached
+
+    def describe(self) -> List[dict]:
+        with self._lock:
+            loaded = dict(self._loaded)
+
+        return [
+            loaded[name].to_dict() if name in loaded else {"name": name, "loaded": False}
+            for name in self.names()
+        ]
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return sum(d.memory_bytes for d in self._loaded.values())
+
+    def unload(self, name: str) -> None:
+        with self._lock:
+            self._loaded.pop(name, None)
+
+    # ------------------------------------------------------------------
+    # Carga / descarga
+    # ------------------------------------------------------------------
+
+    def _load(self, name: str) -> LoadedDataset:
+        """
+        Carga el dataset publicando cada etapa en el canal "dataset:<name>"
+        (GET /datasets/{name}/progress): termina en done (filas, memoria)
+        o en error.
+        """
+        progress = PROGRESS.reporter(f"dataset:{name}")
+
+        try:
+            dataset = self._load_dataset(name, progress)
+        except Exception as e:
+            progress(stage="error", error=str(e))
+            raise
+
+        progress(stage="done", **dataset.to_dict())
+        return dataset
+
+    def _load_dataset(self, name: str, progress) -> LoadedDataset:
+        config = config_for_dataset(self.config, name)
+        now = time.time()
+
+        if partitioning_enabled(config):
+            # Particionado: cada consulta lee sus particiones, nada residente
+            progress(stage="partition")
+            ensure_partitioned_dataset(config)
+
+            if not cooccurrence_current(config):
+                progress(stage="cooccurrence")
+                ensure_cooccurrence(config, load_or_preprocess_dataset(config, columns=[]))
+
+            return LoadedDataset(
+                name=name,
+                config=config,
+                stats=load_dataset_stats(config),
+                loaded_at=now,
+                last_used=now,
+            )
+
+        # Publicado por el proceso maestro (gunicorn.conf.py): se adjunta
+        # en solo lectura, sin copia propia de las columnas
+        progress(stage="attach")
+        df = attach_dataset(config, name)
+        shared = df is not None
+
+        if shared:
+            print(f"🔗 Dataset '{name}' adjuntado de memoria compartida")
+        else:
+            print(f"📦 Cargando dataset '{name}' en memoria...")
+            processed = Path(config["paths"]["dataset_processed"]).exists()
+            progress(stage="load" if processed else "preprocess")
+            df = load_or_preprocess_dataset(config, columns=resident_columns(config))
+
+            progress(stage="cooccurrence", rows=len(df))
+            ensure_cooccurrence(config, df)
+
+        progress(stage="stats", rows=len(df))
+
+        return LoadedDataset(
+            name=name,
+            config=config,
+            stats=load_dataset_stats(config, df),
+            df=df,
+            shared=shared,
+            memory_bytes=_frame_memory(df),
+            loaded_at=now,
+            last_used=now,
+        )
+
+    def _changed(self, dataset: LoadedDataset) -> bool:
+        return dataset.stats.get("source") != dataset_source(dataset.config)
+
+    def _evict(self, keep: str) -> None:
+        """
+        Descarta datasets LRU hasta cumplir el presupuesto. El recién
+        usado (`keep`) nunca se descarta aunque por sí solo lo supere.
+        """
+        if self.budget_bytes is None:
+            return
+
+        total = sum(d.memory_bytes for d in self._loaded.values())
+
+        for name in list(self._loaded):
+            if total <= self.budget_bytes:
+                break
+            if name == keep:
+                continue
+
+            total -= self._loaded.pop(name).memory_bytes
+            print(f"🧹 Dataset '{name}' descargado (presupuesto de memoria)")
+
+
+def _frame_memory(df: pd.DataFrame) -> int:
+    """
+    Memoria del DataFrame incluyendo claves (levels + codes) del índice.
+    """
+    return int(df.memory_usage(index=True, deep=True).sum())
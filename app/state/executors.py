@@ -0,0 +1,161 @@
+# state/executors.py
+
+import asyncio
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Dict
+
+from state.metrics import EXECUTOR_INFLIGHT, EXECUTOR_REJECTED, EXECUTOR_WAIT
+
+
+# Pools por defecto (sobrescribibles en config.executors):
+#   interactive -> paginación, metadata, diccionario... (rápido, muchos)
+#   heavy       -> ejecución de consultas, combinaciones, árboles (lento, pocos)
+DEFAULT_POOLS = {
+    "interactive": {"workers": 8, "queue": 64},
+    "heavy": {"workers": 2, "queue": 8},
+}
+
+
+class ExecutorBusy(Exception):
+    """
+    El pool está lleno (ejecutando + en cola): la petición se rechaza
+    (429) en lugar de esperar indefinidamente.
+    """
+
+    def __init__(self, pool: str, retry_after_s: float):
+        super().__init__(f"Servidor ocupado ({pool}), reintentar más tarde")
+        self.pool = pool
+        self.retry_after_s = retry_after_s
+
+
+# -------------------------------------------------------------------------
+# Pool acotado con control de admisión
+# -------------------------------------------------------------------------
+
+class BoundedExecutor:
+    """
+    ThreadPoolExecutor con un límite de trabajos admitidos (workers en
+    ejecución + queue esperando). Los handlers async le pasan el trabajo
+    bloqueante (pandas, parquet, serialización) y el event loop queda
+    libre para /health y el resto de peticiones.
+    """
+
+    def __init__(self, name: str, workers: int, queue: int, retry_after_s: float = 5.0):
+        self.name = name
+        self.workers = max(int(workers), 1)
+        self.limit = self.workers + max(int(queue), 0)
+        self.retry_after_s = retry_after_s
+
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=name)
+        self._inflight = 0
+        self._lock = Lock()
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    async def run(self, fn: Callable[..., Any], *args, admit: bool = True, **kwargs) -> Any:
+        """
+        Ejecuta fn en el pool y espera su resultado.
+
+        admit=False: continuación de una petición ya admitida (lotes de
+        un streaming): se encola siempre, nunca se rechaza.
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, admit=admit, **kwargs))
+
+    def submit(self, fn: Callable[..., Any], *args, admit: bool = True, **kwargs) -> Future:
+        """
+        Admite (o rechaza con ExecutorBusy) y encola fn sin esperarla:
+        trabajos en segundo plano cuyo avance se sigue por otro canal.
+        """
+
+        with self._lock:
+            if admit and self._inflight >= self.limit:
+                EXECUTOR_REJECTED.inc(pool=self.name)
+                raise ExecutorBusy(self.name, self.retry_after_s)
+            self._inflight += 1
+
+        queued = time.perf_counter()
+
+        def task():
+            EXECUTOR_WAIT.observe(time.perf_counter() - queued, pool=self.name)
+            return fn(*args, **kwargs)
+
+        future = self._pool.submit(task)
+        # El hueco se libera cuando termina el trabajo, no cuando deja de
+        # esperarlo el handler (cliente desconectado): el hilo sigue ocupado
+        future.add_done_callback(self._release)
+
+        return future
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._inflight -= 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"workers": self.workers, "limit": self.limit, "inflight": self._inflight}
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False)
+
+
+# -------------------------------------------------------------------------
+# Pools de la aplicación
+# -------------------------------------------------------------------------
+
+class ExecutorRegistry:
+
+    def __init__(self):
+        self._config: Dict[str, Any] = {}
+        self._pools: Dict[str, BoundedExecutor] = {}
+        self._lock = Lock()
+
+        EXECUTOR_INFLIGHT.callback = lambda: {
+            (name,): pool.inflight for name, pool in self._pools.items()
+        }
+
+    def configure(self, config: Dict[str, Any]) -> None:
+        """
+        Lee config.executors. Debe llamarse antes del primer uso (los
+        pools ya creados no cambian de tamaño).
+        """
+        self._config = config.get("executors", {}) or {}
+
+    def get(self, name: str) -> BoundedExecutor:
+        pool = self._pools.get(name)
+        if pool is not None:
+            return pool
+
+        with self._lock:
+            if name not in self._pools:
+                cfg = {**DEFAULT_POOLS.get(name, {}), **(self._config.get(name) or {})}
+                self._pools[name] = BoundedExecutor(
+                    name,
+                    workers=cfg.get("workers", 4),
+                    queue=cfg.get("queue", 16),
+                    retry_after_s=float(self._config.get("retry_after_s", 5)),
+                )
+            return self._pools[name]
+
+    @property
+    def interactive(self) -> BoundedExecutor:
+        return self.get("interactive")
+
+    @property
+    def heavy(self) -> BoundedExecutor:
+        return self.get("heavy")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: pool.to_dict() for name, pool in self._pools.items()}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pools, self._pools = self._pools, {}
+
+        for pool in pools.values():
+            pool.shutdown()
+
+
+EXECUTORS = ExecutorRegistry()
@@ -13,6 +13,19 @@ class QueryLockManager:
         self._locks: Dict[str, Lock] = {}
 
     def acquire(self, query_id: str) -> Lock:
-        if query_id not in self._locks:
-            self._locks[query_id] = Lock()
-        return self._locks[query_id]
+        # setdefault es atómico: dos hilos nunca obtienen locks distintos
+        return self._locks.setdefault(query_id, Lock())
+
+    def try_acquire(self, query_id: str) -> bool:
+        """
+        Toma el lock de la query sin esperar (False si está ocupada).
+        Quien lo obtiene debe liberarlo con release().
+        """
+        return self.acquire(query_id).acquire(blocking=False)
+
+    def release(self, query_id: str) -> None:
+        self._locks[query_id].release()
+
+    def is_locked(self, query_id: str) -> bool:
+        lock = self._locks.get(query_id)
+        return lock is not None and lock.locked()
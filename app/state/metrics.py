@@ -0,0 +1,309 @@
+# state/metrics.py
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from state.boot import BOOT
+
+
+# -------------------------------------------------------------------------
+# Buckets por defecto
+# -------------------------------------------------------------------------
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ROWS_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+
+
+# -------------------------------------------------------------------------
+# Tipos de métrica
+# -------------------------------------------------------------------------
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def _fmt(self, key: Tuple[str, ...], extra: Optional[Dict[str, str]] = None) -> str:
+        pairs = list(zip(self.labels, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self._samples()
+
+    def _samples(self) -> Iterable[str]:
+        return []
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}_total{self._fmt(key)} {_num(value)}"
+
+
+class Gauge(_Metric):
+    """
+    Valor instantáneo leído en cada scrape (callback -> {labels: valor}).
+    """
+    kind = "gauge"
+
+    def __init__(self, *args, callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.callback = callback
+
+    def _samples(self):
+        if self.callback is None:
+            return
+        for key, value in sorted(self.callback().items()):
+            yield f"{self.name}{self._fmt(key)} {_num(value)}"
+
+
+class Histogram(_Metric):
+    """
+    Histograma acumulativo estilo Prometheus. observe() es una búsqueda
+    binaria y dos sumas bajo un lock: apto para dejarlo siempre activo.
+    """
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [contadores por bucket (+Inf al final), suma, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _samples(self):
+        with self._lock:
+            snapshot = {k: ([*v[0]], v[1], v[2]) for k, v in self._series.items()}
+
+        for key, (counts, total, count) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, n in zip((*self.buckets, "+Inf"), counts):
+                cumulative += n
+                yield f"{self.name}_bucket{self._fmt(key, {'le': _num(bound)})} {cumulative}"
+            yield f"{self.name}_sum{self._fmt(key)} {_num(total)}"
+            yield f"{self.name}_count{self._fmt(key)} {count}"
+
+
+# -------------------------------------------------------------------------
+# Registro de métricas
+# -------------------------------------------------------------------------
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Tuple[str, ...] = (), callback=None) -> Gauge:
+        gauge = self._register(Gauge(name, help, labels))
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets=buckets))
+
+    def render(self) -> str:
+        """
+        Formato de exposición de texto de Prometheus (0.0.4).
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+
+# -------------------------------------------------------------------------
+# Métricas de la aplicación
+# -------------------------------------------------------------------------
+
+QUERY_DURATION = METRICS.histogram(
+    "wea_query_duration_seconds",
+    "Latencia de POST /query por clase de patrón",
+    labels=("pattern_class", "cached"),
+)
+STAGE_DURATION = METRICS.histogram(
+    "wea_query_stage_duration_seconds",
+    "Duración de cada etapa del pipeline de una consulta",
+    labels=("stage",),
+)
+QUERY_ROWS = METRICS.histogram(
+    "wea_query_rows",
+    "Filas devueltas por consulta",
+    labels=("pattern_class",),
+    buckets=ROWS_BUCKETS,
+)
+QUERY_BYTES = METRICS.histogram(
+    "wea_query_bytes_written",
+    "Bytes escritos en disco por consulta (todos los formatos)",
+    buckets=BYTES_BUCKETS,
+)
+QUERY_CACHE = METRICS.counter(
+    "wea_query_cache",
+    "Consultas servidas desde caché (hit), ejecutadas (miss), recalculadas por cambio de dataset (stale) y de ellas solo sobre filas añadidas (incremental)",
+    labels=("result",),
+)
+QUERY_STATUS = METRICS.counter(
+    "wea_queries",
+    "Consultas ejecutadas por estado final",
+    labels=("status",),
+)
+DATASET_MEMORY = METRICS.gauge(
+    "wea_dataset_memory_bytes",
+    "Memoria ocupada por cada dataset cargado",
+    labels=("dataset",),
+)
+BOOT_PHASES = METRICS.gauge(
+    "wea_boot_phase_seconds",
+    "Segundos desde el inicio del arranque hasta cada hito",
+    labels=("phase",),
+    callback=lambda: {(phase,): ms / 1000 for phase, ms in BOOT.to_dict()["phases_ms"].items()},
+)
+RETENTION_EVICTIONS = METRICS.counter(
+    "wea_retention_evictions",
+    "Queries expulsadas por el gestor de retención (quota, error_ttl, stale_ttl)",
+    labels=("reason",),
+)
+RETENTION_RECOMPUTES = METRICS.counter(
+    "wea_retention_recomputes",
+    "Resultados expulsados que se han vuelto a calcular al pedirlos",
+)
+RETENTION_BYTES = METRICS.gauge(
+    "wea_retention_directory_bytes",
+    "Bytes ocupados por cada directorio de resultados (último barrido)",
+    labels=("directory",),
+)
+RETENTION_SWEEP = METRICS.histogram(
+    "wea_retention_sweep_seconds",
+    "Duración de cada barrido de retención",
+)
+EXECUTOR_INFLIGHT = METRICS.gauge(
+    "wea_executor_inflight",
+    "Trabajos admitidos (en ejecución + en cola) por pool",
+    labels=("pool",),
+)
+EXECUTOR_REJECTED = METRICS.counter(
+    "wea_executor_rejected",
+    "Peticiones rechazadas con 429 por pool lleno",
+    labels=("pool",),
+)
+EXECUTOR_WAIT = METRICS.histogram(
+    "wea_executor_wait_seconds",
+    "Tiempo en cola antes de empezar a ejecutarse, por pool",
+    labels=("pool",),
+)
+PROGRESS_SUBSCRIBERS = METRICS.gauge(
+    "wea_progress_subscribers",
+    "Streams SSE de progreso abiertos",
+)
+PROGRESS_EVENTS = METRICS.counter(
+    "wea_progress_events",
+    "Eventos de progreso enviados a los suscriptores, por tipo de canal",
+    labels=("kind",),
+)
+
+
+# -------------------------------------------------------------------------
+# Temporizador de etapas
+# -------------------------------------------------------------------------
+
+class StageTimer:
+    """
+    Acumula la duración (ms) de cada etapa y la publica en el histograma
+    de etapas. `timings` se guarda tal cual en QueryEntry.
+
+    progress: publicador opcional (state/progress.py) al que se anuncia
+    cada etapa al empezar.
+    """
+
+    def __init__(self, progress: Optional[Callable[..., None]] = None):
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+        self.progress = progress
+
+    @contextmanager
+    def stage(self, name: str):
+        if self.progress is not None:
+            self.progress(stage=name)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0)
+
+    def record(self, name: str, seconds: float) -> None:
+        self.timings[name] = round(self.timings.get(name, 0.0) + seconds * 1000, 3)
+        STAGE_DURATION.observe(seconds, stage=name)
+
+    def total(self) -> float:
+        """
+        Segundos desde la creación del temporizador.
+        """
+        return time.perf_counter() - self.started
+
+
+# -------------------------------------------------------------------------
+# Helpers
+# -------------------------------------------------------------------------
+
+def _num(value) -> str:
+    if isinstance(value, str):
+        return value
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
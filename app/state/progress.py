@@ -0,0 +1,224 @@
+# state/progress.py
+
+import asyncio
+import time
+from threading import Lock
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from state.metrics import PROGRESS_EVENTS, PROGRESS_SUBSCRIBERS
+
+
+# Etapas finales: el canal queda cerrado y los suscriptores terminan
+TERMINAL_STAGES = ("done", "error")
+
+
+# -------------------------------------------------------------------------
+# Canal de progreso (uno por query o por dataset)
+# -------------------------------------------------------------------------
+
+class ProgressChannel:
+    """
+    Estado acumulado de la ejecución en curso (o de la última) y los
+    suscriptores SSE conectados: (event loop, cola) de cada uno.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state: Dict[str, Any] = {}
+        self.seq = 0
+        self.started = time.time()
+        self.sent_at = 0.0
+        self.finished_at: Optional[float] = None
+        self.subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "channel": self.name,
+            "seq": self.seq,
+            "elapsed_ms": round((time.time() - self.started) * 1000, 3),
+            **self.state,
+        }
+
+
+# -------------------------------------------------------------------------
+# Broker
+# -------------------------------------------------------------------------
+
+class ProgressBroker:
+    """
+    Publicación de progreso desde los hilos de trabajo (pools, shards del
+    motor, escritura de resultados) hacia los streams SSE, que viven en
+    el event loop: cada evento se entrega con call_soon_threadsafe.
+
+    Cada publish() se mezcla en el estado del canal; a los suscriptores
+    solo se envía como mucho uno por min_interval_ms, salvo cambios de
+    etapa y etapas finales (que siempre se envían). Un suscriptor nuevo
+    recibe primero el estado actual. Los canales terminados se conservan
+    retain_s para quien se conecte tarde.
+
+    Con varios workers de gunicorn el estado es por worker (igual que el
+    registro de queries).
+    """
+
+    def __init__(self):
+        self._channels: Dict[str, ProgressChannel] = {}
+        self._lock = Lock()
+
+        self.min_interval_s = 0.1
+        self.retain_s = 300.0
+        self.keepalive_s = 15.0
+        self.poll_s = 1.0
+
+        PROGRESS_SUBSCRIBERS.callback = lambda: {
+            (): sum(len(c.subscribers) for c in list(self._channels.values()))
+        }
+
+    def configure(self, config: Dict[str, Any]) -> None:
+        cfg = config.get("progress", {}) or {}
+
+        self.min_interval_s = float(cfg.get("min_interval_ms", 100)) / 1000
+        self.retain_s = float(cfg.get("retain_s", 300))
+        self.keepalive_s = float(cfg.get("keepalive_s", 15))
+        self.poll_s = float(cfg.get("poll_s", 1))
+
+    # ------------------------------------------------------------------
+    # Publicación (cualquier hilo)
+    # ------------------------------------------------------------------
+
+    def publish(self, channel: str, **fields) -> None:
+        """
+        Actualiza el canal. Una etapa nueva sobre un canal ya terminado
+        empieza una ejecución nueva (se descarta el estado anterior).
+        """
+        now = time.time()
+
+        with self._lock:
+            ch = self._channels.get(channel)
+            if ch is None:
+                self._purge(now)
+                ch = self._channels[channel] = ProgressChannel(channel)
+
+            stage = fields.get("stage")
+            changed = stage is not None and stage != ch.state.get("stage")
+
+            if ch.finished and changed:
+                ch.state, ch.started, ch.finished_at = {}, now, None
+
+            ch.state.update(fields)
+            ch.seq += 1
+
+            terminal = ch.state.get("stage") in TERMINAL_STAGES
+            if terminal and ch.finished_at is None:
+                ch.finished_at = now
+
+            if not (changed or terminal) and now - ch.sent_at < self.min_interval_s:
+                return
+
+            ch.sent_at = now
+            event = ch.snapshot()
+            subscribers = list(ch.subscribers)
+
+        PROGRESS_EVENTS.inc(kind=channel.split(":", 1)[0])
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # Event loop ya cerrado (apagado del worker)
+                pass
+
+    def reporter(self, channel: str) -> "ProgressReporter":
+        return ProgressReporter(self, channel)
+
+    # ------------------------------------------------------------------
+    # Consulta / suscripción (event loop)
+    # ------------------------------------------------------------------
+
+    def current(self, channel: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            ch = self._channels.get(channel)
+            return ch.snapshot() if ch is not None and ch.state else None
+
+    def subscribers(self, channel: str) -> int:
+        with self._lock:
+            ch = self._channels.get(channel)
+            return len(ch.subscribers) if ch is not None else 0
+
+    async def subscribe(
+        self,
+        channel: str,
+        last_seq: Optional[int] = None
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Estado actual (si es posterior a last_seq, el Last-Event-ID de una
+        reconexión) y después cada evento, hasta una etapa final.
+        None => nada nuevo en keepalive_s (el stream envía un comentario).
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        subscriber = (loop, queue)
+
+        with self._lock:
+            ch = self._channels.get(channel)
+            if ch is None:
+                ch = self._channels[channel] = ProgressChannel(channel)
+            ch.subscribers.append(subscriber)
+            current = ch.snapshot() if ch.state else None
+
+        try:
+            if current is not None:
+                if last_seq is None or current["seq"] > last_seq:
+                    yield current
+                if current.get("stage") in TERMINAL_STAGES:
+                    return
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), self.keepalive_s)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+
+                yield event
+                if event.get("stage") in TERMINAL_STAGES:
+                    return
+
+        finally:
+            with self._lock:
+                ch.subscribers.remove(subscriber)
+
+    # ------------------------------------------------------------------
+    # Limpieza
+    # ------------------------------------------------------------------
+
+    def _purge(self, now: float) -> None:
+        """
+        Descarta canales sin suscriptores terminados hace más de retain_s
+        (o que nunca publicaron nada). Se llama con el lock tomado.
+        """
+        for name, ch in list(self._channels.items()):
+            if ch.subscribers:
+                continue
+            if not ch.state or (ch.finished and now - ch.finished_at > self.retain_s):
+                del self._channels[name]
+
+
+class ProgressReporter:
+    """
+    Publicador ligado a un canal: progress(stage=..., rows_scanned=...).
+    Es lo que reciben el motor, el escritor y los temporizadores de etapa.
+    """
+
+    def __init__(self, broker: ProgressBroker, channel: str):
+        self.broker = broker
+        self.channel = channel
+
+    def __call__(self, **fields) -> None:
+        self.broker.publish(self.channel, **fields)
+
+
+PROGRESS = ProgressBroker()
@@ -1,9 +1,10 @@
 # state/registry.py
 
 from enum import Enum
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional, Set
 from dataclasses import dataclass
 from datetime import datetime
+from threading import Event
 
 
 # -------------------------------------------------------------------------
@@ -15,6 +16,8 @@ class QueryStatus(str, Enum):
     RUNNING = "running"
     DONE = "done"
     ERROR = "error"
+    # Ficheros borrados por retención: se recalcula al volver a pedirla
+    EVICTED = "evicted"
 
 
 # -------------------------------------------------------------------------
@@ -42,13 +45,43 @@ class QueryEntry:
 
     status: QueryStatus
 
+    # Rango temporal canónico ("observation:<inicio>/<fin>")
+    time_range: Optional[str] = None
+
+    # Dataset (configuración de ventanas) sobre el que se ejecutó
+    dataset: Optional[str] = None
+
+    # Versión (huella) y filas del dataset con las que se calculó: si el
+    # dataset cambia el resultado deja de valer
+    dataset_version: Optional[str] = None
+    dataset_rows: Optional[int] = None
+
+    # Vista agregada de las secuencias (None = eventos)
+    view: Optional[str] = None
+
+    # Resultado de una operación entre queries: {"op": ..., "queries": [...]}
+    combine: Optional[Dict[str, Any]] = None
+
     rows: int = 0
     output: Optional[str] = None
     error: Optional[str] = None
 
+    # Ficheros del resultado: {formato: {path, bytes, sha256}}
+    manifest: Optional[Dict[str, Any]] = None
+
+    # Duración (ms) de cada etapa del pipeline: parse, load_dataset, plan,
+    # load_partitions, match, materialize, save_results, total
+    timings: Optional[Dict[str, float]] = None
+
+    # Perfil guardado (.prof / .profile.txt) si la consulta se perfiló
+    profile: Optional[str] = None
+
     created_at: str = ""
     updated_at: str = ""
 
+    # Último acceso al resultado (LRU de retención)
+    last_access: Optional[str] = None
+
     # ------------------------------------------------------------------
     # Serialización a disco
     # ------------------------------------------------------------------
@@ -64,13 +97,23 @@ class QueryEntry:
             # canonical (identidad)
             "src": self.src,
             "dst": self.dst,
+            "time_range": self.time_range,
+            "dataset": self.dataset,
+            "dataset_version": self.dataset_version,
+            "dataset_rows": self.dataset_rows,
+            "view": self.view,
+            "combine": self.combine,
 
             "status": self.status,
             "rows": self.rows,
             "output": self.output,
             "error": self.error,
+            "manifest": self.manifest,
+            "timings": self.timings,
+            "profile": self.profile,
             "created_at": self.created_at,
             "updated_at": self.updated_at,
+            "last_access": self.last_access,
         }
 
     # ------------------------------------------------------------------
@@ -87,13 +130,23 @@ class QueryEntry:
 
             src=data.get("src"),
             dst=data.get("dst"),
+            time_range=data.get("time_range"),
+            dataset=data.get("dataset"),
+            dataset_version=data.get("dataset_version"),
+            dataset_rows=data.get("dataset_rows"),
+            view=data.get("view"),
+            combine=data.get("combine"),
 
             status=QueryStatus(data["status"]),
             rows=data.get("rows", 0),
             output=data.get("output"),
             error=data.get("error"),
+            manifest=data.get("manifest"),
+            timings=data.get("timings"),
+            profile=data.get("profile"),
             created_at=data.get("created_at", ""),
             updated_at=data.get("updated_at", ""),
+            last_access=data.get("last_access"),
         )
 
 
@@ -109,6 +162,14 @@ class QueryRegistry:
     def __init__(self):
         self._queries: Dict[str, QueryEntry] = {}
 
+        # Accesos aún no persistidos (los guarda el barrido de retención)
+        self._touched: Set[str] = set()
+
+        # Bootstrap desde disco en curso -> get() espera antes de dar una
+        # query por inexistente (set = sin bootstrap pendiente)
+        self._ready = Event()
+        self._ready.set()
+
     # ------------------------------------------------------------------
     # Crear nueva query
     # ------------------------------------------------------------------
@@ -120,6 +181,10 @@ class QueryRegistry:
         dst_raw: Optional[str],
         src: Optional[str],
         dst: Optional[str],
+        time_range: Optional[str] = None,
+        dataset: Optional[str] = None,
+        view: Optional[str] = None,
+        combine: Optional[Dict[str, Any]] = None,
     ) -> QueryEntry:
         now = datetime.utcnow().isoformat()
 
@@ -129,6 +194,10 @@ class QueryRegistry:
             dst_raw=dst_raw,
             src=src,
             dst=dst,
+            time_range=time_range,
+            dataset=dataset,
+            view=view,
+            combine=combine,
             status=QueryStatus.PENDING,
             created_at=now,
             updated_at=now,
@@ -153,11 +222,41 @@ class QueryRegistry:
     # Accesores
     # ------------------------------------------------------------------
 
-    def get(self, query_id: str) -> Optional[QueryEntry]:
-        return self._queries.get(query_id)
+    def get(self, query_id: str, timeout: Optional[float] = 30.0) -> Optional[QueryEntry]:
+        entry = self._queries.get(query_id)
+
+        if entry is None and not self._ready.is_set():
+            self._ready.wait(timeout)
+            entry = self._queries.get(query_id)
+
+        return entry
 
     def all(self) -> Dict[str, QueryEntry]:
-        return self._queries
+        """
+        Copia del registro: se puede recorrer mientras otros hilos crean
+        o eliminan queries.
+        """
+        return dict(self._queries)
+
+    def remove(self, query_id: str) -> Optional[QueryEntry]:
+        self._touched.discard(query_id)
+        return self._queries.pop(query_id, None)
+
+    def touch(self, query_id: str) -> None:
+        """
+        Marca un acceso al resultado (sin tocar updated_at).
+        """
+        entry = self._queries.get(query_id)
+        if entry is not None:
+            entry.last_access = datetime.utcnow().isoformat()
+            self._touched.add(query_id)
+
+    def drain_touched(self) -> List[str]:
+        touched, self._touched = self._touched, set()
+        return list(touched)
+
+    def wait_ready(self, timeout: Optional[float] = 30.0) -> bool:
+        return self._ready.wait(timeout)
 
     # ------------------------------------------------------------------
     # Carga desde disco (bootstrap al arrancar)
@@ -165,3 +264,26 @@ class QueryRegistry:
 
     def load_from_disk(self, entries: Dict[str, QueryEntry]) -> None:
         self._queries = entries
+
+    # Bootstrap incremental: las entradas se publican según se leen y
+    # nunca pisan queries creadas mientras tanto
+
+    def begin_bootstrap(self) -> None:
+        self._ready.clear()
+
+    def add_from_disk(self, entry: QueryEntry) -> None:
+        self._queries.setdefault(entry.query_id, entry)
+
+    def replace_from_disk(self, entry: QueryEntry) -> None:
+        """
+        Sustituye la entrada por la releída de disco (la escribió otro
+        worker al terminar la query).
+        """
+        self._queries[entry.query_id] = entry
+
+    def end_bootstrap(self) -> None:
+        self._ready.set()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
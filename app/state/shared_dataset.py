@@ -0,0 +1,341 @@
+# state/shared_dataset.py
+
+import atexit
+import json
+import os
+import tempfile
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from core._1_config_loader import config_for_dataset, default_dataset_name
+from core._2_preprocessor import (
+    dataset_source,
+    load_dataset_stats,
+    load_or_preprocess_dataset,
+    resident_columns,
+)
+from core._8_partitioned_dataset import partitioning_enabled
+from core._9_cooccurrence import ensure_cooccurrence
+
+
+# Manifiesto de los datasets publicados por el proceso maestro (ruta en
+# esta variable de entorno, que heredan los workers)
+SHARED_ENV = "WEA_SHARED_DATASETS"
+
+# Alineación de cada array dentro del segmento
+_ALIGN = 64
+
+# Segmentos creados por este proceso (se liberan al salir)
+_OWNED: List[shared_memory.SharedMemory] = []
+
+# Segmentos adjuntados por este proceso: deben vivir lo mismo que los
+# DataFrames que los usan
+_ATTACHED: Dict[str, shared_memory.SharedMemory] = {}
+
+# Adjuntar sin registro sustituye temporalmente resource_tracker.register
+_TRACKER_LOCK = Lock()
+
+
+# -------------------------------------------------------------------------
+# API principal
+# -------------------------------------------------------------------------
+
+def shared_memory_enabled(config: Dict[str, Any]) -> bool:
+    return bool(config.get("datasets", {}).get("shared_memory", {}).get("enabled", False))
+
+
+def publish_datasets(config: Dict[str, Any]) -> Optional[Path]:
+    """
+    Proceso maestro (antes de arrancar los workers): carga o preprocesa
+    una vez cada dataset de datasets.shared_memory.preload, copia sus
+    columnas residentes a memoria compartida y escribe el manifiesto.
+
+    Deja preparados en disco también las estadísticas y la co-ocurrencia
+    para que los workers no repitan ese trabajo.
+    """
+
+    if not shared_memory_enabled(config):
+        return None
+
+    shared_cfg = config["datasets"]["shared_memory"]
+    names = [
+        default_dataset_name(config) if n == "default" else n
+        for n in shared_cfg.get("preload") or ["default"]
+    ]
+
+    manifest: Dict[str, Any] = {}
+
+    for name in names:
+        dataset_config = config_for_dataset(config, name)
+
+        if partitioning_enabled(dataset_config):
+            # Nada residente que compartir: cada consulta lee particiones
+            continue
+
+        print(f"📦 Publicando dataset '{name}' en memoria compartida...")
+        df = load_or_preprocess_dataset(dataset_config, columns=resident_columns(dataset_config))
+        load_dataset_stats(dataset_config, df)
+        ensure_cooccurrence(dataset_config, df)
+
+        try:
+            spec = _publish_frame(df)
+        except TypeError as e:
+            print(f"[WARN] Dataset '{name}' no compartible: {e}")
+            continue
+
+        spec["source"] = dataset_source(dataset_config)
+        manifest[name] = spec
+
+        print(f"✅ Dataset '{name}': {spec['bytes'] / 1024 ** 2:.0f} MB compartidos")
+
+    path = Path(tempfile.gettempdir()) / f"wea_shared_{os.getpid()}.json"
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    os.environ[SHARED_ENV] = str(path)
+    atexit.register(release_datasets)
+
+    return path
+
+
+def attach_dataset(config: Dict[str, Any], name: str) -> Optional[pd.DataFrame]:
+    """
+    Worker: DataFrame residente de `name` sobre la memoria compartida
+    (solo lectura), o None si no se publicó o el procesado ha cambiado
+    desde entonces (se carga entonces de forma privada).
+    """
+
+    manifest = _read_manifest()
+    spec = manifest.get(name)
+
+    if spec is None or spec.get("source") != dataset_source(config):
+        return None
+
+    try:
+        segment = _attach(spec["segment"])
+    except FileNotFoundError:
+        return None
+
+    return _frame_from_spec(segment, spec)
+
+
+def release_datasets() -> None:
+    """
+    Libera (unlink) los segmentos creados por este proceso y su manifiesto.
+    """
+    while _OWNED:
+        segment = _OWNED.pop()
+        segment.close()
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+
+    path = os.environ.get(SHARED_ENV)
+    if path and Path(path).name == f"wea_shared_{os.getpid()}.json":
+        Path(path).unlink(missing_ok=True)
+
+
+# -------------------------------------------------------------------------
+# Serialización del DataFrame residente
+# -------------------------------------------------------------------------
+#
+# Todo lo proporcional al número de filas (codes del MultiIndex, row_id,
+# tiempos, codes de las vistas) va a un único segmento y los workers lo
+# usan sin copiarlo. Las claves distintas (levels / categorías) también
+# viajan en el segmento, pero cada worker construye sus propios str.
+
+def _publish_frame(df: pd.DataFrame) -> Dict[str, Any]:
+    arrays: List[Tuple[Dict[str, Any], np.ndarray]] = []
+
+    index = []
+    for i, name in enumerate(df.index.names):
+        level = df.index.levels[i]
+        index.append({
+            "name": name,
+            "categorical": isinstance(level, pd.CategoricalIndex),
+            "codes": _add(arrays, np.asarray(df.index.codes[i])),
+            "levels": _add_strings(arrays, level),
+        })
+
+    columns = []
+    for col in df.columns:
+        values = df[col]
+        dtype = values.dtype
+
+        if isinstance(dtype, pd.CategoricalDtype):
+            columns.append({
+                "name": col,
+                "kind": "categorical",
+                "codes": _add(arrays, values.cat.codes.to_numpy()),
+                "categories": _add_strings(arrays, dtype.categories),
+            })
+        elif isinstance(dtype, pd.DatetimeTZDtype):
+            columns.append({
+                "name": col,
+                "kind": "datetimetz",
+                "tz": str(dtype.tz),
+                "values": _add(arrays, values.array.asi8),
+            })
+        elif isinstance(dtype, np.dtype) and dtype.kind in "biufcmM":
+            columns.append({
+                "name": col,
+                "kind": "array",
+                "values": _add(arrays, values.to_numpy()),
+            })
+        else:
+            raise TypeError(f"columna {col!r} de tipo {dtype} (solo numéricas, fechas y categóricas)")
+
+    size = max(sum(_padded(a.nbytes) for _, a in arrays), 1)
+    segment = shared_memory.SharedMemory(create=True, size=size)
+    _OWNED.append(segment)
+
+    offset, view = 0, None
+    for spec, array in arrays:
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf, offset=offset)
+        view[...] = array
+        spec["offset"] = offset
+        offset += _padded(array.nbytes)
+
+    # Sin vistas vivas el segmento se puede cerrar al liberarlo
+    del view
+
+    return {
+        "segment": segment.name,
+        "bytes": size,
+        "rows": int(len(df)),
+        "index": index,
+        "columns": columns,
+    }
+
+
+def _frame_from_spec(segment: shared_memory.SharedMemory, spec: Dict[str, Any]) -> pd.DataFrame:
+    buf = segment.buf
+
+    levels, codes, names = [], [], []
+    for level in spec["index"]:
+        values = _strings(buf, level["levels"])
+        levels.append(
+            pd.CategoricalIndex(values, categories=values, name=level["name"])
+            if level["categorical"] else pd.Index(values, dtype=object, name=level["name"])
+        )
+        codes.append(_array(buf, level["codes"]))
+        names.append(level["name"])
+
+    data = {}
+    for col in spec["columns"]:
+        if col["kind"] == "categorical":
+            dtype = pd.CategoricalDtype(_strings(buf, col["categories"]))
+            data[col["name"]] = pd.Categorical.from_codes(
+                _array(buf, col["codes"]), dtype=dtype, validate=False
+            )
+        elif col["kind"] == "datetimetz":
+            values = _array(buf, col["values"]).view("datetime64[ns]")
+            data[col["name"]] = pd.DatetimeIndex(values).tz_localize("UTC").tz_convert(col["tz"])
+        else:
+            data[col["name"]] = _array(buf, col["values"])
+
+    index = pd.MultiIndex(levels=levels, codes=codes, names=names, verify_integrity=False)
+
+    # copy=False: las columnas siguen siendo vistas del segmento
+    return pd.DataFrame(data, index=index, copy=False)
+
+
+# -------------------------------------------------------------------------
+# Helpers internos
+# -------------------------------------------------------------------------
+
+def _add(arrays: List[Tuple[Dict[str, Any], np.ndarray]], array: np.ndarray) -> Dict[str, Any]:
+    """
+    Reserva un array en el segmento; su offset se rellena al copiarlo.
+    """
+    array = np.ascontiguousarray(array)
+    spec = {"dtype": array.dtype.str, "shape": list(array.shape)}
+
+    arrays.append((spec, array))
+    return spec
+
+
+def _add_strings(arrays: List[Tuple[Dict[str, Any], np.ndarray]], values: pd.Index) -> Dict[str, Any]:
+    """
+    Strings en formato Arrow: offsets (int64) + bytes UTF-8.
+    """
+    strings = pa.array(np.asarray(values, dtype=object), type=pa.large_string())
+    _, offsets, data = strings.buffers()
+
+    return {
+        "offsets": _add(arrays, np.frombuffer(offsets, dtype=np.int64, count=len(strings) + 1)),
+        "data": _add(arrays, np.frombuffer(data, dtype=np.uint8) if data is not None else np.empty(0, np.uint8)),
+    }
+
+
+def _array(buf, spec: Dict[str, Any]) -> np.ndarray:
+    array = np.ndarray(tuple(spec["shape"]), dtype=np.dtype(spec["dtype"]), buffer=buf, offset=spec["offset"])
+    array.flags.writeable = False
+    return array
+
+
+def _strings(buf, spec: Dict[str, Any]) -> np.ndarray:
+    offsets = _array(buf, spec["offsets"])
+    data = _array(buf, spec["data"])
+
+    strings = pa.Array.from_buffers(
+        pa.large_string(),
+        len(offsets) - 1,
+        [None, pa.py_buffer(offsets), pa.py_buffer(data)],
+    )
+    return strings.to_numpy(zero_copy_only=False)
+
+
+def _padded(nbytes: int) -> int:
+    return (nbytes + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _read_manifest() -> Dict[str, Any]:
+    path = os.environ.get(SHARED_ENV)
+    if not path:
+        return {}
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    segment = _ATTACHED.get(name)
+
+    if segment is None:
+        segment = _ATTACHED[name] = _open_untracked(name)
+
+    return segment
+
+
+def _open_untracked(name: str) -> shared_memory.SharedMemory:
+    """
+    Adjunta el segmento sin registrarlo en el resource tracker. Los
+    workers (fork) comparten el tracker del maestro, donde el segmento ya
+    está registrado por él: registrarlo y desregistrarlo desde un worker
+    quitaría el registro del maestro (sin limpieza si el maestro cae) y el
+    tracker fallaría (KeyError) con cada worker siguiente. El segmento
+    solo lo libera el maestro (release_datasets).
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        pass
+
+    with _TRACKER_LOCK:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
@@ -0,0 +1,70 @@
+# tests/conftest.py
+#
+# Desde app/:  python -m pytest -q tests
+#
+# Todo corre sobre un dataset sintético pequeño (benchmarks/) en un
+# directorio temporal: las rutas de config.yml se redirigen con las
+# variables de entorno del config loader ANTES de importar nada del core.
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+APP_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(APP_DIR))
+os.chdir(APP_DIR)
+
+WORKDIR = Path(tempfile.mkdtemp(prefix="wea_tests_"))
+
+os.environ.update({
+    "DATASET_RAW_PATH": str(WORKDIR / "raw.parquet"),
+    "DATASET_PROCESSED_PATH": str(WORKDIR / "processed" / "indexed.parquet"),
+    "DATASET_PARTITIONED_PATH": str(WORKDIR / "processed" / "partitioned"),
+    "OUTPUT_DIR": str(WORKDIR / "queries"),
+    "OUTPUT_DIR_CSV": str(WORKDIR / "queries_csv"),
+})
+
+ROWS = 5000
+
+
+@pytest.fixture
+def config():
+    from core._1_config_loader import load_config
+
+    return load_config()
+
+
+@pytest.fixture(scope="session")
+def raw_windows():
+    from benchmarks.synthetic_dataset import generate_windows, write_windows
+    from core._1_config_loader import load_config
+
+    raw = generate_windows(load_config(), ROWS, seed=7)
+    write_windows(raw, Path(os.environ["DATASET_RAW_PATH"]))
+    return raw
+
+
+@pytest.fixture(scope="session")
+def dataset(raw_windows):
+    """
+    Dataset procesado completo (todas las columnas, MultiIndex categórico).
+    """
+    from core._1_config_loader import load_config
+    from core._2_preprocessor import load_or_preprocess_dataset
+
+    return load_or_preprocess_dataset(load_config())
+
+
+@pytest.fixture(scope="session")
+def client(raw_windows):
+    """
+    App real (TestClient) sobre el dataset sintético.
+    """
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as c:
+        yield c
@@ -0,0 +1,84 @@
+# tests/test_compression.py
+
+import asyncio
+import gzip
+import zlib
+
+import pytest
+
+from api.compression import CompressionMiddleware, brotli
+
+
+CHUNKS = [(f'{{"row": {i}, "obs_seq": "475,294,475"}}\n' * 50).encode() for i in range(5)]
+
+
+def _stream_app(content_type: str):
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", content_type.encode())],
+        })
+        for i, chunk in enumerate(CHUNKS):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(CHUNKS) - 1})
+
+    return app
+
+
+def _run(content_type: str, accept_encoding: str):
+    """
+    Mensajes ASGI que envía el middleware (cabeceras + un body por lote).
+    """
+    sent = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"accept-encoding", accept_encoding.encode())],
+    }
+
+    middleware = CompressionMiddleware(_stream_app(content_type), minimum_size=100)
+    asyncio.run(middleware(scope, receive, send))
+
+    headers = dict(sent[0]["headers"])
+    bodies = [m["body"] for m in sent[1:]]
+    return headers, bodies
+
+
+def test_gzip_stream_flushes_every_batch():
+    headers, bodies = _run("application/x-ndjson", "gzip")
+
+    assert headers[b"content-encoding"] == b"gzip"
+    assert len(bodies) == len(CHUNKS)
+
+    # Cada lote se puede descomprimir en cuanto llega, sin esperar al resto
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk, body in zip(CHUNKS, bodies):
+        assert decoder.decompress(body) == chunk
+
+    assert gzip.decompress(b"".join(bodies)) == b"".join(CHUNKS)
+
+
+@pytest.mark.skipif(brotli is None, reason="brotli no instalado")
+def test_brotli_stream_flushes_every_batch():
+    headers, bodies = _run("application/x-ndjson", "br, gzip")
+
+    assert headers[b"content-encoding"] == b"br"
+
+    decoder = brotli.Decompressor()
+    for chunk, body in zip(CHUNKS, bodies):
+        assert decoder.process(body) == chunk
+
+
+def test_event_stream_is_not_compressed():
+    headers, bodies = _run("text/event-stream", "gzip")
+
+    assert b"content-encoding" not in headers
+    assert bodies == CHUNKS
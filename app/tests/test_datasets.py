@@ -0,0 +1,211 @@
+# tests/test_datasets.py
+#
+# Datasets propios en tmp_path: aquí se reemplaza el procesado en disco
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import core._2_preprocessor as preprocessor
+import state.datasets as datasets
+from benchmarks.synthetic_dataset import generate_windows, write_windows
+from core._2_preprocessor import ROW_ID_COLUMN, load_dataset_stats, load_or_preprocess_dataset
+from core._10_prefix_tree import PrefixTree
+from core._9_cooccurrence import compute_cooccurrence, cooccurrence_current, top_k
+from services.queries_service import QueryService
+from state.datasets import DatasetRegistry, LoadedDataset
+from state.metrics import QUERY_CACHE
+
+
+def _isolated_config(config, directory: Path, outputs: str = "queries"):
+    config["paths"].update(
+        dataset_raw=str(directory / "raw.parquet"),
+        dataset_processed=str(directory / "processed" / "indexed.parquet"),
+        dataset_partitioned=str(directory / "processed" / "partitioned"),
+        output_dir=str(directory / outputs),
+        output_dir_csv=str(directory / f"{outputs}_csv"),
+    )
+    config["retention"]["enabled"] = False
+    return config
+
+
+def _no_preprocessing(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("preprocesado en la ruta de lectura")
+
+    monkeypatch.setattr(preprocessor, "load_or_preprocess_dataset", fail)
+    monkeypatch.setattr(datasets, "load_or_preprocess_dataset", fail)
+
+
+def test_version_is_cached_until_the_processed_file_changes(config, tmp_path, monkeypatch):
+    config = _isolated_config(config, tmp_path)
+    write_windows(generate_windows(config, 500, seed=1), tmp_path / "raw.parquet")
+    version = load_dataset_stats(config)["version"]["fingerprint"]
+
+    reads = []
+    stored = datasets.stored_dataset_version
+    monkeypatch.setattr(
+        datasets, "stored_dataset_version",
+        lambda *args: reads.append(args) or stored(*args),
+    )
+    _no_preprocessing(monkeypatch)
+
+    registry = DatasetRegistry(config)
+    assert registry.version() == version
+    assert registry.version() == version
+    assert len(reads) == 1
+
+    # Procesado reemplazado (otra firma): sus estadísticas ya no valen y
+    # la versión pasa a desconocida, sin preprocesar para averiguarla
+    processed = Path(config["paths"]["dataset_processed"])
+    stat = processed.stat()
+    os.utime(processed, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert registry.version() is None
+    assert len(reads) == 2
+
+
+def _event(windows: pd.DataFrame, row: int) -> str:
+    # observation_events: "[565, 12, ...]"
+    return windows.iloc[row]["observation_events"].strip("[]").split(",")[0].strip()
+
+
+def test_appended_rows_are_evaluated_incrementally(config, tmp_path):
+    config = _isolated_config(config, tmp_path)
+    windows = generate_windows(config, 4000, seed=3)
+    src = f"{_event(windows, 3500)},*"
+
+    write_windows(windows.iloc[:3000], tmp_path / "raw.parquet")
+    service = QueryService(config)
+    first = service.run(src, None)
+
+    # Se añaden filas al final: se reprocesa el dataset con ellas
+    write_windows(windows, tmp_path / "raw.parquet")
+    os.remove(config["paths"]["dataset_processed"])
+
+    incremental = QUERY_CACHE._values.get(("incremental",), 0)
+    appended = service.run(src, None)
+
+    assert QUERY_CACHE._values.get(("incremental",), 0) == incremental + 1
+    assert appended["query_id"] == first["query_id"]
+    assert service.registry.get(appended["query_id"]).dataset_rows == 4000
+
+    # Mismo resultado (y orden) que un cálculo completo
+    full = QueryService(_isolated_config(config, tmp_path, outputs="full")).run(src, None)
+    assert not full["cached"]
+
+    expected = pd.read_parquet(full["output"])
+    result = pd.read_parquet(appended["output"])
+
+    assert appended["rows"] == full["rows"] > first["rows"]
+    assert result[ROW_ID_COLUMN].tolist() == expected[ROW_ID_COLUMN].tolist()
+
+
+def test_view_is_built_once_and_counted_against_the_budget(config, tmp_path, monkeypatch):
+    config = _isolated_config(config, tmp_path)
+    write_windows(generate_windows(config, 500, seed=1), tmp_path / "raw.parquet")
+
+    registry = DatasetRegistry(config)
+    loaded = registry.get()
+    memory = loaded.memory_bytes
+
+    builds = []
+    build = datasets.view_frame
+
+    def slow_view_frame(*args):
+        builds.append(args)
+        time.sleep(0.05)
+        return build(*args)
+
+    monkeypatch.setattr(datasets, "view_frame", slow_view_frame)
+
+    # Otro dataset cargado y un presupuesto que ya no admite los dos
+    other = LoadedDataset(name="other", config=config, stats={}, memory_bytes=1)
+    registry._loaded["other"] = other
+    registry._loaded.move_to_end(loaded.name)
+    registry.budget_bytes = memory + 1
+
+    with ThreadPoolExecutor(4) as pool:
+        views = list(pool.map(lambda _: registry.view(loaded, "component"), range(4)))
+
+    assert len(builds) == 1
+    assert all(v is views[0] for v in views)
+    assert loaded.memory_bytes > memory
+    assert "other" not in registry._loaded
+
+
+def test_projection_ignores_missing_columns_when_preprocessing(config, tmp_path):
+    config = _isolated_config(config, tmp_path)
+    write_windows(generate_windows(config, 200, seed=1), tmp_path / "raw.parquet")
+    columns = ["observation_end", "no_such_column"]
+
+    preprocessed = load_or_preprocess_dataset(config, columns=columns)
+    loaded = load_or_preprocess_dataset(config, columns=columns)
+
+    assert list(preprocessed.columns) == [ROW_ID_COLUMN, "observation_end"]
+    assert list(loaded.columns) == list(preprocessed.columns)
+
+
+def test_cooccurrence_follows_the_processed_dataset(config, tmp_path):
+    config = _isolated_config(config, tmp_path)
+    write_windows(generate_windows(config, 300, seed=1), tmp_path / "raw.parquet")
+
+    registry = DatasetRegistry(config)
+    assert int(registry.cooccurrence()["rows"]) == 300
+
+    # Procesado regenerado con más filas: el .npz se recalcula
+    write_windows(generate_windows(config, 600, seed=2), tmp_path / "raw.parquet")
+    os.remove(config["paths"]["dataset_processed"])
+    load_or_preprocess_dataset(config)
+
+    assert not cooccurrence_current(config)
+    assert int(registry.cooccurrence()["rows"]) == 600
+    assert cooccurrence_current(config)
+
+
+def test_transition_confidence_is_over_outgoing_transitions(dataset, config):
+    matrices = compute_cooccurrence(dataset, config)
+
+    for name in ("obs_transitions", "pred_transitions"):
+        indptr = matrices[f"{name}_indptr"]
+        for event_id in np.flatnonzero(np.diff(indptr)):
+            confidences = [r["confidence"] for r in top_k(matrices, name, int(event_id), k=10**6)]
+
+            assert max(confidences) <= 1.0
+            assert sum(confidences) == pytest.approx(1.0)
+
+
+def test_prefix_tree_is_refreshed_with_appended_rows(config, tmp_path):
+    config = _isolated_config(config, tmp_path)
+    windows = generate_windows(config, 4000, seed=3)
+    separator = config["processing"]["separator"]
+
+    write_windows(windows.iloc[:3000], tmp_path / "raw.parquet")
+    service = QueryService(config)
+    service.top_patterns("observation", 2)
+    tree = service.datasets.get().prefix_trees["observation"]
+
+    # Filas añadidas al final: el mismo árbol, refrescado con ellas
+    write_windows(windows, tmp_path / "raw.parquet")
+    os.remove(config["paths"]["dataset_processed"])
+
+    top = service.top_patterns("observation", 2)
+    loaded = service.datasets.get()
+    full = PrefixTree.from_index(loaded.df.index, 0, separator, tree.max_depth)
+
+    assert loaded.prefix_trees["observation"] is tree
+    assert tree.rows == 4000
+    assert top["total"] == full.total
+    assert [r["prefix"] for r in top["results"]] == [r["prefix"] for r in full.top_k(2)]
+
+    # Otros datos (no un append): se reconstruye
+    write_windows(generate_windows(config, 4000, seed=4), tmp_path / "raw.parquet")
+    os.remove(config["paths"]["dataset_processed"])
+
+    service.top_patterns("observation", 2)
+    assert service.datasets.get().prefix_trees["observation"] is not tree
@@ -0,0 +1,98 @@
+# tests/test_input_controller.py
+
+import numpy as np
+import pytest
+
+from core._3_input_controller import parse_pattern
+from core._12_event_predicates import is_predicate, load_event_lookup
+
+
+# -------------------------------------------------------------------------
+# Patrones de eventos
+# -------------------------------------------------------------------------
+
+@pytest.mark.parametrize("raw, regex, prefix", [
+    ("475,*", r"^475(?:,.*)?$", "475"),
+    ("475 ? *", r"^475,\d+(?:,.*)?$", "475"),
+    ("475.484", r"^475,484$", None),
+    # Sin separador el '*' es literal (igual que antes de los predicados)
+    ("475*", r"^475\*$", None),
+    ("103*", r"^103\*$", None),
+])
+def test_event_patterns(config, raw, regex, prefix):
+    pattern = parse_pattern(raw, "observation", config)
+
+    assert pattern.events is None
+    assert pattern.regex == regex
+    assert pattern.prefix == prefix
+
+
+@pytest.mark.parametrize("token, expected", [
+    ("475", False),
+    ("?", False),
+    ("*", False),
+    ("475*", False),
+    ("4?", False),
+    ("any", True),
+    ("any:Q90+", True),
+    ("Battery_Active_Power:Q20-Q50", True),
+])
+def test_is_predicate(token, expected):
+    assert is_predicate(token) is expected
+
+
+# -------------------------------------------------------------------------
+# Predicados de componente / percentil
+# -------------------------------------------------------------------------
+
+def test_predicate_pattern(config):
+    lookup = load_event_lookup(config)
+    pattern = parse_pattern("any:Q90+,*", "observation", config)
+
+    q90 = lookup.percentiles.index("Q90")
+    expected = np.flatnonzero(lookup.percentile_of >= q90)
+
+    assert pattern.canonical == "any:Q90+,*"
+    np.testing.assert_array_equal(pattern.events[0], expected)
+
+
+def test_component_predicate(config):
+    lookup = load_event_lookup(config)
+    component = lookup.components[0]
+
+    pattern = parse_pattern(f"{component}:Q20-", "prediction", config)
+    events = pattern.events[0]
+
+    assert len(events) > 0
+    assert (lookup.component_of[events] == 0).all()
+    assert (lookup.percentile_of[events] <= lookup.percentiles.index("Q20")).all()
+
+
+@pytest.mark.parametrize("raw", ["Nope:Q90,*", "any:Q999", "any:X1"])
+def test_invalid_predicates(config, raw):
+    with pytest.raises(ValueError):
+        parse_pattern(raw, "observation", config)
+
+
+@pytest.mark.parametrize("src", ["475*", "103*"])
+def test_query_prefix_shorthand_is_accepted(client, src):
+    # Regresión: "475*" llegaba al parser de predicados y devolvía 400
+    response = client.post("/query", json={"src": src})
+
+    assert response.status_code == 200
+
+
+# -------------------------------------------------------------------------
+# Rangos temporales
+# -------------------------------------------------------------------------
+
+@pytest.mark.parametrize("time_from, time_to, status", [
+    # 10:00 sin zona (UTC) frente a 11:00+02:00 (09:00 UTC)
+    ("2024-01-01T10:00:00", "2024-01-01T11:00:00+02:00", 400),
+    ("2024-01-01T12:00:00+02:00", "2024-01-01T09:00:00", 400),
+    ("2000-01-01T00:00:00", "2100-01-01T00:00:00+02:00", 200),
+])
+def test_query_time_range_mixes_naive_and_aware_bounds(client, time_from, time_to, status):
+    response = client.post("/query", json={"src": "475,*", "time_from": time_from, "time_to": time_to})
+
+    assert response.status_code == status
@@ -0,0 +1,68 @@
+# tests/test_profiling.py
+
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import services.profiling as profiling
+from core._14_parallel import map_shards
+from services.profiling import QueryProfiler
+
+
+def test_second_cprofile_session_falls_back_to_sampling():
+    with QueryProfiler("cprofile") as first:
+        with QueryProfiler("cprofile") as second:
+            pass
+
+    assert first.mode == "cprofile"
+    assert second.mode == "sampling"
+
+    # Terminada la primera, cProfile vuelve a estar libre
+    with QueryProfiler("cprofile") as third:
+        pass
+    assert third.mode == "cprofile"
+
+
+def test_cprofile_busy_elsewhere_falls_back_to_sampling(monkeypatch):
+    class BusyProfile:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(profiling, "cProfile", SimpleNamespace(Profile=BusyProfile))
+
+    with QueryProfiler("cprofile") as profiler:
+        pass
+
+    assert profiler.mode == "sampling"
+    assert not profiling._CPROFILE_LOCK.locked()
+
+
+def _slow_shard(lo, hi):
+    time.sleep(0.05)
+    return hi - lo
+
+
+def test_sampling_includes_shard_threads():
+    config = {"processing": {"threads": 2, "shard_rows": 10}}
+
+    with QueryProfiler("sampling", interval_ms=1) as profiler:
+        assert sum(map_shards(_slow_shard, 60, config)) == 60
+
+    shard_stacks = [s for s in profiler._samples if s.startswith("[shard];")]
+    assert any("_slow_shard" in s for s in shard_stacks)
+
+
+def test_query_profiled_while_cprofile_is_busy(client):
+    # Otra consulta tiene cProfile: esta se perfila por muestreo, no falla
+    with profiling._CPROFILE_LOCK:
+        response = client.post(
+            "/query",
+            json={"src": "475,?,*"},
+            headers={"X-Profile": "cprofile"},
+        )
+
+    assert response.status_code == 200
+
+    entry = client.get(f"/query/{response.json()['query_id']}").json()
+    assert entry["status"] == "done"
+    assert Path(entry["profile"]).name.endswith(".profile.txt")
@@ -0,0 +1,83 @@
+# tests/test_progress.py
+
+import json
+import time
+from threading import Thread
+
+import pytest
+
+from api.dependencies import get_query_service
+from core._5_output_writer import write_metadata
+from state.executors import EXECUTORS, ExecutorBusy
+from state.progress import PROGRESS
+from state.registry import QueryEntry, QueryStatus
+
+SRC = "?,?,475"
+
+
+@pytest.fixture
+def busy_heavy_pool(monkeypatch):
+    def submit(*args, **kwargs):
+        raise ExecutorBusy("heavy", 5)
+
+    monkeypatch.setattr(EXECUTORS.heavy, "submit", submit)
+
+
+def _channel(client) -> str:
+    return f"query:{get_query_service().query_id(SRC, None)}"
+
+
+def test_busy_rejection_does_not_fail_the_run_in_progress(client, busy_heavy_pool):
+    channel = _channel(client)
+    PROGRESS.publish(channel, stage="match", rows_scanned=10)
+
+    response = client.post("/query", json={"src": SRC, "background": True})
+
+    assert response.status_code == 429
+    assert PROGRESS.current(channel)["stage"] == "match"
+
+    PROGRESS.publish(channel, stage="done")
+
+
+def test_busy_rejection_fails_its_own_queued_run(client, busy_heavy_pool):
+    channel = _channel(client)
+    PROGRESS.publish(channel, stage="done")
+
+    response = client.post("/query", json={"src": SRC, "background": True})
+
+    assert response.status_code == 429
+    assert PROGRESS.current(channel)["stage"] == "error"
+
+
+def test_progress_of_a_query_run_by_another_worker_ends(client, monkeypatch):
+    service = get_query_service()
+    query_id = "0therw0rker1"
+    monkeypatch.setattr(PROGRESS, "poll_s", 0.05)
+
+    # Solo el registro sabe de ella: la ejecuta otro worker
+    entry = service.registry.create(query_id, "475,*", None, "475,*", None)
+    service.registry.update(query_id, status=QueryStatus.RUNNING)
+
+    def finish_elsewhere():
+        time.sleep(0.2)
+        done = QueryEntry.from_dict({**entry.to_dict(), "status": "done", "rows": 3})
+        write_metadata(service.config, query_id, done.to_dict())
+
+    events = []
+
+    def follow():
+        with client.stream("GET", f"/query/{query_id}/progress") as response:
+            for line in response.iter_lines():
+                if line.startswith("data: "):
+                    events.append(json.loads(line[6:]))
+
+    Thread(target=finish_elsewhere, daemon=True).start()
+    reader = Thread(target=follow, daemon=True)
+    reader.start()
+    reader.join(timeout=10)
+
+    assert not reader.is_alive()
+    assert events[0]["stage"] == "running"
+    assert events[-1]["stage"] == "done"
+    assert events[-1]["rows"] == 3
+    assert service.registry.get(query_id).status == QueryStatus.DONE
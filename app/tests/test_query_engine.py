@@ -0,0 +1,102 @@
+# tests/test_query_engine.py
+#
+# El motor (planificador, claves distintas, shards en paralelo) debe
+# devolver exactamente las filas del motor original, que recorría cada
+# fila de los niveles del índice: startswith para "a,b,*" y regex para
+# el resto.
+
+import re
+
+import numpy as np
+import pytest
+
+from benchmarks.run_benchmarks import pattern_classes
+from core._2_preprocessor import ROW_ID_COLUMN, compute_dataset_stats
+from core._3_input_controller import parse_pattern
+from core._4_query_engine import run_query
+from core._7_query_planner import plan_query
+
+
+PARALLELISM = [
+    pytest.param(1, 1_000_000, id="serial"),
+    pytest.param(4, 700, id="4x700"),
+    pytest.param(0, 1000, id="cores"),
+]
+
+
+def _baseline_mask(values, pattern, separator: str) -> np.ndarray:
+    raw = pattern.raw.replace(" ", "").replace(".", separator)
+
+    if raw.endswith("*") and "?" not in raw[:-1]:
+        prefix = raw[:-1] if raw[:-1].endswith(separator) else raw[:-1] + separator
+        return np.asarray(values.str.startswith(prefix), dtype=bool)
+
+    return np.asarray(values.str.match(re.compile(pattern.regex)), dtype=bool)
+
+
+def _baseline(df, src_pattern, dst_pattern, separator: str) -> np.ndarray:
+    mask = np.ones(len(df), dtype=bool)
+
+    for level, pattern in enumerate((src_pattern, dst_pattern)):
+        if pattern is not None:
+            values = df.index.get_level_values(level).astype(str)
+            mask &= _baseline_mask(values, pattern, separator)
+
+    return df[ROW_ID_COLUMN].to_numpy()[mask]
+
+
+def _classes(dataset, config):
+    separator = config["processing"]["separator"]
+    classes = pattern_classes(dataset, separator)
+
+    a = classes["prefix"][0].split(separator)[0]
+    classes.update({
+        "any": (f"?{separator}*", None),
+        "dst_wildcard": (None, f"?{separator}{a}{separator}*"),
+        "literal_star": (f"{a}*", None),
+        "no_match": ("999999", None),
+    })
+    return classes
+
+
+@pytest.mark.parametrize("threads, shard_rows", PARALLELISM)
+@pytest.mark.parametrize("planned", [False, True], ids=["default_plan", "stats_plan"])
+def test_engine_matches_baseline(dataset, config, threads, shard_rows, planned):
+    config["processing"].update(threads=threads, shard_rows=shard_rows)
+    stats = compute_dataset_stats(dataset, config) if planned else None
+
+    for name, (src, dst) in _classes(dataset, config).items():
+        src_pattern = parse_pattern(src, "observation", config) if src else None
+        dst_pattern = parse_pattern(dst, "prediction", config) if dst else None
+        plan = plan_query(src_pattern, dst_pattern, config, stats)
+
+        result = run_query(dataset, src_pattern, dst_pattern, config, plan=plan)
+        expected = _baseline(dataset, src_pattern, dst_pattern, config["processing"]["separator"])
+
+        assert np.array_equal(result[ROW_ID_COLUMN].to_numpy(), expected), name
+        assert plan.actual_rows == len(expected), name
+
+
+def test_pattern_classes_are_not_trivial(dataset, config):
+    # Si alguna clase no devolviera nada la comparación no probaría nada
+    separator = config["processing"]["separator"]
+
+    for name, (src, dst) in pattern_classes(dataset, separator).items():
+        src_pattern = parse_pattern(src, "observation", config) if src else None
+        dst_pattern = parse_pattern(dst, "prediction", config) if dst else None
+
+        assert 0 < len(_baseline(dataset, src_pattern, dst_pattern, separator)) < len(dataset), name
+
+
+def test_prefix_shorthand_is_estimated_like_its_prefix(dataset, config):
+    separator = config["processing"]["separator"]
+    stats = compute_dataset_stats(dataset, config)
+    a = pattern_classes(dataset, separator)["prefix"][0].split(separator)[0]
+
+    estimates = []
+    for src in (f"{a}*", f"{a}{separator}*"):
+        plan = plan_query(parse_pattern(src, "observation", config), None, config, stats)
+        estimates.append(plan.estimated_rows)
+
+    assert estimates[0] > 0
+    assert estimates[0] == estimates[1]
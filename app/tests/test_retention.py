@@ -0,0 +1,127 @@
+# tests/test_retention.py
+
+import json
+from pathlib import Path
+
+import pytest
+
+from api.dependencies import get_query_service
+from state.registry import QueryStatus
+
+
+@pytest.fixture
+def service(client):
+    return get_query_service()
+
+
+def _run(client, src: str) -> str:
+    response = client.post("/query", json={"src": src})
+    assert response.status_code == 200
+    return response.json()["query_id"]
+
+
+def _evict_everything(service, monkeypatch):
+    # Cuota de 1 byte: se expulsa todo lo que no esté bloqueado
+    monkeypatch.setattr(service.retention, "quotas", {service.retention.output_dir: 1})
+    return service.retention.sweep()
+
+
+def test_quota_eviction_deletes_files_and_marks_evicted(client, service, monkeypatch):
+    query_id = _run(client, "475,*")
+    entry = service.registry.get(query_id)
+    rows = entry.rows
+
+    report = _evict_everything(service, monkeypatch)
+
+    assert report["evicted"] >= 1
+    assert entry.status == QueryStatus.EVICTED
+    assert not Path(entry.output).exists()
+
+    # Leerla la recalcula
+    response = client.get(f"/query/{query_id}/data", params={"limit": 10})
+    assert response.status_code == 200
+    assert response.json()["total"] == rows
+    assert service.registry.get(query_id).status == QueryStatus.DONE
+
+
+def test_locked_query_is_not_evicted(client, service, monkeypatch):
+    query_id = _run(client, "103,*")
+    entry = service.registry.get(query_id)
+
+    with service.locks.acquire(query_id):
+        _evict_everything(service, monkeypatch)
+
+    assert entry.status == QueryStatus.DONE
+    assert Path(entry.output).exists()
+
+
+@pytest.mark.parametrize("format", ["json", "ndjson"])
+def test_data_recomputes_result_deleted_after_resolving_it(client, service, monkeypatch, format):
+    query_id = _run(client, "?,475")
+    resolve = service.result_entry
+
+    def resolve_then_delete(qid):
+        # La retención lo borra justo después de resolverlo
+        entry = resolve(qid)
+        monkeypatch.setattr(service, "result_entry", resolve)
+        Path(entry.output).unlink()
+        return entry
+
+    monkeypatch.setattr(service, "result_entry", resolve_then_delete)
+
+    response = client.get(f"/query/{query_id}/data", params={"format": format, "limit": 10})
+    assert response.status_code == 200
+
+    if format == "ndjson":
+        assert int(response.headers["X-Total-Count"]) == service.registry.get(query_id).rows
+        assert all(json.loads(line) for line in response.text.splitlines())
+    assert Path(service.registry.get(query_id).output).exists()
+
+
+def test_all_returns_a_copy(service):
+    queries = service.registry.all()
+    queries["not-a-query"] = None
+
+    assert "not-a-query" not in service.registry.all()
+
+
+def _before_lock(service, monkeypatch, query_id, action):
+    # `action` corre entre el listado del barrido y su try_acquire
+    try_acquire = service.locks.try_acquire
+
+    def hooked(qid):
+        if qid == query_id:
+            monkeypatch.setattr(service.locks, "try_acquire", try_acquire)
+            action()
+        return try_acquire(qid)
+
+    monkeypatch.setattr(service.locks, "try_acquire", hooked)
+
+
+def test_ttl_skips_a_query_rerun_after_the_listing(client, service, monkeypatch):
+    src = "475,?,?,*"
+    query_id = _run(client, src)
+
+    # Error antiguo: candidata a TTL
+    service.registry.update(query_id, status=QueryStatus.ERROR)
+    service.registry.get(query_id).updated_at = "2000-01-01T00:00:00"
+
+    _before_lock(service, monkeypatch, query_id, lambda: service.run(src, None))
+    report = service.retention.sweep()
+
+    entry = service.registry.get(query_id)
+    assert report["expired"] == 0
+    assert entry.status == QueryStatus.DONE
+    assert Path(entry.output).exists()
+    assert (service.retention.output_dir / f"{query_id}.json").exists()
+
+
+def test_quota_skips_a_result_read_after_the_listing(client, service, monkeypatch):
+    query_id = _run(client, "?,?,103")
+    entry = service.registry.get(query_id)
+
+    _before_lock(service, monkeypatch, query_id, lambda: service.registry.touch(query_id))
+    _evict_everything(service, monkeypatch)
+
+    assert entry.status == QueryStatus.DONE
+    assert Path(entry.output).exists()
@@ -0,0 +1,27 @@
+# tests/test_shared_dataset.py
+
+from multiprocessing import resource_tracker, shared_memory
+
+import state.shared_dataset as shared_dataset
+
+
+def test_attach_leaves_the_resource_tracker_to_the_master(monkeypatch):
+    segment = shared_memory.SharedMemory(create=True, size=64)
+    segment.buf[0] = 7
+
+    try:
+        # Lo que registrase o desregistrase un worker iría al tracker del maestro
+        calls = []
+        monkeypatch.setattr(resource_tracker, "register", lambda *args: calls.append(("register", args)))
+        monkeypatch.setattr(resource_tracker, "unregister", lambda *args: calls.append(("unregister", args)))
+
+        attached = shared_dataset._attach(segment.name)
+
+        assert attached.buf[0] == 7
+        assert shared_dataset._attach(segment.name) is attached
+        assert calls == []
+    finally:
+        shared_dataset._ATTACHED.pop(segment.name).close()
+        monkeypatch.undo()
+        segment.close()
+        segment.unlink()